@@ -0,0 +1,95 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+
+Compare two benchmark results saved with `pytest --benchmark-json` (or
+`--benchmark-autosave`) and fail if any benchmark regressed by more than the
+given thresholds.
+
+Usage:
+
+    python benchmarks/compare.py baseline.json current.json --time 10 --memory 10
+
+"""
+import sys
+import json
+import argparse
+
+
+def load(path):
+    """ Load the benchmarks from a saved json file by name """
+    with open(path) as f:
+        data = json.load(f)
+    return {b['fullname']: b for b in data['benchmarks']}
+
+
+def compare(baseline, current, time_threshold=10, memory_threshold=10,
+            stat='median'):
+    """ Compare the results and return a list of regressions.
+
+    Parameters
+    ----------
+    baseline: Dict
+        Benchmarks loaded from the baseline results.
+    current: Dict
+        Benchmarks loaded from the results to check.
+    time_threshold: Float
+        Maximum allowed increase in time in percent.
+    memory_threshold: Float
+        Maximum allowed increase in peak memory in percent.
+    stat: String
+        The timing statistic to compare.
+
+    Returns
+    -------
+    regressions: List[Tuple]
+        List of (name, metric, old, new, change_in_percent)
+
+    """
+    regressions = []
+    for name, bench in sorted(current.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        checks = [
+            ('time', old['stats'][stat], bench['stats'][stat],
+             time_threshold),
+            ('memory', old['extra_info'].get('memory_peak'),
+             bench['extra_info'].get('memory_peak'), memory_threshold),
+        ]
+        for metric, a, b, threshold in checks:
+            if not a or b is None:
+                continue
+            change = 100.0 * (b - a) / a
+            if change > threshold:
+                regressions.append((name, metric, a, b, change))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument('baseline', help="Baseline results json")
+    parser.add_argument('current', help="Current results json")
+    parser.add_argument('--time', type=float, default=10,
+                        help="Allowed time increase in percent")
+    parser.add_argument('--memory', type=float, default=10,
+                        help="Allowed peak memory increase in percent")
+    parser.add_argument('--stat', default='median',
+                        choices=('min', 'max', 'mean', 'median'),
+                        help="Timing statistic to compare")
+    args = parser.parse_args(args)
+
+    regressions = compare(load(args.baseline), load(args.current),
+                          args.time, args.memory, args.stat)
+    for name, metric, a, b, change in regressions:
+        print("REGRESSION {} {}: {:.6g} -> {:.6g} (+{:.1f}%)".format(
+            name, metric, a, b, change))
+    if regressions:
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+
+Shared fixtures for the benchmark suite.
+
+"""
+import tracemalloc
+import pytest
+from web.core.app import WebApplication
+
+
+#: Document sizes (number of nodes) most benchmarks are run with
+SIZES = (10, 100, 1000)
+
+#: Number of items used for the Looper benchmarks
+LOOPER_SIZES = (1000, 10000, 100000)
+
+
+def rounds_for(size):
+    """ Use fewer rounds for the larger documents so the suite still
+    finishes in a reasonable time.
+
+    """
+    return max(1, min(20, 10000 // size))
+
+
+@pytest.fixture
+def app():
+    app = WebApplication.instance() or WebApplication()
+    yield app
+
+
+@pytest.fixture
+def measure(benchmark):
+    """ Benchmark a target and record it's memory usage.
+
+    The memory is measured using tracemalloc on a separate (untimed) call so
+    it does not skew the timing. The current (retained after the call) and
+    peak memory are saved in the `extra_info` of the benchmark so they are
+    included in the saved json results.
+
+    Parameters
+    ----------
+    target: Callable
+        The function to benchmark.
+    setup: Callable
+        Optional function called before each round which returns a tuple of
+        args to pass to the target. This is not included in the timing.
+    rounds: Int
+        Number of rounds to run. Only used when a setup function is given.
+
+    """
+    def run(target, setup=None, rounds=5):
+        args = setup() if setup is not None else ()
+        tracemalloc.start()
+        try:
+            result = target(*args)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del result, args
+        benchmark.extra_info['memory_current'] = current
+        benchmark.extra_info['memory_peak'] = peak
+        if setup is None:
+            return benchmark(target)
+        return benchmark.pedantic(target, setup=lambda: (setup(), {}),
+                                  rounds=rounds)
+    return run
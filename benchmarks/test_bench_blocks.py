@@ -0,0 +1,18 @@
+"""
+Benchmarks of Block content replacement.
+
+"""
+import enaml
+import pytest
+from conftest import SIZES, rounds_for
+
+with enaml.imports():
+    from views import BlockPage
+
+
+@pytest.mark.parametrize('mode', ('replace', 'append'))
+@pytest.mark.parametrize('size', SIZES)
+def test_block(app, measure, mode, size):
+    items = list(range(size))
+    measure(lambda: BlockPage(items=items, mode=mode).render(),
+            setup=lambda: (), rounds=rounds_for(size))
@@ -0,0 +1,117 @@
+"""
+Benchmarks of the startup time of a worker importing the views of a 200 view
+project from source, from enaml's cache, and from a precompiled bundle.
+
+"""
+import os
+import sys
+import shutil
+import subprocess
+import pytest
+from textwrap import dedent
+
+
+#: Number of views in the generated project
+VIEWS = 200
+
+#: Name of the generated package
+PACKAGE = 'bench_views'
+
+VIEW = dedent("""
+from web.components.api import *
+from web.core.api import *
+from {package}.base import Layout
+
+enamldef View{i}(Layout): view:
+    attr items = list(range(10))
+    title = "View {i}"
+    Block:
+        block = view.content
+        H1:
+            text = "View {i}"
+        Ul:
+            Looper:
+                iterable << view.items
+                Li:
+                    cls = "item"
+                    text = "Item {{}}".format(loop_item)
+        P:
+            text << "Page {{}}".format(view.title)
+""")
+
+BASE = dedent("""
+from web.components.api import *
+from web.core.api import *
+
+enamldef Layout(Html): view:
+    attr title = ""
+    alias content
+    Head:
+        Title:
+            text << view.title
+    Body:
+        Header:
+            text = "Header"
+        Block: content:
+            pass
+        Footer:
+            text = "Footer"
+""")
+
+
+@pytest.fixture(scope='module')
+def project(tmp_path_factory):
+    """ Generate the project with a bundle of the views """
+    root = tmp_path_factory.mktemp('project')
+    pkg = root / PACKAGE
+    pkg.mkdir()
+    (pkg / '__init__.py').write_text("")
+    (pkg / 'base.enaml').write_text(BASE)
+    for i in range(VIEWS):
+        (pkg / ('view%s.enaml' % i)).write_text(
+            VIEW.format(package=PACKAGE, i=i))
+    run(str(root), "from web.core import bundle; bundle.build(%r)" % PACKAGE)
+    return str(root)
+
+
+def clear_cache(root):
+    path = os.path.join(root, PACKAGE, '__enamlcache__')
+    for name in os.listdir(path):
+        if name.endswith('.enamlc'):
+            os.remove(os.path.join(path, name))
+
+
+def run(root, code):
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join((root, repo))
+    subprocess.run((sys.executable, '-c', code), env=env, check=True)
+
+
+def startup(mode):
+    """ Code that imports all the views the same way a worker would """
+    lines = [
+        "import enaml",
+        "from web.core.app import WebApplication",
+        "app = WebApplication()",
+    ]
+    if mode == 'bundle':
+        lines.append("from web.core import bundle")
+        lines.append("bundle.load(%r)" % PACKAGE)
+    lines.append("with enaml.imports():")
+    for i in range(VIEWS):
+        lines.append("    from %s.view%s import View%s" % (PACKAGE, i, i))
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize('mode', ('source', 'cache', 'bundle'))
+def test_worker_startup(benchmark, project, mode):
+    code = startup(mode)
+    run(project, startup('source'))  # Make sure the cache exists
+
+    def setup():
+        if mode == 'source':
+            clear_cache(project)
+        return (project, code), {}
+
+    benchmark.pedantic(run, setup=setup, rounds=5)
@@ -0,0 +1,24 @@
+"""
+Benchmarks of rendering a page with a large fragment that is cached and that
+is built every time (no key).
+
+"""
+import enaml
+import pytest
+from conftest import SIZES
+
+with enaml.imports():
+    from views import CachedPage
+
+
+@pytest.mark.parametrize('cached', (True, False))
+@pytest.mark.parametrize('size', SIZES)
+def test_render_cached(app, measure, size, cached):
+    key = 'items-%s' % size if cached else None
+    items = list(range(size))
+    CachedPage(items=items, key=key).render()
+
+    def render():
+        return CachedPage(items=items, key=key).render()
+
+    measure(render)
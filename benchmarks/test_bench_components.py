@@ -0,0 +1,94 @@
+"""
+Benchmarks of the Raw, Markdown, Code and Notebook conversions.
+
+"""
+import os
+import json
+import enaml
+import pytest
+from copy import deepcopy
+from conftest import SIZES, rounds_for
+
+with enaml.imports():
+    from views import RawPage, MarkdownPage, CodePage, NotebookPage
+
+SNIPPET = ('<div class="row"><p>Paragraph <b>1</b> '
+           '<a href="#">link</a></p></div>')
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                            'templates')
+
+
+def clear_caches():
+    """ Clear the conversion caches so each round measures a conversion and
+    not a cache hit.
+
+    """
+    from web.impl import lxml_raw, lxml_md, lxml_code, lxml_ipynb
+    for module in (lxml_raw, lxml_md, lxml_code, lxml_ipynb):
+        module.CACHE.clear()
+
+
+def render(Page, source, size):
+    def setup():
+        clear_caches()
+        view = Page()
+        view.render()
+        return (view,)
+    return (lambda view: view.render(source=source)), setup
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_raw(app, measure, size):
+    source = "".join(
+        '<div class="row"><p>Paragraph <b>%s</b></p></div>' % i
+        for i in range(size))
+    target, setup = render(RawPage, source, size)
+    measure(target, setup=setup, rounds=rounds_for(size))
+
+
+@pytest.mark.parametrize('size', (1,) + SIZES)
+def test_fragment_parse(measure, size):
+    """ Parse a snippet (the uncached path of Raw) """
+    from web.impl.lxml_raw import parse
+    source = SNIPPET * size
+    measure(lambda: parse(source))
+
+
+@pytest.mark.parametrize('size', (1,) + SIZES)
+def test_fragment_copy(measure, size):
+    """ Copy a parsed snippet (the cached path of Raw) """
+    from web.impl.lxml_raw import parse
+    body = parse(SNIPPET * size)
+    measure(lambda: deepcopy(body))
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_markdown(app, measure, size):
+    pytest.importorskip('markdown')
+    source = "".join(
+        "## Section %s\n\nSome *text* with a [link](#%s).\n\n- a\n- b\n\n" % (
+            i, i) for i in range(size))
+    target, setup = render(MarkdownPage, source, size)
+    measure(target, setup=setup, rounds=rounds_for(size))
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_code(app, measure, size):
+    pytest.importorskip('pygments')
+    source = "".join(
+        "def f%s(a, b):\n    return a + b * %s\n\n" % (i, i)
+        for i in range(size))
+    target, setup = render(CodePage, source, size)
+    measure(target, setup=setup, rounds=rounds_for(size))
+
+
+@pytest.mark.parametrize('size', (1, 5, 10))
+def test_notebook(app, measure, size):
+    pytest.importorskip('nbconvert')
+    with open(os.path.join(TEMPLATE_DIR, 'cell-magics.ipynb')) as f:
+        nb = json.load(f)
+    worksheet = nb['worksheets'][0]
+    worksheet['cells'] = worksheet['cells'] * size
+    target, setup = render(NotebookPage, json.dumps(nb), size)
+    measure(target, setup=setup, rounds=3)
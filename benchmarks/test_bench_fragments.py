@@ -0,0 +1,25 @@
+"""
+Benchmarks of rendering one small section of a large page in full, by id
+from a fully initialized view, and lazily.
+
+"""
+import enaml
+import pytest
+from conftest import SIZES
+
+with enaml.imports():
+    from views import FragmentPage
+
+
+@pytest.mark.parametrize('mode', ('page', 'fragment', 'lazy'))
+@pytest.mark.parametrize('size', SIZES)
+def test_render_fragment(app, measure, size, mode):
+    items = list(range(size))
+
+    def render():
+        view = FragmentPage(items=items)
+        if mode == 'page':
+            return view.render()
+        return view.render_fragment('summary', lazy=mode == 'lazy')
+
+    measure(render)
@@ -0,0 +1,110 @@
+"""
+Benchmarks of the import time of the toolkit using `python -X importtime`.
+
+The budget (in milliseconds) can be changed with the IMPORT_BUDGET
+environment variable.
+
+"""
+import os
+import sys
+import subprocess
+import pytest
+
+
+#: Maximum import time of the toolkit in milliseconds
+IMPORT_BUDGET = float(os.environ.get('IMPORT_BUDGET', 200))
+
+#: Optional dependencies that must only be imported when used
+HEAVY = ('pygments', 'markdown', 'nbformat', 'nbconvert')
+
+#: Code importing what a typical application uses
+STARTUP = "\n".join((
+    "import web.components.api",
+    "import web.core.api",
+    "from web.core.app import WebApplication",
+    "WebApplication()",
+))
+
+
+def run(code, *args):
+    """ Run the code in a new interpreter with the repo on the path """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        p for p in (root, env.get('PYTHONPATH')) if p)
+    return subprocess.run(
+        (sys.executable,) + args + ('-c', code), env=env, check=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+
+
+def importtime(code):
+    """ Run the code with `-X importtime`.
+
+    Returns
+    -------
+    elapsed: Float
+        The total time spent importing modules after the interpreter
+        started in milliseconds.
+    modules: Set
+        The names of all modules imported.
+
+    """
+    result = run(code, '-X', 'importtime')
+    elapsed = 0
+    modules = set()
+    started = False
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative, name = line[12:].split('|')
+        modules.add(name.strip())
+        # Only top level imports are counted since nested imports are
+        # included in the cumulative time of the parent
+        if name.startswith('  '):
+            continue
+        started = started or name.strip().startswith('web')
+        if started:
+            elapsed += int(cumulative)
+    return elapsed / 1000.0, modules
+
+
+def test_import_time(benchmark):
+    results = []
+
+    def target():
+        results.append(importtime(STARTUP))
+
+    benchmark.pedantic(target, rounds=5)
+    elapsed = min(r[0] for r in results)
+    benchmark.extra_info['import_ms'] = elapsed
+    assert elapsed < IMPORT_BUDGET
+    for name in HEAVY:
+        assert name not in results[0][1], "%s was imported" % name
+
+
+@pytest.mark.parametrize('name, module', (
+    ('Code', 'pygments'),
+    ('Markdown', 'markdown'),
+    ('Notebook', 'nbconvert'),
+))
+def test_import_on_use(name, module):
+    # The dependency is only imported once a node converts something
+    source = repr("# Title")
+    if name == 'Notebook':
+        path = os.path.join(os.path.dirname(__file__), os.pardir, 'tests',
+                            'templates', 'cell-magics.ipynb')
+        source = "open(%r).read()" % os.path.abspath(path)
+    code = "\n".join((
+        "import sys",
+        STARTUP,
+        "from web.components.api import Html, %s" % name,
+        "view = Html()",
+        "node = %s(parent=view)" % name,
+        "view.render()",
+        "print(%r in sys.modules)" % module,
+        "node.source = %s" % source,
+        "view.render()",
+        "print(%r in sys.modules)" % module,
+    ))
+    assert run(code).stdout.split() == ['False', 'True']
@@ -0,0 +1,37 @@
+"""
+Benchmarks of the per node cost of creating a proxy for user enamldefs
+several levels deep in the inheritance chain, with and without the proxy
+class cache of the WebApplication.
+
+"""
+import enaml
+import pytest
+from enaml.application import Application
+
+with enaml.imports():
+    import views
+
+
+#: Number of nodes a proxy is created for in each round
+NODES = 1000
+
+
+@pytest.mark.parametrize('cached', (True, False))
+@pytest.mark.parametrize('depth', (1, 4, 8))
+def test_create_proxy(app, benchmark, depth, cached):
+    Level = getattr(views, 'Level%s' % depth)
+    nodes = [Level() for i in range(NODES)]
+
+    if cached:
+        def create():
+            for node in nodes:
+                app.create_proxy(node)
+    else:
+        # What was done for every node before the resolved class was cached
+        def create():
+            for node in nodes:
+                cls = Application.resolve_proxy_class(app, type(node))
+                cls(declaration=node)
+
+    benchmark.extra_info['nodes'] = NODES
+    benchmark(create)
@@ -0,0 +1,39 @@
+"""
+Benchmarks of incremental static site builds. A site of SITE_PAGES pages
+is built once then one page is changed and the site built again.
+
+"""
+import os
+import enaml
+import pytest
+from web.core.site import Site, Page
+
+with enaml.imports():
+    from views import Page as View
+
+
+#: Number of pages of the site
+PAGES = int(os.environ.get('SITE_PAGES', 2000))
+
+
+def pages(changed=None):
+    return [Page(path='%s.html' % i, view=View,
+                 kwargs={'items': list(range(11 if i == changed else 10))})
+            for i in range(PAGES)]
+
+
+@pytest.mark.parametrize('workers', sorted({1, os.cpu_count() or 1}))
+def test_site_rebuild_one(app, benchmark, tmp_path, workers):
+    site = Site(output=str(tmp_path), workers=workers, pages=pages())
+    site.build()
+    rounds = iter(range(1000))
+
+    def setup():
+        # Alternate the data of the first page
+        site.pages = pages(changed=0 if next(rounds) % 2 == 0 else None)
+        return (), {}
+
+    def build():
+        result = site.build()
+        assert len(result.rendered) == 1
+    benchmark.pedantic(build, setup=setup, rounds=5)
@@ -0,0 +1,76 @@
+"""
+Benchmarks of the view lifecycle: instantiation, rendering, updates and
+queries.
+
+"""
+import json
+import enaml
+import pytest
+from itertools import cycle
+from conftest import SIZES, LOOPER_SIZES, rounds_for
+
+with enaml.imports():
+    from views import Page
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_instantiate(app, measure, size):
+    items = list(range(size))
+
+    def create():
+        view = Page(items=items)
+        view.initialize()
+        return view
+
+    measure(create)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_initial_render(app, measure, size):
+    items = list(range(size))
+
+    def setup():
+        view = Page(items=items)
+        view.initialize()
+        return (view,)
+
+    measure(lambda view: view.render(), setup=setup, rounds=rounds_for(size))
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_update(app, measure, benchmark, size):
+    """ Time updating every node and serializing the patches that are
+    emitted.
+
+    """
+    view = Page(items=list(range(size)))
+    view.render()
+    patches = []
+
+    def on_modified(change):
+        patches.append(json.dumps(change['value']))
+
+    view.observe('modified', on_modified)
+    labels = cycle(['A', 'B'])
+
+    def update():
+        del patches[:]
+        view.label = next(labels)
+        return patches
+
+    measure(update)
+    benchmark.extra_info['patches'] = len(patches)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_xpath(app, measure, size):
+    view = Page(items=list(range(size)))
+    view.render()
+    measure(lambda: view.xpath('//li[@class="item"]'))
+
+
+@pytest.mark.parametrize('size', LOOPER_SIZES)
+def test_looper(app, measure, size):
+    items = list(range(size))
+    measure(lambda: Page(items=items).render(), setup=lambda: (),
+            rounds=rounds_for(size))
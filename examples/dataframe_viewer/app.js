@@ -7,10 +7,19 @@ function initViewer(ref) {
     ws.onmessage = function(evt) {
         var change = JSON.parse(evt.data);
         console.log(change);
+        applyChange(change);
+    };
+
+    function applyChange(change) {
         var $tag = $('#'+change.id);
         change.object = $tag;
 
-        if (change.type === 'refresh') {
+        if (change.type === 'batch') {
+            // Changes made by a handler that was run in the background
+            $.each(change.value, function(i, c) {
+                applyChange(c);
+            });
+        } else if (change.type === 'refresh') {
             $tag.html(change.value);
         } else if (change.type === 'trigger') {
             $tag.trigger(change.value);
@@ -18,6 +27,16 @@ function initViewer(ref) {
             $tag.append($(change.value));
         } else if (change.type === 'removed') {
             $tag.find('#'+change.value).remove();
+        } else if (change.type === 'class_add') {
+            $tag.addClass(change.value);
+        } else if (change.type === 'class_remove') {
+            $tag.removeClass(change.value);
+        } else if (change.type === 'attr_set') {
+            $tag.attr(change.key, change.value);
+        } else if (change.type === 'attr_delete') {
+            $tag.removeAttr(change.key);
+        } else if (change.type === 'style_set') {
+            $tag.css(change.key, change.value === null ? '' : change.value);
         } else if (change.type === 'update') {
             if (change.name==="text") {
                 var node = $tag.contents().get(0);
@@ -39,7 +58,7 @@ function initViewer(ref) {
         } else {
             console.log("Unknown change type");
         }
-    };
+    }
 
     ws.onclose = function(evt) {
         console.log("Disconnected!");
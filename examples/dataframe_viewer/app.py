@@ -4,6 +4,7 @@ import enaml
 import tornado.web
 import tornado.websocket
 import tornado.ioloop
+import pandas as pd
 from tornado.log import enable_pretty_logging
 from web.core.app import WebApplication
 
@@ -37,7 +38,7 @@ CACHE = {}
 
 class ViewerHandler(tornado.web.RequestHandler):
 
-    def get(self):
+    async def get(self):
         viewer = Viewer(
             request=self.request,
             response=self,
@@ -47,7 +48,14 @@ class ViewerHandler(tornado.web.RequestHandler):
         # Store the viewer in the cache
         CACHE[viewer.id] = viewer
 
-        self.write(viewer.render())
+        # Load a dataset given in the url without blocking other requests
+        kwargs = {}
+        dataset = self.get_argument('dataset', None)
+        if dataset in CSV_FILES:
+            app = WebApplication.instance()
+            kwargs['dataframe'] = app.run_in_executor(pd.read_csv, dataset)
+
+        self.write(await viewer.render_async(timeout=60, **kwargs))
 
 
 class ViewerWebSocket(tornado.websocket.WebSocketHandler):
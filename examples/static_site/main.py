@@ -1,5 +1,6 @@
 import enaml
 from web.core.app import WebApplication
+from web.core.site import Site, Page
 
 with enaml.imports():
     from index import Index
@@ -9,9 +10,12 @@ def main():
     # Must have at least one application
     app = WebApplication()
 
-    # Generate index.html from index.enaml
-    with open('index.html', 'wb') as f:
-        f.write(Index().render())
+    # Generate index.html from index.enaml. Running again only rebuilds (and
+    # rewrites) the pages that changed.
+    site = Site(output='.', pages=[Page(path='index.html', view=Index)])
+    result = site.build()
+    print("Rendered {} and wrote {} pages".format(
+        len(result.rendered), len(result.written)))
 
 if __name__ == '__main__':
     main()
@@ -380,3 +380,121 @@ def test_block_ref_changed(app):
     assert nodes[0].text == 'Header'
     assert nodes[1].text == 'Footer'
     assert nodes[2].text == 'Added'
+
+
+def test_block_replace_bulk(app, monkeypatch):
+    # Test that all placeholders are replaced and moving the content to
+    # another block emits a single refresh
+    from web.components.html import Tag
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Template(Html):
+        alias content
+        alias sidebar
+        Body:
+            Block: content:
+                H1:
+                    text = "Default"
+                H1:
+                    text = "Default"
+            Aside:
+                Block: sidebar:
+                    H1:
+                        text = "Sidebar"
+
+    enamldef Page(Template): view:
+        attr block = 'content'
+        Block:
+            block << view.content if view.block == 'content' else view.sidebar
+            H2:
+                text = "One"
+            H2:
+                text = "Two"
+
+    """), 'Page')
+    view = Page()
+    view.render()
+    assert len(view.xpath('/html/body/h1')) == 0
+    assert len(view.xpath('/html/body/h2')) == 2
+    assert len(view.xpath('/html/body/aside/h1')) == 1
+
+    changes = []
+
+    def on_modified(change):
+        changes.append(change['value'])
+
+    # The usual child events are still dispatched
+    events = []
+    child_added, child_removed = Tag.child_added, Tag.child_removed
+
+    def on_added(self, child):
+        events.append(('added', self, child))
+        child_added(self, child)
+
+    def on_removed(self, child):
+        events.append(('removed', self, child))
+        child_removed(self, child)
+
+    monkeypatch.setattr(Tag, 'child_added', on_added)
+    monkeypatch.setattr(Tag, 'child_removed', on_removed)
+
+    old = [c for c in view.sidebar.children]
+    view.observe('modified', on_modified)
+    view.render(block='sidebar')
+    aside = view.xpath('/html/body/aside')[0]
+    refreshed = [c for c in changes if c['type'] == 'refresh']
+    assert len(refreshed) == 1
+    assert refreshed[0]['id'] == aside.id
+
+    items = [c for c in aside.children if isinstance(c, Tag)]
+    assert len(items) == 2
+    assert all(c.parent is aside for c in aside.children)
+    assert all(c.is_destroyed and c.parent is None for c in old)
+    assert ('removed', aside, old[0]) in events
+    assert all(('added', aside, c) in events for c in items)
+    assert all(c.is_initialized for c in items)
+    assert [n.text for n in view.xpath('/html/body/aside/h2')] == [
+        'One', 'Two']
+    assert len(view.xpath('/html/body/aside/h1')) == 0
+    assert len(view.xpath('/html/body/h2')) == 0
+
+
+def test_block_replaced_not_built(app):
+    # Test that the content of a replaced block is never built
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Template(Html): view:
+        attr built = []
+        alias content
+        alias footer
+        Body:
+            Block: content:
+                H1:
+                    initialized :: view.built.append('template')
+            Block: footer:
+                H1:
+                    initialized :: view.built.append('footer')
+
+    enamldef Layout(Template): layout:
+        Block:
+            block = layout.content
+            H2:
+                initialized :: layout.built.append('layout')
+
+    enamldef Page(Layout): page:
+        Block:
+            block = page.content
+            H3:
+                initialized :: page.built.append('page')
+
+    """), 'Page')
+    view = Page()
+    view.render()
+    assert view.built == ['footer', 'page']
+    assert len(view.xpath('/html/body/h3')) == 1
+    assert len(view.xpath('/html/body/h1')) == 1
+    assert len(view.xpath('/html/body/h2')) == 0
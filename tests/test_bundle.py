@@ -0,0 +1,104 @@
+import os
+import sys
+import enaml
+import pytest
+from textwrap import dedent
+from enaml.core import import_hooks
+from web.core import bundle
+from web.core.app import WebApplication
+
+
+@pytest.fixture
+def app():
+    app = WebApplication.instance() or WebApplication()
+    yield app
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    """ Create a package with a few views """
+    name = 'bundled_views'
+    pkg = tmp_path / name
+    (pkg / 'pages').mkdir(parents=True)
+    (pkg / '__init__.py').write_text("")
+    (pkg / 'pages' / '__init__.py').write_text("")
+    (pkg / 'base.enaml').write_text(dedent("""
+    from web.components.api import *
+
+    enamldef Layout(Html): view:
+        attr message = "Base"
+        Body:
+            H1:
+                text << view.message
+    """))
+    (pkg / 'pages' / 'index.enaml').write_text(dedent("""
+    from web.components.api import *
+    from bundled_views.base import Layout
+
+    enamldef Index(Layout):
+        message = "Index"
+    """))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield name
+    for mod in list(sys.modules):
+        if mod.startswith(name):
+            del sys.modules[mod]
+    bundle.BundleImporter.modules.clear()
+    while bundle.BundleImporter in sys.meta_path:
+        bundle.BundleImporter.uninstall()
+
+
+def test_bundle(app, package, monkeypatch):
+    path = bundle.build(package)
+    assert path == bundle.bundle_path(package)
+    assert os.path.exists(path)
+
+    loaded = bundle.load(package)
+    assert sorted(loaded) == ['bundled_views.base',
+                              'bundled_views.pages.index']
+
+    # The views must be imported without parsing
+    def parse(*args, **kwargs):
+        raise AssertionError("Source was parsed")
+
+    monkeypatch.setattr(import_hooks, 'parse', parse)
+    with enaml.imports():
+        from bundled_views.pages.index import Index
+    view = Index()
+    assert '<h1' in view.render() and 'Index' in view.render()
+
+    module = sys.modules['bundled_views.pages.index']
+    assert module.__file__.endswith(os.path.join('pages', 'index.enaml'))
+
+
+@pytest.mark.parametrize('validate', ('mtime', 'hash'))
+def test_bundle_stale(app, package, validate):
+    bundle.build(package)
+    root, path = bundle.package_dirs(package)
+    src = os.path.join(path, 'base.enaml')
+    with open(src, 'a') as f:
+        f.write("\n# Changed\n")
+    st = os.stat(src)
+    os.utime(src, (st.st_atime, st.st_mtime + 10))
+
+    # Changed modules are imported from the source
+    loaded = bundle.load(package, validate=validate)
+    assert loaded == ['bundled_views.pages.index']
+
+
+def test_bundle_missing(app, package, tmp_path):
+    assert bundle.load(package, str(tmp_path / 'missing.enamlb')) == []
+    with pytest.raises(ValueError):
+        bundle.load(package, validate='size')
+    with pytest.raises(ValueError):
+        bundle.build('os')
+
+
+def test_warm_up(app, package):
+    bundle.build(package)
+    bundle.load(package)
+    with enaml.imports():
+        from bundled_views.base import Layout
+    views = bundle.warm_up(Layout, message="Warm")
+    assert len(views) == 1
+    assert views[0].xpath('//h1')[0].text == "Warm"
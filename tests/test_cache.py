@@ -0,0 +1,256 @@
+import os
+import time
+import asyncio
+import pytest
+from utils import compile_source
+from textwrap import dedent
+from web.core import cache
+from web.core.app import WebApplication
+from web.core.streaming import stream
+from web.impl.cache import LRUCache, FileCache
+
+
+@pytest.fixture
+def app():
+    app = WebApplication.instance() or WebApplication()
+    yield app
+
+
+SOURCE = dedent("""
+import asyncio
+from web.components.api import *
+from web.core.api import *
+from web.core.streaming import Async
+
+async def fetch(value):
+    await asyncio.sleep(0.01)
+    if isinstance(value, Exception):
+        raise value
+    return value
+
+enamldef Page(Html): view:
+    attr key = "nav"
+    attr items = []
+    attr ttl = 0.0
+    attr storage = None
+    alias nav
+    Body:
+        Cache: nav:
+            key << view.key
+            ttl = view.ttl
+            storage = view.storage
+            tag = "nav"
+            Ul:
+                Looper:
+                    iterable << view.items
+                    Li:
+                        cls = "item"
+                        text = "Item {}".format(loop_item)
+                        tail = " "
+        P:
+            text = "Footer"
+
+enamldef Sections(Html): view:
+    attr storage = None
+    attr value = "Loaded"
+    alias nav
+    Body:
+        Cache: nav:
+            key = "sections"
+            storage = view.storage
+            Async:
+                loader = lambda: fetch(view.value)
+                placeholder = "<p>LOADING</p>"
+                fallback = "<p>FAILED</p>"
+                P:
+                    text = parent.result
+
+enamldef Default(Html): view:
+    alias nav
+    Body:
+        Cache: nav:
+            key = "default"
+            P:
+                text = "Default"
+""")
+
+
+@pytest.fixture
+def Page(app):
+    return compile_source(SOURCE, 'Page')
+
+
+@pytest.mark.parametrize('storage', ('lru', 'file'))
+def test_cache(Page, storage, tmp_path):
+    if storage == 'lru':
+        storage = LRUCache()
+    else:
+        storage = FileCache(directory=str(tmp_path))
+
+    # A miss builds the children and stores them when rendered
+    view = Page(items=[1, 2], storage=storage)
+    html = view.render()
+    assert 'Item 2' in html
+    assert view.nav.content is None
+    assert len(view.nav.children) == 1
+    assert storage.get(view.nav.cache_key()) is not None
+
+    # A hit inserts the stored content without building the children
+    view = Page(items=[1, 2, 3], storage=storage)
+    html = view.render()
+    assert 'Item 2' in html and 'Item 3' not in html
+    assert view.nav.content is not None
+    assert not view.nav.children
+    items = view.proxy.widget.xpath('//nav/ul/li')
+    assert [li.text for li in items] == ['Item 1', 'Item 2']
+    assert items[0].tail == " "
+
+    # Generated ids are not stored
+    assert all(li.get('id') is None for li in items)
+    assert view.proxy.widget.xpath('//nav')[0].get('id') == view.nav.id
+
+    # A different key is a miss
+    view = Page(items=[3], key="other", storage=storage)
+    assert 'Item 3' in view.render()
+
+
+@pytest.mark.parametrize('storage', ('lru', 'file'))
+def test_cache_ttl(Page, storage, tmp_path):
+    if storage == 'lru':
+        storage = LRUCache()
+    else:
+        storage = FileCache(directory=str(tmp_path))
+    view = Page(items=[1], ttl=0.05, storage=storage)
+    view.render()
+    view = Page(storage=storage)
+    view.render()
+    assert view.nav.content is not None
+    time.sleep(0.1)
+
+    # Expired entries are removed when looked up
+    key = view.nav.cache_key()
+    assert key in storage
+    assert view.nav.lookup() is None
+    assert key not in storage
+
+    view = Page(items=[2], storage=storage)
+    assert 'Item 2' in view.render()
+    assert view.nav.content is None
+
+
+def test_cache_disabled(Page):
+    storage = LRUCache()
+    view = Page(items=[1], key=None, storage=storage)
+    view.render()
+    assert len(storage) == 0
+
+    # Content larger than the limit is not stored
+    view = Page(items=list(range(10)), storage=storage)
+    view.nav.max_bytes = 10
+    view.render()
+    assert len(storage) == 0
+
+
+def render_stream(view):
+    async def main():
+        return ''.join([chunk async for chunk in stream(view)])
+    return asyncio.run(main())
+
+
+def test_cache_async_sections(app):
+    Sections = compile_source(SOURCE, 'Sections')
+    storage = LRUCache()
+
+    # The placeholder is not stored while the section is loading
+    view = Sections(storage=storage)
+    assert 'LOADING' in view.render()
+    assert len(storage) == 0
+
+    # A failed section is not stored
+    view = Sections(storage=storage, value=ValueError("No"))
+    assert 'FAILED' in render_stream(view)
+    assert len(storage) == 0
+
+    # The content is stored once the streamed sections are loaded
+    view = Sections(storage=storage)
+    assert 'Loaded' in render_stream(view)
+    assert len(storage) == 1
+
+    view = Sections(storage=storage, value="Other")
+    html = view.render()
+    assert view.nav.content is not None
+    assert 'Loaded' in html and 'LOADING' not in html
+
+
+def test_cache_default_storage(app):
+    Default = compile_source(SOURCE, 'Default')
+    cache.STORAGE.clear()
+    view = Default()
+    view.render()
+    assert view.nav.storage is cache.STORAGE
+    assert len(cache.STORAGE) == 1
+    cache.STORAGE.clear()
+
+
+def test_file_cache(tmp_path):
+    storage = FileCache(directory=str(tmp_path / 'cache'))
+    assert storage.get('a') is None
+    storage.set('a', (0, '<p>a</p>'), 8)
+    assert 'a' in storage
+    assert FileCache(directory=storage.directory).get('a') == (0, '<p>a</p>')
+
+    # Corrupt entries are treated as a miss
+    with open(storage.path('b'), 'wb') as f:
+        f.write(b'')
+    assert storage.get('b') is None
+
+    assert storage.pop('a') == (0, '<p>a</p>')
+    assert 'a' not in storage
+    assert storage.pop('a') is None
+
+    storage.clear()
+    assert storage.get('b') is None
+
+
+def test_file_cache_evict(tmp_path):
+    storage = FileCache(directory=str(tmp_path / 'cache'), max_bytes=100)
+    value = 'x' * 30
+    now = time.time()
+    for i, key in enumerate('abc'):
+        storage.set(key, value, len(value))
+        os.utime(storage.path(key), (now - 10 + i, now - 10 + i))
+
+    # Getting an entry marks it as recently used
+    assert storage.get('a') == value
+
+    # The least recently used entries are removed to stay within the limit
+    storage.set('d', value, len(value))
+    assert 'b' not in storage
+    assert all(k in storage for k in 'acd')
+    sizes = [f.stat().st_size for f in os.scandir(storage.directory)]
+    assert sum(sizes) <= storage.max_bytes
+
+    # Values larger than the limit are not stored
+    storage.set('e', 'x' * 200, 200)
+    assert 'e' not in storage
+
+
+def test_file_cache_directory(tmp_path):
+    # The default directory is private to the user
+    storage = FileCache()
+    assert str(os.getuid()) in os.path.basename(storage.directory)
+
+    # Directories others can write to are refused
+    directory = tmp_path / 'shared'
+    directory.mkdir()
+    directory.chmod(0o777)
+    storage = FileCache(directory=str(directory))
+    with pytest.raises(PermissionError):
+        storage.get('a')
+    with pytest.raises(PermissionError):
+        storage.set('a', (0, ''), 0)
+
+    # New directories are created with a private mode
+    storage = FileCache(directory=str(tmp_path / 'new'))
+    storage.set('a', (0, ''), 0)
+    assert os.stat(storage.directory).st_mode & 0o777 == 0o700
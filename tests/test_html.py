@@ -163,6 +163,85 @@ def test_raw(app):
     assert len(view.proxy.widget.xpath('/html/body/div/h1')) == 1
 
 
+
+def test_raw_cache(app):
+    from web.impl import lxml_raw
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr source = "<p>Cached <b>content</b></p>"
+        Body:
+            Raw:
+                source << view.source
+    """), 'Page')
+    lxml_raw.CACHE.clear()
+    a, b = Page(), Page()
+    a.render()
+    b.render()
+    assert len(lxml_raw.CACHE) == 1
+
+    # Each view gets it's own copy
+    a.proxy.widget.xpath('/html/body/div/p')[0].text = "Changed"
+    assert b.proxy.widget.xpath('/html/body/div/p')[0].text == "Cached "
+
+
+def test_raw_patches(app):
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr source = "<h1>Title</h1><p>One</p><p>Two</p>"
+        Body:
+            Raw: raw:
+                source << view.source
+    """), 'Page')
+    view = Page()
+    view.render()
+    raw = view.proxy.widget.xpath('/html/body/div')[0]
+    h1, one, two = raw
+    evts = []
+
+    def on_modified(change):
+        evts.append(change['value'])
+
+    view.observe('modified', on_modified)
+
+    # Only the changed paragraph is refreshed
+    view.source = "<h1>Title</h1><p>One changed</p><p>Two</p>"
+    assert evts == [{'id': one.get('id'), 'type': 'refresh',
+                     'name': 'source', 'value': 'One changed'}]
+    assert list(raw) == [h1, one, two]
+
+    # Blocks that differ are removed and added
+    del evts[:]
+    view.source = "<h1>Title</h1><ul><li>Item</li></ul><p>Two</p>"
+    assert [e['type'] for e in evts] == ['removed', 'added']
+    assert evts[0]['value'] == one.get('id')
+    assert evts[1]['before'] == two.get('id')
+    assert raw[1].tag == 'ul'
+    assert raw[0] is h1 and raw[2] is two
+
+    # When nothing is shared the whole node is refreshed
+    del evts[:]
+    view.source = "<p>New</p>"
+    assert [e['type'] for e in evts] == ['refresh']
+    assert evts[0]['id'] == raw.get('id')
+    assert 'New' in evts[0]['value']
+    assert len(raw) == 1
+
+    # Ids from the source are kept and a changed id replaces the block
+    view.source = '<h1>Title</h1><p id="a">Text</p>'
+    del evts[:]
+    view.source = '<h1>Title</h1><p id="b">Text</p>'
+    assert [e['type'] for e in evts] == ['removed', 'added']
+    assert evts[0]['value'] == 'a'
+    assert 'id="b"' in evts[1]['value']
+    assert raw[1].get('id') == 'b'
+
+
 def test_raw_proxy(app):
     # To make cov happy
     from web.components.raw import ProxyRawNode
@@ -195,6 +274,50 @@ def test_markdown(app):
     assert len(view.proxy.widget.xpath('/html/body/div/ul/li')) == 2
 
 
+
+def test_markdown_cache(app, monkeypatch):
+    from web.impl import lxml_md
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr source = "# Cached"
+        attr tab_length = 4
+        attr safe_mode = False
+        Body:
+            Markdown:
+                source << view.source
+                tab_length << view.tab_length
+                safe_mode << view.safe_mode
+    """), 'Page')
+    import markdown as md
+    calls = []
+    convert = md.markdown
+
+    def markdown(*args, **kwargs):
+        calls.append(args)
+        return convert(*args, **kwargs)
+
+    monkeypatch.setattr(md, 'markdown', markdown)
+    lxml_md.CACHE.clear()
+
+    # The same source is only converted once
+    views = [Page() for i in range(3)]
+    for view in views:
+        view.render()
+        assert len(view.proxy.widget.xpath('/html/body/div/h1')) == 1
+    assert len(calls) == 1
+
+    # Changing several options only converts once
+    view = views[0]
+    view.render(source="- Item 1\n- Item 2\n", tab_length=2, safe_mode=True)
+    assert len(calls) == 2
+    assert len(view.proxy.widget.xpath('/html/body/div/ul/li')) == 2
+
+    # Other views are not modified
+    assert len(views[1].proxy.widget.xpath('/html/body/div/h1')) == 1
+
 def test_markdown_proxy(app):
     # To make cov happy
     from web.components.md import ProxyMarkdown
@@ -236,6 +359,50 @@ def test_code(app):
     assert len(view.proxy.widget.xpath('/html/body/div/div/pre')) == 1
 
 
+
+def test_code_cache(app, monkeypatch):
+    from web.impl import lxml_code
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr source = "def foo(a, b):\\n    return a + b\\n"
+        attr language = ""
+        attr highlight_style = ""
+        Body:
+            Code:
+                language << view.language
+                highlight_style << view.highlight_style
+                source << view.source
+    """), 'Page')
+    from pygments import lexers
+    calls = []
+    guess = lexers.guess_lexer
+
+    def guess_lexer(source):
+        calls.append(source)
+        return guess(source)
+
+    monkeypatch.setattr(lexers, 'guess_lexer', guess_lexer)
+    lxml_code.CACHE.clear()
+
+    # The same source is only highlighted once
+    views = [Page() for i in range(3)]
+    for view in views:
+        view.render()
+        assert len(view.proxy.widget.xpath('/html/body/div/div/pre')) == 1
+    assert len(calls) == 1
+
+    # Changing the style and language only highlights once
+    view = views[0]
+    view.render(language='python', highlight_style='emacs')
+    assert len(calls) == 1
+    key = lxml_code.content_key(view.source, 'python', 'emacs')
+    assert key in lxml_code.CACHE
+    assert len(lxml_code.CACHE) == 2
+    assert lxml_code.get_formatter('emacs') is lxml_code.get_formatter('emacs')
+
 def test_code_proxy(app):
     # To make cov happy
     from web.components.code import ProxyCode
@@ -271,6 +438,90 @@ def test_notebook(app):
             view.render(version=3)
 
 
+
+def test_notebook_incremental(app):
+    import nbformat
+    from nbformat.v4 import new_notebook, new_markdown_cell
+    from web.impl import lxml_ipynb
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr source
+        attr incremental = True
+        Body:
+            Notebook:
+                incremental << view.incremental
+                source << view.source
+    """), 'Page')
+    cells = [new_markdown_cell("# Cell %s" % i) for i in range(3)]
+    nb = new_notebook(cells=cells)
+    view = Page()
+    view.render(source=nbformat.writes(nb))
+    nodes = view.proxy.widget.xpath('/html/body/div/div')
+    assert len(nodes) == 3
+    ids = [n.attrib['id'] for n in nodes]
+
+    evts = []
+
+    def on_modified(change):
+        evts.append(change['value'])
+
+    view.observe('modified', on_modified)
+
+    # Only the changed cell is updated
+    nb.cells[1] = new_markdown_cell("# Changed")
+    view.render(source=nbformat.writes(nb))
+    nodes = view.proxy.widget.xpath('/html/body/div/div')
+    assert len(nodes) == 3
+    assert nodes[0].attrib['id'] == ids[0] and nodes[2].attrib['id'] == ids[2]
+    assert nodes[1].xpath('.//h1')[0].text.startswith('Changed')
+    patches = [e for e in evts if e['name'] == 'children']
+    assert [p['type'] for p in patches] == ['removed', 'added']
+    assert patches[0]['value'] == ids[1]
+    assert patches[1]['before'] == ids[2]
+
+    # Full conversions are cached
+    lxml_ipynb.CACHE.clear()
+    view.render(incremental=False)
+    assert len(lxml_ipynb.CACHE) == 1
+    Page().render(source=view.source, incremental=False)
+    assert len(lxml_ipynb.CACHE) == 1
+
+
+def test_notebook_incremental_v3(app, monkeypatch):
+    import nbformat
+    from nbformat.v4 import new_notebook, new_markdown_cell
+    from web.impl import lxml_ipynb
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr source
+        attr version = 4
+        Body:
+            Notebook:
+                incremental = True
+                version << view.version
+                source << view.source
+    """), 'Page')
+    # Version 3 does not have cells so a full conversion is used
+    converted = []
+
+    def to_html(source, version):
+        converted.append(version)
+        return '<p>Converted</p>'
+
+    monkeypatch.setattr(lxml_ipynb, 'to_html', to_html)
+    lxml_ipynb.CACHE.clear()
+    nb = new_notebook(cells=[new_markdown_cell("# Cell")])
+    view = Page()
+    html = view.render(source=nbformat.writes(nb), version=3)
+    assert converted == [3]
+    assert 'Converted' in html
+
 def test_notebook_proxy(app):
     # To make cov happy
     from web.components.ipynb import ProxyNotebook
@@ -488,3 +739,478 @@ def test_node_moved(app):
     assert r == ['1', '3', '2', '6']
 
 
+
+
+def test_freeze(app):
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr menu: list = []
+        Body:
+            Ul:
+                Looper:
+                    iterable << view.menu
+                    Li:
+                        text = loop_item
+    """), 'Page')
+    view = Page()
+    expected = view.render(menu=['1', '2', '3'])
+    assert view.freeze() == expected
+    assert view.render() == expected
+    assert not view.children
+    assert view.proxy is None
+    with pytest.raises(RuntimeError):
+        view.xpath('//li')
+
+    # Keep the lxml tree
+    view = Page()
+    expected = view.freeze(keep_tree=True, menu=['1', '2'])
+    assert view.render() == expected
+    assert [li.text for li in view.xpath('/html/body/ul/li')] == ['1', '2']
+
+
+def test_offload(app):
+    import asyncio
+    from threading import Event
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr source = "# Offloaded"
+        Body:
+            Markdown:
+                offload = True
+                placeholder = "<p>Loading...</p>"
+                source << view.source
+    """), 'Page')
+    view = Page()
+
+    # Block the executor so the placeholder is rendered
+    done = Event()
+    app.executor.submit(done.wait, 5)
+    view.render()
+    assert view.proxy.widget.xpath('/html/body/div/p')[0].text == 'Loading...'
+    done.set()
+    view.render(wait=5)
+    assert len(view.proxy.widget.xpath('/html/body/div/h1')) == 1
+
+    # With an event loop the placeholder then the result are each applied
+    # in a single refresh
+    evts = []
+
+    def on_modified(change):
+        evts.append(change['value'])
+
+    view.observe('modified', on_modified)
+
+    async def update():
+        view.source = "# Updated offload"
+        while not any('Updated' in e['value'] for e in evts):
+            await asyncio.sleep(0.01)
+
+    asyncio.run(asyncio.wait_for(update(), 5))
+    assert [e['type'] for e in evts] == ['refresh', 'refresh']
+    assert 'Loading...' in evts[0]['value']
+    assert 'Updated offload' in evts[1]['value']
+    assert len(view.proxy.widget.xpath('/html/body/div/h1')) == 1
+
+
+def test_offload_error(app, monkeypatch):
+    from web.impl import lxml_md
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr source = "# Offloaded"
+        Body:
+            Markdown:
+                offload = True
+                placeholder = "<p>Loading...</p>"
+                fallback = "<p>Failed</p>"
+                source << view.source
+    """), 'Page')
+
+    def to_html(*args):
+        raise ValueError("Conversion failed")
+
+    # The error is logged and the fallback is displayed
+    monkeypatch.setattr(lxml_md, 'to_html', to_html)
+    lxml_md.CACHE.clear()
+    view = Page()
+    view.render(wait=5)
+    assert view.proxy.widget.xpath('/html/body/div/p')[0].text == 'Failed'
+    assert not view.proxy.futures
+
+
+def test_proxy_resolution(app):
+    from web.components.html import Div
+    from web.impl.lxml_toolkit_object import WebComponent
+
+    # Enamldef names must not resolve to a tag with the same name
+    Base = compile_source(dedent("""
+    from web.components.api import *
+
+    enamldef Base(Html):
+        Body:
+            Section:
+                text = "Content"
+    """), 'Base')
+    view = Base()
+    assert view.render()
+    assert view.xpath('//section')[0].text == "Content"
+
+    # The resolved class is cached by declaration class
+    proxy = type(view.proxy)
+    assert app.proxies[Base] is proxy
+    assert app.resolve_proxy_class(Base) is proxy
+
+    # Custom components only need to be registered once
+    class Card(Div):
+        pass
+
+    class CardComponent(WebComponent):
+        pass
+
+    app.resolve_proxy_class(Card)
+    assert app.proxies[Card] is WebComponent
+    app.register(Div, WebComponent)
+    assert Card not in app.proxies
+    app.register(Card, CardComponent)
+    assert isinstance(app.create_proxy(Card()), CardComponent)
+
+
+def test_view_shard(app):
+    from web.components.api import Html, Div
+    from web.core.app import shard_of
+    assert shard_of(Html().id) == ''
+    app.shard = 'w1'
+    try:
+        view = Html()
+        assert view.id.startswith('w1-')
+        assert shard_of(view.id) == 'w1'
+        assert '-' not in Div().id
+    finally:
+        app.shard = ''
+
+
+def test_class_style_patches(app):
+    from web.components.api import Html, Body, Div, ClassList, StyleMap
+    view = Html()
+    body = Body(parent=view)
+    div = Div(parent=body, cls=["a", "b"], style={"color": "red"})
+    assert isinstance(div.cls, ClassList)
+    assert isinstance(div.style, StyleMap)
+    view.render()
+    patches = []
+    view.observe('modified', lambda change: patches.append(change['value']))
+    node = div.proxy.widget
+
+    div.cls.add("active")
+    div.cls.add("active")
+    assert node.get('class') == "a b active"
+    div.cls.remove("a")
+    assert node.get('class') == "b active"
+    div.cls.toggle("active")
+    assert node.get('class') == "b"
+    assert patches == [
+        {'id': div.id, 'type': 'class_add', 'name': 'cls', 'value': 'active'},
+        {'id': div.id, 'type': 'class_remove', 'name': 'cls', 'value': 'a'},
+        {'id': div.id, 'type': 'class_remove', 'name': 'cls',
+         'value': 'active'},
+    ]
+
+    del patches[:]
+    div.style['color'] = 'blue'
+    div.style['color'] = 'blue'
+    div.style['float'] = 'left'
+    assert node.get('style') == "color:blue;float:left"
+    del div.style['color']
+    assert node.get('style') == "float:left"
+    assert patches == [
+        {'id': div.id, 'type': 'style_set', 'name': 'style', 'key': 'color',
+         'value': 'blue'},
+        {'id': div.id, 'type': 'style_set', 'name': 'style', 'key': 'float',
+         'value': 'left'},
+        {'id': div.id, 'type': 'style_set', 'name': 'style', 'key': 'color',
+         'value': None},
+    ]
+
+    # Assigning a new value only sends what changed if it is smaller
+    del patches[:]
+    div.cls = ["b", "c", "d"]
+    assert node.get('class') == "b c d"
+    assert [p['type'] for p in patches] == ['class_add', 'class_add']
+    del patches[:]
+    div.cls = "x"
+    assert node.get('class') == "x"
+    assert patches == [
+        {'id': div.id, 'type': 'update', 'name': 'cls', 'value': 'x'}]
+
+    # Full updates send the attribute value
+    del patches[:]
+    div.cls = "p q r s"
+    assert patches == [
+        {'id': div.id, 'type': 'update', 'name': 'cls', 'value': 'p q r s'}]
+    del patches[:]
+    div.style = {"float": "right", "color": "red", "margin": "0"}
+    assert patches == [
+        {'id': div.id, 'type': 'update', 'name': 'style',
+         'value': 'float:right;color:red;margin:0'}]
+    div.style = {"float": "left", "color": "red", "margin": "0"}
+    assert [p['key'] for p in patches[1:]] == ['float']
+    assert node.get('style') == "float:left;color:red;margin:0"
+
+
+def test_class_style_in_place(app):
+    from web.components.api import Html, Body, Div
+    view = Html()
+    div = Div(parent=Body(parent=view), cls="a b c", style={"color": "red"})
+    view.render()
+    patches = []
+    view.observe('modified', lambda change: patches.append(change['value']))
+    node = div.proxy.widget
+
+    def check(value):
+        assert node.get('class') == value
+        assert patches[-1] == {'id': div.id, 'type': 'update',
+                               'name': 'cls', 'value': value}
+
+    div.cls.insert(0, 'x')
+    check("x a b c")
+    div.cls[0] = 'zz'
+    check("zz a b c")
+    div.cls[1:3] = ['m', 'n']
+    check("zz m n c")
+    del div.cls[0]
+    check("m n c")
+    div.cls.sort()
+    check("c m n")
+    div.cls.reverse()
+    check("n m c")
+
+    # Removing a single class sends only that class
+    assert div.cls.pop() == 'c'
+    assert node.get('class') == "n m"
+    assert patches[-1] == {'id': div.id, 'type': 'class_remove',
+                           'name': 'cls', 'value': 'c'}
+    assert div.cls.pop(0) == 'n'
+    assert node.get('class') == "m"
+
+    del patches[:]
+    div.style |= {"color": "blue", "float": "left"}
+    assert node.get('style') == "color:blue;float:left"
+    assert [(p['type'], p['key']) for p in patches] == [
+        ('style_set', 'color'), ('style_set', 'float')]
+
+
+def test_attrs_patches(app):
+    from web.components.api import Html, Body, Div
+    view = Html()
+    data = '[%s]' % ','.join(['1'] * 1000)
+    div = Div(parent=Body(parent=view),
+              attrs={'data-traces': data, 'data-layout': '{}'})
+    view.render()
+    patches = []
+    view.observe('modified', lambda change: patches.append(change['value']))
+    node = div.proxy.widget
+    assert node.get('data-traces') == data
+
+    # Unchanged values are not sent and dropped keys are removed
+    div.attrs = {'data-traces': data, 'data-mode': 'lines'}
+    assert 'data-layout' not in node.attrib
+    assert node.get('data-mode') == 'lines'
+    assert patches == [
+        {'id': div.id, 'type': 'attr_delete', 'name': 'attrs',
+         'key': 'data-layout'},
+        {'id': div.id, 'type': 'attr_set', 'name': 'attrs',
+         'key': 'data-mode', 'value': 'lines'},
+    ]
+    del patches[:]
+    div.attrs = {}
+    assert 'data-traces' not in node.attrib
+    assert [p['type'] for p in patches] == ['attr_delete', 'attr_delete']
+
+
+FRAGMENT_SOURCE = dedent("""
+from web.components.api import *
+from web.core.api import *
+
+enamldef Base(Html): view:
+    alias content
+    alias links
+    attr rows = []
+    Head:
+        Title:
+            text = "Fragments"
+    Body:
+        Div:
+            id = "header"
+            text = "Header"
+        Block: content:
+            pass
+        Ul:
+            Looper: links:
+                iterable = range(100)
+                Li:
+                    text = str(loop_item)
+
+enamldef Page(Base): page:
+    Block:
+        block = page.content
+        Div:
+            id = "intro"
+            text = "Intro"
+        Div:
+            cls = "card"
+            Table:
+                id = "card-footer"
+                Looper:
+                    iterable << page.rows
+                    Tr:
+                        Td:
+                            text = str(loop_item)
+            Ul:
+                Looper:
+                    iterable = range(3)
+                    Li:
+                        id = "item-%s" % loop_item
+                        text = "Item %s" % loop_item
+""")
+
+
+@pytest.mark.parametrize('lazy', (False, True))
+def test_render_fragment(app, lazy):
+    from web.components.html import Tag
+    Page = compile_source(FRAGMENT_SOURCE, 'Page')
+    view = Page()
+    html = view.render_fragment('card-footer', lazy=lazy, rows=[1, 2])
+    assert html.startswith('<table id="card-footer">')
+    assert html.count('<tr') == 2
+    assert 'Intro' not in html and 'Header' not in html
+    assert view.render_fragment('item-1', lazy=lazy) == \
+        '<li id="item-1">Item 1</li>'
+    with pytest.raises(KeyError):
+        view.render_fragment('missing', lazy=lazy)
+
+    # Only the nodes of the fragments and their ancestors are initialized
+    initialized = [n for n in view.traverse()
+                   if isinstance(n, Tag) and n.is_initialized]
+    ids = {n.id for n in initialized}
+    if lazy:
+        assert 'header' not in ids and 'intro' not in ids
+        assert 'card-footer' in ids and 'item-1' in ids
+
+        # Patterns that do not bind an id are not searched
+        assert not view.links.is_initialized
+    else:
+        assert {'header', 'intro'} <= ids
+
+    # Bindings of a fragment still work
+    view.rows = [1, 2, 3]
+    html = view.render_fragment('card-footer', lazy=lazy)
+    assert html.count('<tr') == 3
+    assert html == view.render_fragment('card-footer', lazy=lazy)
+
+
+def test_render_fragment_frozen(app):
+    Page = compile_source(FRAGMENT_SOURCE, 'Page')
+    view = Page()
+    view.freeze(keep_tree=True, rows=[1])
+    assert view.render_fragment('item-2') == '<li id="item-2">Item 2</li>'
+
+
+def test_offload_function(app, caplog):
+    import asyncio
+    import threading
+    Page = compile_source(dedent("""
+    import threading
+    import time
+    from web.components.api import *
+    from web.core.api import *
+
+    def load(n):
+        time.sleep(0.2)
+        return (threading.current_thread(), list(range(n)))
+
+    enamldef Page(Html): view:
+        attr rows = []
+        attr threads = []
+        alias button
+        func show(result):
+            thread, rows = result
+            view.threads = [thread, threading.current_thread()]
+            view.rows = rows
+        Body:
+            Button: button:
+                clicked :: view.offload(load, 3, callback=show)
+            P:
+                text << "Loading" if view.busy else "%s rows" % len(view.rows)
+            Ul:
+                Looper:
+                    iterable << view.rows
+                    Li:
+                        text = str(loop_item)
+    """), 'Page')
+    view = Page()
+    view.render()
+    patches = []
+    view.observe('modified', lambda change: patches.append(change['value']))
+
+    async def main():
+        ticks = 0
+        future = view.offload(lambda: None)
+        view.button.clicked()
+        assert view.busy
+        assert patches[-1]['value'] == "Loading"
+
+        # The loop is not blocked
+        while view.busy:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert future.done()
+        return ticks
+
+    ticks = asyncio.run(main())
+    assert ticks > 5
+    assert not view.busy
+
+    # Only the function runs in the executor, the result is applied on the
+    # loop thread and the changes are sent in one batch
+    assert view.threads[0] is not threading.main_thread()
+    assert view.threads[1] is threading.main_thread()
+    types = [p['type'] for p in patches]
+    assert types[-1] == 'update'  # The busy change
+    assert types.count('batch') == 1
+    batch = patches[types.index('batch')]['value']
+    assert len([p for p in batch if p['type'] == 'added']) == 3
+    assert patches[-1]['value'] == "3 rows"
+    assert len(view.xpath('//li')) == 3
+
+    # Errors are logged once and the future completes with None
+    def fail():
+        raise ValueError("Failed")
+
+    async def failed():
+        future = view.offload(fail, callback=view.show)
+        assert await future is None
+        assert not view.busy
+
+        # A cancelled future is ignored
+        future = view.offload(lambda: (None, [0]), callback=view.show)
+        future.cancel()
+        while view.busy:
+            await asyncio.sleep(0.01)
+        assert view.rows == [0]
+
+    asyncio.run(failed())
+    errors = [r for r in caplog.records if r.levelname == 'ERROR']
+    assert len(errors) == 1
+    assert 'Offloaded function' in errors[0].getMessage()
+
+    # Without a loop the function is run immediately
+    assert view.offload(lambda: (None, [1]), callback=view.show) is None
+    assert len(view.xpath('//li')) == 1
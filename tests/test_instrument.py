@@ -0,0 +1,55 @@
+import pytest
+from textwrap import dedent
+from utils import compile_source
+from web.core.app import WebApplication
+from web.core.instrument import instrument
+
+
+@pytest.fixture
+def app():
+    app = WebApplication.instance() or WebApplication()
+    yield app
+
+
+def test_instrument(app):
+    Page = compile_source(dedent("""
+    from web.components.api import *
+    from web.core.api import *
+
+    enamldef Page(Html): view:
+        attr menu: list = []
+        Body:
+            Ul:
+                Looper:
+                    iterable << view.menu
+                    Li:
+                        text = loop_item
+            Raw:
+                source = "<p>Raw</p>"
+    """), 'Page')
+    from web.impl.lxml_toolkit_object import WebComponent
+    render = WebComponent.render
+
+    with instrument() as collector:
+        view = Page()
+        view.render(menu=['1', '2', '3'])
+        view.menu = ['1', '2']
+
+    # Hooks are removed when not in use
+    assert WebComponent.render is render
+
+    stats = collector.to_dict()
+    assert stats['activate_top_down']['Li']['count'] == 3
+    assert stats['activate_top_down']['Page']['count'] == 1
+    # Super calls of Raw are not counted twice
+    assert stats['init_widget']['Raw']['count'] == 1
+    assert stats['render']['Page']['count'] == 1
+    assert stats['render']['Page']['nodes'] == 8
+    assert stats['_notify_modified']['Ul']['count'] == 1
+
+    text = collector.to_prometheus()
+    assert 'enaml_web_calls_total{hook="render",declaration="Page"} 1' in text
+
+    # Nothing is recorded outside of the context
+    view.render(menu=['1'])
+    assert collector.to_dict() == stats
@@ -0,0 +1,214 @@
+import gzip
+import zlib
+import asyncio
+import threading
+import pytest
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from web.core.app import WebApplication
+from web.core.responses import (
+    ResponseCache, etag_matches, parse_accept_encoding, tornado_respond,
+    aiohttp_respond
+)
+
+
+@pytest.fixture
+def app():
+    app = WebApplication.instance() or WebApplication()
+    yield app
+
+
+def create_view():
+    from web.components.api import Html, Body, H1, P
+    view = Html()
+    body = Body(parent=view)
+    H1(parent=body, text="Hello")
+    for i in range(50):
+        P(parent=body, text="Paragraph %s" % i)
+    return view
+
+
+def test_response_cache(app):
+    view = create_view()
+    cache = ResponseCache()
+    status, headers, body = cache.respond(view)
+    assert status == 200
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert b'Hello' in body
+    etag = headers['ETag']
+
+    # Not rendered again if the view is unchanged
+    response = cache.get(view)
+    assert cache.respond(view)[2] is response.body
+    assert cache.respond(view, {'If-None-Match': etag}) == (304, {
+        'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'
+    }, b'')
+    assert cache.respond(view, {'if-none-match': 'W/%s' % etag})[0] == 304
+
+    # Compressed variants are created once
+    status, headers, gz = cache.respond(view, {'Accept-Encoding': 'gzip'})
+    assert headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gz) == body
+    assert cache.respond(view, {'Accept-Encoding': 'gzip'})[2] is gz
+    status, headers, d = cache.respond(
+        view, {'Accept-Encoding': 'gzip;q=0.5, deflate'})
+    assert headers['Content-Encoding'] == 'deflate'
+    assert zlib.decompress(d) == body
+
+    # Modifying the view changes the etag
+    view.children[0].children[0].text = "Changed"
+    status, headers, body = cache.respond(view, {'If-None-Match': etag})
+    assert status == 200 and b'Changed' in body
+    assert headers['ETag'] != etag
+
+    # Attributes passed are set first
+    status, headers, body = cache.respond(view, cls="dark")
+    assert b'class="dark"' in body
+
+    cache.discard(view)
+    assert len(cache.cache) == 0
+    assert cache.cache.size == 0
+    assert not cache.versions and not cache.observers
+
+    # After discarding each change is only counted once
+    cache.respond(view)
+    view.children[0].children[0].text = "Again"
+    assert cache.versions[view.id] == 1
+
+    # Destroying the view discards it
+    view.destroy()
+    assert not cache.versions and not cache.observers
+    assert len(cache.cache) == 0
+
+
+def test_response_cache_version(app):
+    view = create_view()
+    cache = ResponseCache(etag='version', min_size=10**6)
+    status, headers, body = cache.respond(view, {'Accept-Encoding': 'gzip'})
+    assert headers['ETag'] == '"%s-0"' % view.id
+    assert 'Content-Encoding' not in headers
+    view.children[0].children[0].text = "Changed"
+    assert cache.respond(view)[1]['ETag'] == '"%s-1"' % view.id
+
+
+def test_response_cache_pending(app):
+    pytest.importorskip('markdown')
+    from web.components.api import Html, Body, Markdown
+    view = Html()
+    md = Markdown(parent=Body(parent=view), source="# One")
+    cache = ResponseCache()
+    assert b'One' in cache.respond(view)[2]
+
+    # Changes that are applied when rendering are included
+    md.source = "# Two"
+    body = cache.respond(view)[2]
+    assert b'Two' in body and b'One' not in body
+
+
+def test_headers():
+    assert parse_accept_encoding('gzip, deflate;q=0.5, br;q=x') == {
+        'gzip': 1.0, 'deflate': 0.5, 'br': 0.0}
+    assert etag_matches('"a"', '"b", "a"')
+    assert etag_matches('"a"', '*')
+    assert not etag_matches('"a"', None)
+    cache = ResponseCache()
+    assert cache.choose_encoding('gzip;q=0, *', 1000) == 'deflate'
+    assert cache.choose_encoding('br', 1000) is None
+    assert cache.choose_encoding('gzip', 10) is None
+
+
+def test_stub_server(app):
+    view = create_view()
+    cache = ResponseCache()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, headers, body = cache.respond(view, self.headers)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        def get(**headers):
+            conn = HTTPConnection('127.0.0.1', server.server_port, timeout=5)
+            try:
+                conn.request('GET', '/', headers=headers)
+                r = conn.getresponse()
+                return r.status, r.getheader('ETag'), r.read()
+            finally:
+                conn.close()
+
+        status, etag, body = get(**{'Accept-Encoding': 'gzip'})
+        assert status == 200 and b'Hello' in gzip.decompress(body)
+        assert get(**{'If-None-Match': etag}) == (304, etag, b'')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_tornado_adapter(app):
+    pytest.importorskip('tornado')
+    from tornado.web import Application, RequestHandler
+    from tornado.httpserver import HTTPServer
+    from tornado.testing import bind_unused_port
+    from tornado.httpclient import AsyncHTTPClient
+    view = create_view()
+    cache = ResponseCache()
+
+    class Handler(RequestHandler):
+        def get(self):
+            tornado_respond(self, view, cache)
+
+    async def main():
+        sock, port = bind_unused_port()
+        server = HTTPServer(Application([('/', Handler)]))
+        server.add_sockets([sock])
+        client = AsyncHTTPClient()
+        url = 'http://127.0.0.1:%s/' % port
+        try:
+            r = await client.fetch(url, decompress_response=False,
+                                   headers={'Accept-Encoding': 'gzip'})
+            assert r.headers['Content-Encoding'] == 'gzip'
+            assert b'Hello' in gzip.decompress(r.body)
+            r = await client.fetch(url, raise_error=False, headers={
+                'If-None-Match': r.headers['ETag']})
+            assert r.code == 304
+        finally:
+            server.stop()
+    asyncio.run(main())
+
+
+def test_aiohttp_adapter(app):
+    pytest.importorskip('aiohttp')
+    from aiohttp.test_utils import make_mocked_request
+    view = create_view()
+    cache = ResponseCache()
+    request = make_mocked_request('GET', '/', headers={
+        'Accept-Encoding': 'deflate'})
+    response = aiohttp_respond(request, view, cache)
+    assert response.status == 200
+    assert response.headers['Content-Encoding'] == 'deflate'
+    request = make_mocked_request('GET', '/', headers={
+        'If-None-Match': response.headers['ETag']})
+    assert aiohttp_respond(request, view, cache).status == 304
+
+
+def test_runner_adapter(app):
+    from web.core.runner import Request
+    from web.core.responses import runner_respond
+    view = create_view()
+    cache = ResponseCache()
+    response = runner_respond(Request(), view, cache)
+    assert response.status == 200 and b'Hello' in response.body
+    request = Request(headers={'if-none-match': response.headers['ETag']})
+    response = runner_respond(request, view, cache)
+    assert response.status == 304 and response.body == b''
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import socket
+import subprocess
+import pytest
+from textwrap import dedent
+from http.client import HTTPConnection
+from web.core.runner import (
+    Request, RequestTooLarge, Response, Runner, merge_stats, read_request,
+    to_response
+)
+
+
+SERVER = dedent("""
+import sys
+import json
+from web.core.runner import Runner
+
+page = None
+
+def setup():
+    global page
+    from web.components.api import Html, Body, H1
+    page = Html()
+    H1(parent=Body(parent=page), text="Hello")
+    page.render()
+
+def handler(request):
+    if request.path == '/error':
+        raise ValueError("Error")
+    return (200, {'X-Pid': str(os.getpid())}, page.render())
+
+import os
+runner = Runner(handler=handler, setup=setup, port=0, workers=2,
+                stats_interval=0.1, instrument=True)
+runner.observe('socket', lambda change: print(
+    runner.address[1], flush=True) if change['value'] else None)
+print(json.dumps(runner.run()), flush=True)
+""")
+
+
+ROUTER = dedent("""
+import os
+import sys
+import json
+from web.core.runner import Runner
+
+VIEWS = {}
+
+def handler(request):
+    from web.components.api import Html
+    if request.path == '/':
+        view = Html()
+        view.render()
+        VIEWS[view.id] = view
+        return view.id
+    ref = request.arguments['ref'][0]
+    if ref not in VIEWS:
+        return (404, {}, "Viewer %s does not exist" % ref)
+    return str(os.getpid())
+
+runner = Runner(handler=handler, port=0, workers=4, stats_interval=0.1,
+                socket_dir=sys.argv[1])
+runner.observe('socket', lambda change: print(
+    runner.address[1], flush=True) if change['value'] else None)
+print(json.dumps(runner.run()), flush=True)
+""")
+
+
+class UnixConnection(HTTPConnection):
+    def __init__(self, path):
+        super(UnixConnection, self).__init__('localhost', timeout=5)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def get(port, path='/'):
+    if isinstance(port, int):
+        conn = HTTPConnection('127.0.0.1', port, timeout=5)
+    else:
+        conn = UnixConnection(port)
+    try:
+        conn.request('GET', path)
+        r = conn.getresponse()
+        return r.status, r.getheader('X-Pid'), r.read()
+    finally:
+        conn.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="Requires fork")
+def test_runner():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = root
+    proc = subprocess.Popen((sys.executable, '-c', SERVER), env=env,
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        port = int(proc.stdout.readline())
+        requests = 0
+        pids = set()
+        for i in range(10):
+            status, pid, body = get(port)
+            requests += 1
+            assert status == 200
+            assert b'<h1' in body and b'Hello' in body
+            pids.add(pid)
+        assert get(port, '/error')[0] == 500
+        requests += 1
+
+        # Old workers finish and new ones take over
+        proc.send_signal(signal.SIGHUP)
+        start = time.time()
+        while True:
+            status, pid, body = get(port)
+            requests += 1
+            assert status == 200
+            if pid not in pids:
+                break
+            assert time.time() - start < 10
+        proc.send_signal(signal.SIGTERM)
+        stats = json.loads(proc.stdout.readline())
+        assert proc.wait(10) == 0
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+
+    # Each worker sends it's stats before exiting
+    assert len(stats['workers']) == 4
+    total = stats['total']
+    assert total['requests'] == requests
+    assert total['errors'] == 1
+    assert total['hooks']['render']['Html']['count'] == requests - 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="Requires fork")
+def test_runner_routing(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = root
+    proc = subprocess.Popen((sys.executable, '-c', ROUTER, str(tmp_path)),
+                            env=env, stdout=subprocess.PIPE,
+                            universal_newlines=True)
+    try:
+        port = int(proc.stdout.readline())
+        start = time.time()
+        while len(os.listdir(str(tmp_path))) < 4:
+            assert time.time() - start < 10
+            time.sleep(0.05)
+
+        # Create a view in each worker
+        views = {}
+        for name in os.listdir(str(tmp_path)):
+            status, pid, body = get(str(tmp_path / name))
+            assert status == 200
+            shard = name.split('.')[0]
+            view_id = body.decode()
+            assert view_id.startswith('%s-' % shard)
+            views[view_id] = shard
+
+        # Whichever worker accepts it the request goes to the owner
+        for i in range(3):
+            for view_id, shard in views.items():
+                status, pid, body = get(port, '/view?ref=%s' % view_id)
+                assert status == 200
+                assert body.decode() == shard
+        assert get(port, '/view?ref=1-missing')[0] == 404
+
+        # Refs that are not a worker are handled locally
+        for ref in ('../../etc/evil-1', '/var/run/docker-1', '%s0-1' % shard):
+            assert get(port, '/view?ref=%s' % ref)[0] == 404
+        proc.send_signal(signal.SIGTERM)
+        stats = json.loads(proc.stdout.readline())
+        assert proc.wait(10) == 0
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+
+    total = stats['total']
+    assert total['requests'] == 20
+    assert total['forwarded'] > 0
+    assert not os.listdir(str(tmp_path))
+
+
+def test_runner_owner(tmp_path):
+    runner = Runner(socket_dir=str(tmp_path))
+
+    def owner(ref):
+        return runner.owner(Request(arguments={'ref': [ref]}))
+
+    assert owner('123-abc') == '123'
+    assert owner('../../etc/evil-1') == ''
+    assert owner('/var/run/docker-1') == ''
+    assert owner('abc') == ''
+    assert runner.owner(Request()) == ''
+
+    # Only shards with a socket in the socket dir are workers
+    assert not runner.is_worker('123')
+    (tmp_path / '123.sock').write_text('')
+    assert not runner.is_worker('123')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(runner.socket_path('124'))
+        assert runner.is_worker('124')
+    finally:
+        sock.close()
+    assert not runner.is_worker('../124')
+
+
+def test_read_request():
+    async def read(data, max_body=None):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_request(reader, max_body)
+
+    loop = asyncio.new_event_loop()
+    try:
+        request = loop.run_until_complete(read(
+            b'POST /view/?ref=1&ref=2 HTTP/1.0\r\nContent-Length: 4\r\n'
+            b'Connection: keep-alive\r\n\r\ndata'))
+        assert request.method == 'POST'
+        assert request.path == '/view/'
+        assert request.arguments == {'ref': ['1', '2']}
+        assert request.body == b'data'
+        assert request.keep_alive
+        assert loop.run_until_complete(read(b'')) is None
+        with pytest.raises(ValueError):
+            loop.run_until_complete(read(b'GET\r\n\r\n'))
+
+        # The body size is limited
+        data = b'POST / HTTP/1.1\r\nContent-Length: 4\r\n\r\ndata'
+        assert loop.run_until_complete(read(data, 4)).body == b'data'
+        with pytest.raises(RequestTooLarge):
+            loop.run_until_complete(read(data, 3))
+    finally:
+        loop.close()
+
+
+def test_response():
+    response = to_response((404, {'X-Test': '1'}, 'Missing'))
+    assert response.encode() == (
+        b'HTTP/1.1 404 Not Found\r\nContent-Type: text/html; charset=utf-8\r\n'
+        b'X-Test: 1\r\nContent-Length: 7\r\n\r\nMissing')
+    assert to_response(b'Ok').body == b'Ok'
+    r = Response()
+    assert to_response(r) is r
+    stats = merge_stats({'a': 1, 'b': {'c': 1}}, {'a': 2, 'b': {'c': 1, 'd': 1}})
+    assert stats == {'a': 3, 'b': {'c': 2, 'd': 1}}
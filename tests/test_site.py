@@ -0,0 +1,134 @@
+import os
+import sys
+import enaml
+import pytest
+from textwrap import dedent
+from web.core.site import Site, Page
+from web.core.app import WebApplication
+
+
+@pytest.fixture
+def app():
+    app = WebApplication.instance() or WebApplication()
+    yield app
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    """ Create a package with a base layout and an article view """
+    name = 'site_views'
+    pkg = tmp_path / name
+    pkg.mkdir()
+    (pkg / '__init__.py').write_text("")
+    (pkg / 'base.enaml').write_text(dedent("""
+    from web.components.api import *
+
+    enamldef Layout(Html): view:
+        attr title = ""
+        Head:
+            Title:
+                text << view.title
+    """))
+    (pkg / 'article.enaml').write_text(dedent("""
+    from web.components.api import *
+    from site_views.base import Layout
+
+    enamldef Article(Layout): view:
+        Body:
+            H1:
+                text << view.title
+    """))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield pkg
+    for mod in list(sys.modules):
+        if mod.startswith(name):
+            del sys.modules[mod]
+
+
+def test_site_build(app, package, tmp_path):
+    with enaml.imports():
+        from site_views.article import Article
+    data = tmp_path / 'data.txt'
+    data.write_text("1")
+    output = str(tmp_path / 'out')
+
+    def pages(**titles):
+        return [Page(path=path, view=Article, kwargs={'title': title},
+                     inputs=[str(data)] if path == 'a.html' else [])
+                for path, title in titles.items()]
+
+    site = Site(output=output, workers=1,
+                pages=pages(**{'a.html': 'A', 'b.html': 'B', 'c.html': 'C'}))
+    result = site.build()
+    assert sorted(result.rendered) == ['a.html', 'b.html', 'c.html']
+    assert sorted(result.written) == ['a.html', 'b.html', 'c.html']
+    with open(os.path.join(output, 'b.html')) as f:
+        assert '<h1' in f.read()
+
+    # Nothing changed
+    result = site.build()
+    assert result.rendered == []
+
+    # Only the page with different data is built
+    site.pages = pages(**{'a.html': 'A', 'b.html': 'B2', 'c.html': 'C'})
+    assert site.build().rendered == ['b.html']
+
+    # A template changed but the output is the same
+    base = str(package / 'base.enaml')
+    st = os.stat(base)
+    os.utime(base, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    result = site.build()
+    assert sorted(result.rendered) == ['a.html', 'b.html', 'c.html']
+    assert result.written == []
+
+    # A data input changed
+    data.write_text("22")
+    assert site.build().rendered == ['a.html']
+
+    # Removed pages are cleaned up
+    site.pages = pages(**{'a.html': 'A', 'b.html': 'B2'})
+    result = site.build()
+    assert result.rendered == [] and result.removed == ['c.html']
+    assert not os.path.exists(os.path.join(output, 'c.html'))
+
+
+def test_site_changed_during_build(app, package, tmp_path, monkeypatch):
+    from web.core import site as site_module
+    with enaml.imports():
+        from site_views.article import Article
+    output = str(tmp_path / 'out')
+    site = Site(output=output, workers=1, pages=[
+        Page(path='a.html', view=Article, kwargs={'title': 'A'})])
+    base = str(package / 'base.enaml')
+
+    # The template is edited after the page was rendered but before the
+    # build finished
+    file_hash = site_module.file_hash
+
+    def edit(path):
+        st = os.stat(base)
+        os.utime(base, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        return file_hash(path)
+
+    monkeypatch.setattr(site_module, 'file_hash', edit)
+    assert site.build().rendered == ['a.html']
+    monkeypatch.setattr(site_module, 'file_hash', file_hash)
+
+    # So the page is rebuilt by the next build
+    assert site.build().rendered == ['a.html']
+    assert site.build().rendered == []
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="Requires fork")
+def test_site_build_parallel(app, package, tmp_path):
+    output = str(tmp_path / 'out')
+    site = Site(output=output, workers=2, chunksize=2, pages=[
+        Page(path='%s/index.html' % i, view='site_views.article:Article',
+             kwargs={'title': str(i)}) for i in range(10)
+    ] + [Page(path='error.html', view='site_views.article:Missing')])
+    result = site.build()
+    assert len(result.rendered) == 10
+    assert list(result.errors) == ['error.html']
+    with open(os.path.join(output, '9', 'index.html')) as f:
+        assert '9</h1>' in f.read()
+    assert site.build().rendered == []
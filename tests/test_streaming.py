@@ -0,0 +1,232 @@
+import time
+import asyncio
+import pytest
+from utils import compile_source
+from textwrap import dedent
+from web.core.app import WebApplication
+from web.core.streaming import stream, section_chunk, SWAP_SCRIPT
+
+
+@pytest.fixture
+def app():
+    app = WebApplication.instance() or WebApplication()
+    yield app
+
+
+SOURCE = dedent("""
+import time
+import asyncio
+from web.components.api import *
+from web.core.api import *
+
+async def fetch(value, delay):
+    await asyncio.sleep(delay)
+    if isinstance(value, Exception):
+        raise value
+    return value
+
+def fetch_sync(value, delay):
+    time.sleep(delay)
+    return value
+
+enamldef Page(Html): view:
+    attr slow = 0.2
+    attr fast = 0.05
+    alias orders
+    alias users
+    alias failed
+    Head:
+        Link:
+            rel = "stylesheet"
+            href = "/static/app.css"
+    Body:
+        H1:
+            text = "Dashboard"
+        Async: orders:
+            loader = lambda: fetch(["a", "b"], view.slow)
+            placeholder = "<p class='loading'>Loading orders</p>"
+            Ul:
+                Looper:
+                    iterable << orders.result or []
+                    Li:
+                        text = loop_item
+        Async: users:
+            loader = lambda: fetch_sync(3, view.fast)
+            offload = True
+            placeholder = "<p class='loading'>Loading users</p>"
+            P:
+                cls = "users"
+                text << "{} users".format(users.result)
+                Async: nested:
+                    tag = "span"
+                    loader = lambda: fetch("Nested", 0.01)
+                    Span:
+                        text = nested.result
+        Async: failed:
+            loader = lambda: fetch(ValueError("No"), 0.01)
+            fallback = "<p class='error'>Failed</p>"
+            P:
+                text = "Never"
+""")
+
+
+def collect(view, **kwargs):
+    async def main():
+        chunks = []
+        async for chunk in stream(view, **kwargs):
+            chunks.append((asyncio.get_running_loop().time(), chunk))
+        return chunks
+    return asyncio.run(main())
+
+
+def test_stream(app):
+    Page = compile_source(SOURCE, 'Page')
+    view = Page()
+    chunks = collect(view)
+    start = chunks[0][0]
+    html = [c for t, c in chunks]
+
+    # The head and the placeholders are sent before any section loads
+    assert html[0].endswith('</head>') and 'app.css' in html[0]
+    assert 'Loading orders' in html[1] and 'Loading users' in html[1]
+    assert chunks[1][0] - start < 0.05
+    assert html[2] == SWAP_SCRIPT
+    assert html[-1] == '</body></html>'
+
+    # Sections are sent as they load, nested sections after their parent
+    sections = html[3:-1]
+    ids = [c.split('"')[1][:-len('-content')] for c in sections]
+    assert ids == [view.failed.id, view.users.id,
+                   view.users.children[0].children[0].id, view.orders.id]
+    assert "Failed" in sections[0]
+    assert "3 users" in sections[1]
+    assert "Nested" in sections[2]
+    assert sections[3].count('<li') == 2
+
+    # Total time is the slowest section not the sum
+    assert chunks[-1][0] - start < 0.2 + 0.15
+
+    # The view now has the content
+    assert view.orders.result == ["a", "b"]
+    assert len(view.xpath('//li')) == 2
+    assert isinstance(view.failed.error, ValueError)
+
+
+def test_stream_timeout(app):
+    Page = compile_source(SOURCE, 'Page')
+    view = Page(slow=5)
+    chunks = collect(view, timeout=0.2)
+    assert chunks[-1][0] - chunks[0][0] < 1
+    assert view.orders.loaded
+    assert isinstance(view.orders.error, asyncio.TimeoutError)
+
+
+def test_async_load(app):
+    Page = compile_source(SOURCE, 'Page')
+    view = Page(slow=0.01)
+    html = view.render()
+    assert 'Loading orders' in html and '<li>' not in html
+    patches = []
+    view.observe('modified', lambda change: patches.append(change['value']))
+
+    asyncio.run(view.orders.load())
+    assert len(view.xpath('//li')) == 2
+    assert 'Loading orders' not in view.render()
+    assert [p['type'] for p in patches] == ['refresh']
+    assert patches[0]['id'] == view.orders.id
+
+
+ATTRS_SOURCE = dedent("""
+from web.components.api import *
+from web.core.api import *
+
+enamldef Report(Html): view:
+    attr orders = []
+    attr user = None
+    Body:
+        P:
+            text << "User {}".format(view.user)
+        Ul:
+            Looper:
+                iterable << view.orders
+                Li:
+                    text = str(loop_item)
+""")
+
+
+async def delayed(value, delay):
+    await asyncio.sleep(delay)
+    return value
+
+
+def blocking(value, delay):
+    time.sleep(delay)
+    return value
+
+
+def test_render_async(app):
+    Report = compile_source(ATTRS_SOURCE, 'Report')
+
+    async def main():
+        view = Report()
+        start = time.monotonic()
+        html = await view.render_async(
+            orders=delayed([1, 2], 0.2),
+            user=app.run_in_executor(blocking, "alice", 0.2))
+        return html, time.monotonic() - start
+
+    html, elapsed = asyncio.run(main())
+    assert 'User alice' in html and html.count('<li') == 2
+    assert elapsed < 0.35  # Not the sum of both
+
+    # Sections are loaded after the attrs
+    Page = compile_source(SOURCE, 'Page')
+    view = Page(slow=0.01)
+    html = asyncio.run(view.render_async())
+    assert html.count('<li id') == 2 and 'Loading' not in html
+    assert 'Failed' in html and 'Nested' in html
+
+
+def test_render_async_timeout(app):
+    Report = compile_source(ATTRS_SOURCE, 'Report')
+    view = Report()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(view.render_async(timeout=0.05, orders=delayed([1], 5)))
+
+    # Sections that time out display their fallback
+    Page = compile_source(SOURCE, 'Page')
+    view = Page(slow=5)
+    html = asyncio.run(view.render_async(timeout=0.2))
+    assert isinstance(view.orders.error, asyncio.TimeoutError)
+    assert '3 users' in html
+
+
+def test_render_awaitable_attrs(app):
+    Report = compile_source(ATTRS_SOURCE, 'Report')
+
+    # Without an event loop the values are awaited
+    view = Report()
+    html = view.render(orders=delayed([1], 0.01), user=delayed("bob", 0.01))
+    assert 'User bob' in html and html.count('<li') == 1
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            Report().render(orders=delayed([1], 0.01))
+    asyncio.run(main())
+
+
+def test_section_chunk(app):
+    from web.core.streaming import Async, ProxyAsync
+
+    class Proxy(ProxyAsync):
+        def content(self):
+            return '<p>x</p>'
+
+    # The id is escaped in the attribute and the script
+    section = Async(id='a"></template><script>alert(1)</script>')
+    section.proxy = Proxy()
+    chunk = section_chunk(section)
+    assert chunk.count('<script>') == 1
+    assert chunk.count('</template>') == 1
+    assert '&quot;' in chunk
+    assert '\\u003c/script\\u003e' in chunk
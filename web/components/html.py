@@ -11,14 +11,35 @@ Created on Apr 2, 2017
 """
 
 from __future__ import print_function
+import sys
+import logging
+import inspect
+from copy import deepcopy
 from atom.api import (
-    Atom, Event, Enum, ContainerList, Value, Int, Str, Dict, Instance,
-    ForwardTyped, Typed, Coerced, observe, set_default
+    Atom, Bool, Event, Enum, ContainerList, Value, Int, Str, Dict,
+    Instance, ForwardTyped, Typed, Coerced, observe, set_default, atomref
 )
 
+from enaml.application import Application
+from enaml.core.compiler_nodes import DeclarativeNode
 from enaml.core.declarative import d_
+from enaml.core.pattern import Pattern
 from enaml.widgets.toolkit_object import ToolkitObject, ProxyToolkitObject
 
+log = logging.getLogger('web')
+
+
+def running_loop():
+    """ Get the running event loop or None if there isn't one """
+    # There cannot be a loop if asyncio was never imported
+    asyncio = sys.modules.get('asyncio')
+    if asyncio is None:
+        return None
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
 
 class ProxyTag(ProxyToolkitObject):
     declaration = ForwardTyped(lambda: Tag)
@@ -32,6 +53,261 @@ class ProxyTag(ProxyToolkitObject):
         raise NotImplementedError
 
 
+class ClassList(list):
+    """ A list of css classes that updates the tag it belongs to when
+    classes are added or removed.
+
+    Use `add`, `remove`, `discard` or `toggle` to change a single class
+    without resending the whole class attribute to the client. Other changes
+    in place (ie `insert`, `sort` or setting an index) resend the whole
+    attribute.
+
+    """
+    __slots__ = ('owner',)
+
+    def __init__(self, items=(), owner=None):
+        if isinstance(items, str):
+            items = items.split()
+        elif items is None:
+            items = ()
+        elif not isinstance(items, (list, tuple)):
+            items = str(items).split()
+        super(ClassList, self).__init__(str(c) for c in items)
+        self.owner = atomref(owner) if owner is not None else None
+
+    def _notify(self, type, name):
+        owner = self.owner() if self.owner is not None else None
+        if owner is not None:
+            owner._update_item({'type': type, 'name': 'cls', 'value': name})
+
+    def _notify_all(self):
+        owner = self.owner() if self.owner is not None else None
+        if owner is not None:
+            owner._update_value('cls')
+
+    def add(self, name):
+        """ Add the class if it is not already present """
+        if name not in self:
+            super(ClassList, self).append(name)
+            self._notify('class_add', name)
+
+    def remove(self, name):
+        """ Remove the class. A ValueError is raised if it is not present """
+        super(ClassList, self).remove(name)
+        self._notify('class_remove', name)
+
+    def discard(self, name):
+        """ Remove the class if it is present """
+        if name in self:
+            self.remove(name)
+
+    def toggle(self, name, enabled=None):
+        """ Toggle the class or add or remove it based on enabled """
+        if enabled is None:
+            enabled = name not in self
+        if enabled:
+            self.add(name)
+        else:
+            self.discard(name)
+
+    def append(self, name):
+        self.add(name)
+
+    def extend(self, names):
+        for name in names:
+            self.add(name)
+
+    def __iadd__(self, names):
+        self.extend(names)
+        return self
+
+    def clear(self):
+        for name in self[:]:
+            self.remove(name)
+
+    def pop(self, index=-1):
+        name = super(ClassList, self).pop(index)
+        self._notify('class_remove', name)
+        return name
+
+    def insert(self, index, name):
+        super(ClassList, self).insert(index, name)
+        self._notify_all()
+
+    def sort(self, *args, **kwargs):
+        super(ClassList, self).sort(*args, **kwargs)
+        self._notify_all()
+
+    def reverse(self):
+        super(ClassList, self).reverse()
+        self._notify_all()
+
+    def __setitem__(self, index, value):
+        super(ClassList, self).__setitem__(index, value)
+        self._notify_all()
+
+    def __delitem__(self, index):
+        super(ClassList, self).__delitem__(index)
+        self._notify_all()
+
+    def __imul__(self, n):
+        super(ClassList, self).__imul__(n)
+        self._notify_all()
+        return self
+
+
+class StyleMap(dict):
+    """ A dict of css properties that updates the tag it belongs to when
+    a property is set or deleted.
+
+    """
+    __slots__ = ('owner',)
+
+    def __init__(self, items=(), owner=None):
+        super(StyleMap, self).__init__(items or ())
+        self.owner = atomref(owner) if owner is not None else None
+
+    def _notify(self, key, value):
+        owner = self.owner() if self.owner is not None else None
+        if owner is not None:
+            owner._update_item({
+                'type': 'style_set', 'name': 'style', 'key': key,
+                'value': value})
+
+    def __setitem__(self, key, value):
+        if self.get(key, self) != value:
+            super(StyleMap, self).__setitem__(key, value)
+            self._notify(key, value)
+
+    def __delitem__(self, key):
+        super(StyleMap, self).__delitem__(key)
+        self._notify(key, None)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *args):
+        if key not in self:
+            return super(StyleMap, self).pop(key, *args)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        key = next(reversed(self))
+        return key, self.pop(key)
+
+    def clear(self):
+        for key in list(self):
+            del self[key]
+
+
+def may_define_id(deferred):
+    """ Check if any of the deferred child nodes of a node that intercepts
+    it's children may bind an explicit id. This inspects the expression
+    engines of the compiler nodes, anything that cannot be inspected (ie a
+    template instance) is assumed to.
+
+    Parameters
+    ----------
+    deferred: List
+        The child nodes as a list of (nodes, key, f_locals) tuples as they
+        are passed to `child_node_intercept`.
+
+    """
+    stack = [node for nodes, key, f_locals in deferred for node in nodes]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, DeclarativeNode):
+            return True
+        engine = node.engine
+        if engine is not None:
+            handlers = getattr(engine, '_handlers', None)
+            if handlers is None or handlers.get('id') is not None:
+                return True
+        stack.extend(node.children)
+        if node.super_node is not None:
+            stack.append(node.super_node)
+    return False
+
+
+def class_string(cls):
+    """ Get the value of the class attribute for the cls of a tag """
+    if isinstance(cls, (tuple, list)):
+        return " ".join(cls)
+    return str(cls)
+
+
+def style_string(style):
+    """ Get the value of the style attribute for the style of a tag """
+    if isinstance(style, dict):
+        return ";".join("%s:%s" % s for s in style.items()
+                        if s[1] is not None)
+    return str(style)
+
+
+def diff_items(name, old, new):
+    """ Diff the old and new value of the cls, style or attrs of a tag.
+
+    Returns
+    -------
+    changes: List or None
+        The `class_add`, `class_remove`, `style_set`, `attr_set` or
+        `attr_delete` changes needed to update old to new, or None if
+        sending the whole value is smaller.
+
+    """
+    changes = []
+    if name == 'attrs':
+        # Always sent by key so large values that did not change (ie json
+        # in data attributes) are never resent
+        old = old or {}
+        for k in old:
+            if k not in new:
+                changes.append({'type': 'attr_delete', 'name': name,
+                                'key': k})
+        for k, v in new.items():
+            if k not in old or (old[k] is not v and old[k] != v):
+                changes.append({'type': 'attr_set', 'name': name, 'key': k,
+                                'value': v})
+        return changes
+    elif name == 'cls':
+        if not isinstance(old, ClassList):
+            return None
+        for c in old:
+            if c not in new:
+                changes.append({'type': 'class_remove', 'name': name,
+                                'value': c})
+        for c in new:
+            if c not in old:
+                changes.append({'type': 'class_add', 'name': name,
+                                'value': c})
+    else:
+        if not isinstance(old, StyleMap) or not isinstance(new, StyleMap):
+            return None
+        for k in old:
+            if k not in new:
+                changes.append({'type': 'style_set', 'name': name, 'key': k,
+                                'value': None})
+        for k, v in new.items():
+            if old.get(k, old) != v:
+                changes.append({'type': 'style_set', 'name': name, 'key': k,
+                                'value': v})
+    if len(changes) >= max(len(new), 1):
+        return None
+    return changes
+
+
 class Tag(ToolkitObject):
     #: Reference to the proxy object
     proxy = Typed(ProxyTag)
@@ -42,10 +318,10 @@ class Tag(ToolkitObject):
     #: Tag name
     tag = d_(Str()).tag(attr=False)
 
-    #: CSS classes
+    #: CSS classes. Any value assigned is converted to a ClassList.
     cls = d_(Instance((list, object))).tag(attr=False)
 
-    #: CSS styles
+    #: CSS styles. A dict assigned is converted to a StyleMap.
     style = d_(Instance((dict, object))).tag(attr=False)
 
     #: Node text
@@ -88,6 +364,25 @@ class Tag(ToolkitObject):
     def _default_id(self):
         return '%0x' % id(self)
 
+    def _default_cls(self):
+        return ClassList(owner=self)
+
+    def _post_validate_cls(self, old, new):
+        if isinstance(new, ClassList) and new.owner is not None and \
+                new.owner() is self:
+            return new
+        return ClassList(new, owner=self)
+
+    def _default_style(self):
+        return StyleMap(owner=self)
+
+    def _post_validate_style(self, old, new):
+        if not isinstance(new, dict) or (
+                isinstance(new, StyleMap) and new.owner is not None and
+                new.owner() is self):
+            return new
+        return StyleMap(new, owner=self)
+
     @observe('id', 'tag', 'cls', 'style', 'text', 'tail', 'alt', 'attrs',
              'onclick', 'clickable', 'ondragstart', 'ondragover', 'ondrop',
              'draggable')
@@ -102,11 +397,23 @@ class Tag(ToolkitObject):
         if t == 'update' and self.proxy_is_active:
             name = change['name']
             value = change['value']
+            if name in ('cls', 'style', 'attrs'):
+                items = diff_items(name, change['oldvalue'], value)
+                if items is not None:
+                    for item in items:
+                        self._update_item(item)
+                    return
             handler = getattr(self.proxy, 'set_' + name, None)
             if handler is not None:
                 handler(value)
             else:
                 self.proxy.set_attribute(name, value)
+
+            # Clients set these as the attribute value
+            if name == 'cls':
+                value = class_string(value)
+            elif name == 'style':
+                value = style_string(value)
             self._notify_modified({
                 'id': self.id,
                 'type': t,
@@ -114,6 +421,53 @@ class Tag(ToolkitObject):
                 'value': value
             })
 
+    def _update_item(self, change):
+        """ Update the proxy and notify the root when a single class, style
+        or attribute of the tag is changed.
+
+        Parameters
+        ----------
+        change: Dict
+            The change with a type of `class_add`, `class_remove`,
+            `style_set`, `attr_set` or `attr_delete`.
+
+        """
+        if self.proxy_is_active:
+            t = change['type']
+            proxy = self.proxy
+            if t == 'style_set' or t == 'attr_set':
+                getattr(proxy, t)(change['key'], change['value'])
+            elif t == 'attr_delete':
+                proxy.attr_delete(change['key'])
+            else:
+                getattr(proxy, t)(change['value'])
+            change['id'] = self.id
+            self._notify_modified(change)
+
+    def _update_value(self, name):
+        """ Update the proxy and notify the root with the whole value of the
+        cls or style when it was changed in place.
+
+        Parameters
+        ----------
+        name: String
+            The name of the member that changed.
+
+        """
+        if self.proxy_is_active:
+            value = getattr(self, name)
+            getattr(self.proxy, 'set_' + name)(value)
+            if name == 'cls':
+                value = class_string(value)
+            else:
+                value = style_string(value)
+            self._notify_modified({
+                'id': self.id,
+                'type': 'update',
+                'name': name,
+                'value': value
+            })
+
     def _notify_modified(self, change):
         """  Triggers a modified event on the root node with the given change.
 
@@ -125,7 +479,10 @@ class Tag(ToolkitObject):
         """
         root = self.root_object()
         if isinstance(root, Html):
-            root.modified(change)
+            if root.batch is not None:
+                root.batch.append(change)
+            else:
+                root.modified(change)
 
     # =========================================================================
     # Object API
@@ -216,9 +573,25 @@ class Tag(ToolkitObject):
         """ Prepare this node for rendering.
 
         This sets any attributes given, initializes and actives the proxy
-        as needed.
+        as needed. If any of the values are awaitable they are awaited
+        concurrently, this is only possible when an event loop is not
+        running, otherwise use `render_async`.
 
         """
+        if any(inspect.isawaitable(v) for v in kwargs.values()):
+            import asyncio
+            from web.core.streaming import gather_attrs
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                kwargs = asyncio.run(gather_attrs(kwargs))
+            else:
+                for v in kwargs.values():
+                    if inspect.iscoroutine(v):
+                        v.close()
+                raise RuntimeError(
+                    "Use render_async to render with awaitable attributes "
+                    "when an event loop is running")
         for k, v in kwargs.items():
             setattr(self, k, v)
         if not self.is_initialized:
@@ -226,9 +599,17 @@ class Tag(ToolkitObject):
         if not self.proxy_is_active:
             self.activate_proxy()
 
-    def render(self, **kwargs):
+    def render(self, wait=None, **kwargs):
         """ Render this tag and all children to a string.
 
+        Parameters
+        ----------
+        wait: Float
+            If given, wait up to this many seconds for any conversions
+            running in the background (see `Raw.offload`) to complete.
+        kwargs: Dict
+            Attributes to set before rendering.
+
         Returns
         -------
         html: String
@@ -236,6 +617,40 @@ class Tag(ToolkitObject):
 
         """
         self.prepare(**kwargs)
+        if wait is not None:
+            self.proxy.root.wait(wait)
+        return self.proxy.render()
+
+    async def render_async(self, timeout=None, **kwargs):
+        """ Render this tag once the data it depends on is loaded.
+
+        Awaitable attributes are awaited concurrently, then the `Async`
+        sections are loaded and conversions running in the background
+        (see `Raw.offload`) are waited for concurrently. The time taken is
+        that of the slowest source instead of the sum of all of them.
+
+        Parameters
+        ----------
+        timeout: Float
+            Maximum time in seconds to wait. Sections that are not loaded by
+            then display their fallback and conversions their placeholder.
+        kwargs: Dict
+            Attributes to set before rendering. The values may be awaitables
+            (eg coroutines or `WebApplication.run_in_executor`).
+
+        Returns
+        -------
+        html: String
+            The rendered html content of the node.
+
+        Raises
+        ------
+        TimeoutError
+            If the attributes are not loaded within the timeout.
+
+        """
+        from web.core.streaming import load
+        await load(self, timeout, **kwargs)
         return self.proxy.render()
 
 
@@ -249,9 +664,304 @@ class Html(Tag):
     #: or removed. Observe this event to handle updating websockets.
     modified = d_(Event(dict), writable=False).tag(attr=False)
 
+    #: Output saved by `freeze`. When set the view is frozen and render
+    #: returns this instead of rendering the (released) tree.
+    frozen_output = Value()
+
+    #: The lxml tree saved by `freeze` when `keep_tree` is True
+    frozen_tree = Value()
+
+    #: Set while a function run with `offload` is running. Bind to this to
+    #: display a loading state.
+    busy = d_(Bool()).tag(attr=False)
+
+    #: Number of functions run with `offload` that are running
+    running = Int()
+
+    #: Changes made while the result of an offloaded function is applied.
+    #: They are emitted together as a `batch` change.
+    batch = Value()
+
     def _default_tag(self):
         return 'html'
 
+    def _default_id(self):
+        """ Include the shard of the application so the process that owns
+        the view can be found from the id (see `web.core.app.shard_of`).
+
+        """
+        shard = getattr(Application.instance(), 'shard', '')
+        if shard:
+            return '%s-%0x' % (shard, id(self))
+        return super(Html, self)._default_id()
+
+    def offload(self, func, *args, callback=None):
+        """ Run a blocking function (eg loading a file) in the application's
+        executor so the event loop is not blocked.
+
+        The function is run in another thread so it must not modify the
+        view. The view is marked as `busy` until it completes. Then the
+        callback is invoked with the result on the event loop thread and
+        the changes it makes to the view are emitted together as a single
+        `batch` change. Errors are logged and the future completes with
+        None. If an event loop is not running the function and callback are
+        run immediately.
+
+        Parameters
+        ----------
+        func: Callable
+            The blocking function to run.
+        args: Tuple
+            Arguments to pass to the function.
+        callback: Callable
+            Invoked with the result to apply it to the view.
+
+        Returns
+        -------
+        future: asyncio.Future or None
+            If an event loop is running, a future which completes with the
+            result once the callback was invoked, or None if it failed.
+
+        """
+        loop = running_loop()
+        if loop is None:
+            result = func(*args)
+            if callback is not None:
+                callback(result)
+            return None
+        self.running += 1
+        self.busy = True
+        future = loop.create_future()
+        executor = Application.instance().executor
+        f = loop.run_in_executor(executor, func, *args)
+        f.add_done_callback(lambda f: self.complete(f, callback, future))
+        return future
+
+    def complete(self, f, callback, future):
+        """ Apply the result of a function run with `offload` on the event
+        loop thread and emit the changes as a single batch.
+
+        """
+        try:
+            result = f.result()
+            if callback is not None:
+                self.batch = []
+                try:
+                    callback(result)
+                finally:
+                    batch = self.batch
+                    self.batch = None
+                    if batch:
+                        self.modified({
+                            'id': self.id,
+                            'type': 'batch',
+                            'name': 'children',
+                            'value': batch,
+                        })
+        except Exception:
+            log.exception("Offloaded function of %s failed", self.id)
+            result = None
+        finally:
+            self.running -= 1
+            if not self.running:
+                self.busy = False
+        if not future.done():
+            future.set_result(result)
+
+    def freeze(self, keep_tree=False, **kwargs):
+        """ Render this view then release the declarations, proxies and
+        the id cache keeping only the output.
+
+        This is intended for static pages that are rendered once and then
+        served from memory. Once frozen the view can no longer be modified.
+
+        Parameters
+        ----------
+        keep_tree: Bool
+            Keep a copy of the lxml tree so `xpath` queries can still be
+            used (eg for testing). Queries return lxml elements.
+        kwargs: Dict
+            Attributes to set before rendering.
+
+        Returns
+        -------
+        html: String
+            The rendered html content of the view.
+
+        """
+        if self.frozen_output is not None:
+            return self.frozen_output
+        output = self.render(**kwargs)
+        proxy = self.proxy
+        if keep_tree:
+            self.frozen_tree = deepcopy(proxy.widget)
+
+        # Deactivate first so tearing down the children does not generate
+        # modified events or update the parent for each node.
+        self.proxy_is_active = False
+        for child in self.children[:]:
+            child.destroy()
+        proxy.cache.clear()
+        proxy.destroy()
+        del self.proxy
+
+        self.frozen_output = output
+        return output
+
+    def render_fragment(self, node_id, lazy=False, wait=None, **kwargs):
+        """ Render only the node with the given id and it's children. This
+        can be used to respond to requests for part of a page.
+
+        Parameters
+        ----------
+        node_id: String
+            The id of the node to render.
+        lazy: Bool
+            If the view is not yet initialized, only initialize the node and
+            it's children instead of the whole view. See `find_lazy` for
+            what is built to find the node. The ancestors are created but not
+            rendered. The view is left partially built (even if the node is
+            not found) so it should only be used to render fragments. Only
+            nodes with an explicit id can be found this way since generated
+            ids differ for every view.
+        wait: Float
+            If given, wait up to this many seconds for any conversions
+            running in the background (see `Raw.offload`) to complete.
+        kwargs: Dict
+            Attributes to set before rendering.
+
+        Returns
+        -------
+        html: String
+            The rendered html content of the node.
+
+        Raises
+        ------
+        KeyError
+            If there is no node with the id.
+
+        """
+        if self.frozen_output is not None:
+            from lxml.html import tostring
+            nodes = self.xpath('//*[@id=$id]', id=node_id)
+            if not nodes:
+                raise KeyError("No node with id %r" % node_id)
+            return tostring(nodes[0], encoding='unicode')
+        if lazy and not self.is_initialized:
+            for k, v in kwargs.items():
+                setattr(self, k, v)
+            node = self.find_lazy(node_id)
+            if node is None:
+                raise KeyError("No node with id %r" % node_id)
+            self.attach_lazy(node)
+            if not node.is_initialized:
+                node.initialize()
+            if not node.proxy_is_active:
+                node.activate_proxy()
+            proxy = node.proxy
+        else:
+            self.prepare(**kwargs)
+            aref = self.proxy.root.cache.get(node_id)
+            proxy = aref() if aref else None
+            if proxy is None:
+                raise KeyError("No node with id %r" % node_id)
+        if wait is not None:
+            proxy.root.wait(wait)
+        return proxy.render()
+
+    def find_lazy(self, node_id):
+        """ Find the node with the given id without initializing the view.
+
+        The children of nodes which defer building them (ie a `Block`) are
+        built and patterns (ie a `Looper`) are initialized only if their
+        content binds an id, since otherwise it cannot contain the node.
+        Anything else with an explicit id that is searched before the node
+        is found is still built, so the cost is that of the fragment plus
+        the content with ids that precedes it.
+
+        """
+        searched = set()
+        stack = [self]
+        while stack:
+            parent = stack.pop()
+            for child in parent.children:
+                if child in searched:
+                    continue
+                searched.add(child)
+                if isinstance(child, Pattern):
+                    if not child.is_initialized and \
+                            may_define_id(child.pattern_nodes):
+                        # The items are inserted into the parent
+                        child.initialize()
+                        stack.append(parent)
+                        break
+                    continue
+                if isinstance(child, Tag) and child.id == node_id:
+                    return child
+                deferred_nodes = getattr(child, 'deferred_nodes', None)
+                if deferred_nodes is not None and \
+                        may_define_id(deferred_nodes()):
+                    child.build_nodes()
+                stack.append(child)
+        return None
+
+    def attach_lazy(self, node):
+        """ Create the proxies of the ancestors of the node so it can be
+        activated without activating the rest of the view. The node is moved
+        out of any blocks into the tag the block would insert it into.
+
+        """
+        child, parent = node, node.parent
+        while parent is not None:
+            if isinstance(parent, Tag):
+                child, parent = parent, parent.parent
+                continue
+            target = getattr(parent, 'block', None)
+            child.set_parent(target if target is not None else parent.parent)
+            parent = child.parent
+
+        ancestors = []
+        parent = node.parent
+        while parent is not None:
+            ancestors.append(parent)
+            parent = parent.parent
+        app = Application.instance()
+        for tag in reversed(ancestors):
+            if tag.proxy is None:
+                tag.proxy = app.create_proxy(tag)
+                tag.proxy.activate_top_down()
+
+    def xpath(self, query, **kwargs):
+        """ Find nodes matching the given xpath query. If the view is frozen
+        this returns the matching lxml elements of the frozen tree.
+
+        """
+        if self.frozen_output is not None:
+            tree = self.frozen_tree
+            if tree is None:
+                raise RuntimeError(
+                    "Cannot query a view frozen without keep_tree=True")
+            return tree.xpath(query, **kwargs)
+        return super(Html, self).xpath(query, **kwargs)
+
+    def render(self, wait=None, **kwargs):
+        """ Render this tag and all children to a string. If the view is
+        frozen the saved output is returned.
+
+        """
+        if self.frozen_output is not None:
+            return self.frozen_output
+        return super(Html, self).render(wait, **kwargs)
+
+    async def render_async(self, timeout=None, **kwargs):
+        """ Render this view once the data it depends on is loaded. If the
+        view is frozen the saved output is returned.
+
+        """
+        if self.frozen_output is not None:
+            return self.frozen_output
+        return await super(Html, self).render_async(timeout, **kwargs)
+
 
 class Head(Tag):
     #: Set the tag name
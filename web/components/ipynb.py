@@ -9,7 +9,7 @@ Created on Jul 8, 2018
 
 @author: jrm
 """
-from atom.api import Int, Typed, ForwardTyped, observe
+from atom.api import Bool, Int, Typed, ForwardTyped, observe
 from enaml.core.declarative import d_
 from .raw import Raw, ProxyRawNode
 
@@ -21,6 +21,9 @@ class ProxyNotebook(ProxyRawNode):
     def set_version(self, version):
         raise NotImplementedError
 
+    def set_incremental(self, incremental):
+        raise NotImplementedError
+
 
 class Notebook(Raw):
     """ A node for rendering jupyter notebooks.
@@ -32,7 +35,12 @@ class Notebook(Raw):
     #: Version
     version = d_(Int(4))
 
-    @observe('version')
+    #: Convert each cell individually. When the source changes only the cells
+    #: that changed are converted and a patch is emitted for each of them.
+    #: This is only supported by version 4, otherwise it is ignored.
+    incremental = d_(Bool()).tag(attr=False)
+
+    @observe('version', 'incremental')
     def _update_proxy(self, change):
         """ Update the version """
         super(Notebook, self)._update_proxy(change)
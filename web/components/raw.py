@@ -9,7 +9,7 @@ Created on Aug 2, 2017
 
 @author: jrm
 """
-from atom.api import Str, Typed, ForwardTyped, set_default, observe
+from atom.api import Bool, Str, Typed, ForwardTyped, set_default, observe
 from enaml.core.declarative import d_
 from .html import Tag, ProxyTag
 
@@ -37,7 +37,25 @@ class Raw(Tag):
     #: Raw source to parse and display
     source = d_(Str()).tag(attr=False)
 
+    #: Run the conversion of the source in the application's executor
+    #: instead of blocking. The placeholder is displayed until it completes.
+    #: This is used by the Markdown, Code, and Notebook nodes.
+    offload = d_(Bool()).tag(attr=False)
+
+    #: Html source to display while the conversion is running
+    placeholder = d_(Str()).tag(attr=False)
+
+    #: Html source to display if the conversion fails
+    fallback = d_(Str()).tag(attr=False)
+
     @observe('source')
     def _update_proxy(self, change):
-        """ The superclass implementation is sufficient. """
-        super(Raw, self)._update_proxy(change)
+        """ The proxy emits patches for only the blocks of the content that
+        changed so the source itself is not sent.
+
+        """
+        if change['name'] == 'source':
+            if change['type'] == 'update' and self.proxy_is_active:
+                self.proxy.set_source(change['value'])
+        else:
+            super(Raw, self)._update_proxy(change)
@@ -10,4 +10,6 @@ Created on Apr 16, 2017
 @author: jrm
 """
 from .block import Block
+from .cache import Cache
+from .streaming import Async, stream
 from enaml.core.api import *
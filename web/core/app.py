@@ -10,11 +10,32 @@ Created on Apr 17, 2017
 @author: jrm
 """
 import logging
-from atom.api import Value, Instance
+from concurrent.futures import Executor
+from atom.api import Dict, Str, Value, Instance
 from enaml.application import Application, ProxyResolver
+from enaml.core.enamldef_meta import EnamlDefMeta
 from web.impl import lxml_components
 
 
+def shard_of(view_id):
+    """ Get the shard encoded in the id of a view.
+
+    Parameters
+    ----------
+    view_id: String
+        The id of an Html view.
+
+    Returns
+    -------
+    shard: String
+        The shard that created the view or an empty string if the id has
+        none.
+
+    """
+    shard, sep, ref = view_id.partition('-')
+    return shard if sep else ''
+
+
 class WebApplication(Application):
     """ Base enaml web application that uses the widgets defined in
     `web.components.html`
@@ -27,6 +48,38 @@ class WebApplication(Application):
     #: Database
     database = Value()
 
+    #: Executor used to run conversions that are offloaded. This may be
+    #: a thread or process pool.
+    executor = Instance(Executor)
+
+    #: Cache of the resolved proxy class by declaration class
+    proxies = Dict()
+
+    #: Identifier of this process (or shard) added to the id of each view
+    #: so requests for a view can be routed to the process that owns it.
+    shard = Str()
+
+    def _default_executor(self):
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor()
+
+    def run_in_executor(self, func, *args):
+        """ Run a blocking function in the executor from the event loop.
+
+        Returns
+        -------
+        future: asyncio.Future
+            A future to await for the result.
+
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, func, *args)
+
+    def _observe_resolver(self, change):
+        """ Clear the resolved proxies when the resolver changes """
+        self.proxies = {}
+
     def __init__(self, *args, **kwargs):
         """ Initialize a WebApplication.
 
@@ -34,3 +87,58 @@ class WebApplication(Application):
         super(WebApplication, self).__init__(*args, **kwargs)
         self.resolver = ProxyResolver(factories=lxml_components.FACTORIES)
 
+    def resolve_proxy_class(self, declaration_class):
+        """ Resolve the proxy class for a declaration class. The result is
+        cached so the MRO is only walked the first time a class is used.
+
+        The names of enamldef classes are skipped since they may collide with
+        a component's name (ex `enamldef Base(Html)` is not a `<base>` tag).
+
+        Parameters
+        ----------
+        declaration_class: type
+            A ToolkitObject subclass for which the proxy implementation
+            class should be resolved.
+
+        Returns
+        -------
+        result: type
+            A ProxyToolkitObject subclass for the given class, or None
+            if one could not be resolved.
+
+        """
+        proxies = self.proxies
+        cls = proxies.get(declaration_class)
+        if cls is not None:
+            return cls
+        resolver = self.resolver
+        for base in declaration_class.__mro__:
+            cls = proxies.get(base)
+            if cls is not None:
+                break
+            if isinstance(base, EnamlDefMeta):
+                continue
+            cls = resolver.resolve(base.__name__)
+            if cls is not None:
+                break
+        if cls is not None:
+            proxies[declaration_class] = cls
+        return cls
+
+    def register(self, declaration_class, proxy_class):
+        """ Register the proxy class to use for a custom component and any
+        subclasses of it.
+
+        Parameters
+        ----------
+        declaration_class: type
+            The component class.
+        proxy_class: type
+            The ProxyToolkitObject subclass that implements it.
+
+        """
+        proxies = self.proxies
+        for cls in list(proxies):
+            if issubclass(cls, declaration_class):
+                del proxies[cls]
+        proxies[declaration_class] = proxy_class
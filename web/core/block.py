@@ -9,8 +9,53 @@ Created on Apr 15, 2017
 
 @author: jrm
 """
-from atom.api import ForwardInstance, Enum
+from atom.api import Bool, ForwardInstance, Enum, List
+from enaml.core.compiler_nodes import DeclarativeNode, new_scope
 from enaml.core.declarative import Declarative, d_
+from lxml.html import tostring
+from web.components.html import Tag
+
+
+def has_identifiers(nodes):
+    """ Check if any of the compiler nodes or their children define an
+    identifier that may be referenced before the nodes are built.
+
+    """
+    for node in nodes:
+        if not isinstance(node, DeclarativeNode) or node.identifier:
+            return True
+        if has_identifiers(node.children):
+            return True
+    return False
+
+
+def resolve_blocks(root):
+    """ Mark the blocks in the tree whose content will be replaced by another
+    block. This is the target of a block with a mode of 'replace' and any
+    block replacing the same target before it.
+
+    Parameters
+    ----------
+    root: Declarative
+        The root of the tree to search.
+
+    """
+    replacements = {}
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, Block):
+            obj.resolved = True
+            if obj.mode == 'replace':
+                target = obj.block
+                if target is not None:
+                    target.replaced = True
+                    previous = replacements.get(target)
+                    if previous is not None:
+                        previous.replaced = True
+                    replacements[target] = obj
+        # Visit in the order the tree is initialized
+        stack.extend(reversed(obj.children))
 
 
 class Block(Declarative):
@@ -30,17 +75,77 @@ class Block(Declarative):
     
     #: If replace, replace all parent's children (except the block of course) 
     mode = d_(Enum('replace', 'append', 'prepend'))
-    
+
+    #: Child nodes which are not built until the block is initialized
+    block_nodes = List()
+
+    #: Whether the blocks of the tree were checked for replacements
+    resolved = Bool()
+
+    #: Whether a block with a mode of 'replace' is targeting this block
+    replaced = Bool()
+
+    #: Signal to the compiler that this class handles child creation.
+    __intercepts_child_nodes__ = True
+
     def initialize(self):
         """ A reimplemented initializer.
 
         This method will add the include objects to the parent of the
-        include and ensure that they are initialized.
+        include and ensure that they are initialized. The children of a
+        block that is replaced by another block are never built.
 
         """
+        self.build_nodes()
         super(Block, self).initialize()
         self.refresh_items()
 
+    def build_nodes(self):
+        """ Build the stored child nodes without initializing them. This is
+        done when the block is initialized or when a lazy render needs to
+        search the content (see `Html.render_fragment`).
+
+        """
+        block_nodes = self.block_nodes
+        if block_nodes:
+            del self.block_nodes
+            if not self.resolved:
+                resolve_blocks(self.root_object())
+            if not self.replaced:
+                for nodes, key, f_locals in block_nodes:
+                    with new_scope(key, f_locals):
+                        for node in nodes:
+                            node(self)
+
+    def deferred_nodes(self):
+        """ Get the child nodes that are not built yet """
+        return self.block_nodes
+
+    def child_node_intercept(self, nodes, key, f_locals):
+        """ Store the child nodes until the block is initialized.
+
+        Nodes that define an identifier are built immediately since they may
+        be referenced (eg by an alias) before the block is initialized.
+
+        Parameters
+        ----------
+        nodes : list
+            A list of compiler nodes containing the information required
+            to instantiate the children.
+
+        key : object
+            The scope key for the current local scope.
+
+        f_locals : mapping or None
+            A mapping object for the current local scope.
+
+        """
+        if has_identifiers(nodes):
+            for node in nodes:
+                node(self)
+        else:
+            self.block_nodes.append((nodes, key, f_locals))
+
     def refresh_items(self):
         block = self.block
         if block:
@@ -49,8 +154,13 @@ class Block(Declarative):
             
             # Remove the existing blocks children
             if self.mode == 'replace':
+                parent = block.parent
+                if block.is_initialized and isinstance(parent, Tag):
+                    self.replace_items(block, parent)
+                    return
+
                 # Clear the blocks children
-                for c in block.children:
+                for c in block.children[:]:
                     block.children.remove(c)
                     if not c.is_destroyed:
                         c.destroy()
@@ -64,6 +174,81 @@ class Block(Declarative):
             # This block is inserting it's children into it's parent
             self.parent.insert_children(self, self.children)
     
+    def replace_items(self, block, parent):
+        """ Replace the children the other block inserted into it's parent
+        with this block's children in bulk.
+
+        The old children are detached from the dom together and the new
+        children are inserted with a single call to `insert_children`. If
+        the parent is active a single refresh of the parent is emitted
+        instead of a change for each child.
+
+        Parameters
+        ----------
+        block: Block
+            The block to replace the content of.
+        parent: Tag
+            The parent the block inserts it's children into.
+
+        """
+        items = [c for c in self.children if not c.is_destroyed]
+        keep = set(items)
+        old = [c for c in block.children if c not in keep]
+        active = parent.proxy_is_active
+        widget = parent.proxy.widget if active else None
+
+        # Detach the old children from the dom in one operation
+        if widget is not None:
+            nodes = [c.proxy.widget for c in old
+                     if isinstance(c, Tag) and c.proxy_is_active]
+            if nodes:
+                start = widget.index(nodes[0])
+                end = start + len(nodes)
+                if widget[start:end] == nodes:
+                    del widget[start:end]
+                else:
+                    for node in nodes:
+                        widget.remove(node)
+
+        # Update the tree without a change for each child. Destroying the
+        # old children removes them from the parent and inserting the new
+        # ones initializes them as usual.
+        parent.proxy_is_active = False
+        try:
+            for c in old:
+                if c.is_destroyed:
+                    c.set_parent(None)
+                else:
+                    c.destroy()
+            block.children[:] = items
+            parent.insert_children(block, items)
+        finally:
+            parent.proxy_is_active = active
+
+        if widget is None:
+            return
+
+        # Create the new dom nodes and move them into place
+        children = parent.children
+        i = children.index(items[0]) if items else 0
+        j = sum(1 for c in children[:i]
+                if isinstance(c, Tag) and c.proxy_is_active)
+        for c in items:
+            if isinstance(c, Tag):
+                if not c.proxy_is_active:
+                    c.activate_proxy()
+                widget.insert(j, c.proxy.widget)
+                j += 1
+
+        content = [widget.text or ""]
+        content.extend(tostring(n, encoding='unicode') for n in widget)
+        parent._notify_modified({
+            'id': parent.id,
+            'type': 'refresh',
+            'name': 'children',
+            'value': "".join(content),
+        })
+
     def _observe_mode(self, change):
         """ If the mode changes. Refresh the items.
         
@@ -103,6 +288,12 @@ class Block(Declarative):
         block = self.block
         new_children = change['value']
         old_children = change['oldvalue']
+        if block and self.mode == 'replace':
+            parent = block.parent
+            if block.is_initialized and isinstance(parent, Tag):
+                self.replace_items(block, parent)
+                return
+
         for c in old_children:
             if c not in new_children and not c.is_destroyed:
                 c.destroy()
@@ -0,0 +1,242 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+import os
+import sys
+import marshal
+import hashlib
+import logging
+import argparse
+from importlib.util import find_spec, MAGIC_NUMBER
+from enaml.compat import read_source, update_code_co_filename
+from enaml.core.import_hooks import (
+    AbstractEnamlImporter, CACHEDIR, MAGIC_TAG, make_file_info
+)
+
+log = logging.getLogger('enaml')
+
+
+class BundleImporter(AbstractEnamlImporter):
+    """ An importer which loads enaml modules from the code objects of the
+    loaded bundles instead of parsing and compiling the source.
+
+    """
+    #: Modules of the loaded bundles as {fullname: (src_path, code)}
+    modules = {}
+
+    @classmethod
+    def install(cls):
+        """ Insert the importer before any other so the bundled code is used
+        even if the regular enaml importer is installed.
+
+        """
+        cls._install_count[cls] += 1
+        if cls not in sys.meta_path:
+            sys.meta_path.insert(0, cls)
+
+    @classmethod
+    def locate_module(cls, fullname, path=None):
+        entry = cls.modules.get(fullname)
+        if entry is not None:
+            return cls(*entry)
+
+    def __init__(self, src_path, code):
+        self.file_info = make_file_info(src_path)
+        self.code = code
+
+    def get_code(self):
+        return (self.code, self.file_info.src_path)
+
+
+def package_dirs(package):
+    """ Find the directories of the package.
+
+    Parameters
+    ----------
+    package: String
+        The name of the package.
+
+    Returns
+    -------
+    result: (root, path)
+        The directory the package is imported from (ie the sys.path entry)
+        and the directory of the package.
+
+    """
+    spec = find_spec(package)
+    if spec is None or not spec.submodule_search_locations:
+        raise ValueError("%s is not a package" % package)
+    path = list(spec.submodule_search_locations)[0]
+    root = path
+    for part in package.split('.'):
+        root = os.path.dirname(root)
+    return root, path
+
+
+def bundle_path(package):
+    """ Get the default path of the bundle for the package. The name
+    includes the python and enaml compiler version so a bundle is never
+    loaded by an incompatible interpreter.
+
+    """
+    root, path = package_dirs(package)
+    return os.path.join(path, CACHEDIR, 'bundle.%s.enamlb' % MAGIC_TAG)
+
+
+def build(package, path=None):
+    """ Compile all the enaml modules of the package into a bundle.
+
+    Parameters
+    ----------
+    package: String
+        The name of the package containing the views.
+    path: String
+        The path to write the bundle to. Defaults to `bundle_path(package)`.
+
+    Returns
+    -------
+    path: String
+        The path of the bundle written.
+
+    """
+    from enaml.core.enaml_compiler import EnamlCompiler
+    from enaml.core.parser import parse
+    root, pkg_dir = package_dirs(package)
+    if path is None:
+        path = bundle_path(package)
+    modules = {}
+    for dirpath, dirnames, filenames in os.walk(pkg_dir):
+        dirnames[:] = [d for d in dirnames
+                       if d != CACHEDIR and not d.startswith('.')]
+        for filename in sorted(filenames):
+            name, ext = os.path.splitext(filename)
+            if ext != '.enaml':
+                continue
+            src = os.path.join(dirpath, filename)
+            relpath = os.path.relpath(src, root)
+            fullname = ".".join(
+                os.path.splitext(relpath)[0].split(os.path.sep))
+            with open(src, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            mtime = int(os.path.getmtime(src))
+            code = EnamlCompiler.compile(parse(read_source(src), src), src)
+            modules[fullname] = (relpath, mtime, digest, code)
+
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    # Write to a temp file then move it so a partial bundle is never loaded
+    tmp = '%s.%s.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC_NUMBER)
+        marshal.dump({'tag': MAGIC_TAG, 'modules': modules}, f)
+    os.replace(tmp, path)
+    return path
+
+
+def load(package, path=None, validate='mtime'):
+    """ Load a bundle built with `build` and install the importer so the
+    views of the package are imported from it.
+
+    Modules whose source changed since the bundle was built are skipped
+    and imported normally. If the source of a module does not exist (ie only
+    the bundle was deployed) the bundled code is always used.
+
+    Parameters
+    ----------
+    package: String
+        The name of the package containing the views.
+    path: String
+        The path of the bundle. Defaults to `bundle_path(package)`.
+    validate: String or None
+        How the bundled code is checked against the source. Either 'mtime'
+        to compare modified times, 'hash' to compare the content, or None to
+        use the bundle without checking the source.
+
+    Returns
+    -------
+    modules: List
+        The names of the modules loaded from the bundle. This is empty if the
+        bundle does not exist or was built by an incompatible version.
+
+    """
+    if validate not in ('mtime', 'hash', None):
+        raise ValueError("validate must be 'mtime', 'hash', or None")
+    root, pkg_dir = package_dirs(package)
+    if path is None:
+        path = bundle_path(package)
+    if not os.path.exists(path):
+        log.warning("No view bundle exists at %s", path)
+        return []
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC_NUMBER))
+        bundle = marshal.load(f) if magic == MAGIC_NUMBER else None
+    if not bundle or bundle.get('tag') != MAGIC_TAG:
+        log.warning("View bundle %s was built by a different version", path)
+        return []
+
+    loaded = []
+    for fullname, (relpath, mtime, digest, code) in bundle['modules'].items():
+        src = os.path.join(root, relpath)
+        if validate is not None and os.path.exists(src):
+            if validate == 'mtime':
+                valid = int(os.path.getmtime(src)) <= mtime
+            else:
+                with open(src, 'rb') as f:
+                    valid = hashlib.sha1(f.read()).hexdigest() == digest
+            if not valid:
+                continue
+        if code.co_filename != src:
+            code = update_code_co_filename(code, src)
+        BundleImporter.modules[fullname] = (src, code)
+        loaded.append(fullname)
+    BundleImporter.install()
+    return loaded
+
+
+def warm_up(*views, **kwargs):
+    """ Instantiate and render each view once. This should be done before
+    forking workers so the work done on first use (proxy resolution,
+    conversions, imports, etc..) is shared by all of them.
+
+    Parameters
+    ----------
+    views: Tuple
+        The view classes to warm up. A WebApplication must exist.
+    kwargs: Dict
+        Attributes to pass to `render`.
+
+    Returns
+    -------
+    instances: List
+        The rendered view instances.
+
+    """
+    instances = []
+    for view in views:
+        instance = view()
+        instance.render(**kwargs)
+        instances.append(instance)
+    return instances
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Precompile the enaml views of packages into bundles")
+    parser.add_argument('packages', nargs='+', help="Packages to compile")
+    parser.add_argument('-o', '--output', default=None,
+                        help="Path to write the bundle to. Only valid when "
+                             "building a single package.")
+    options = parser.parse_args(args)
+    if options.output and len(options.packages) > 1:
+        parser.error("--output can only be used with a single package")
+    for package in options.packages:
+        path = build(package, options.output)
+        print("Wrote %s" % path)
+
+
+if __name__ == '__main__':
+    main()
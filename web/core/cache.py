@@ -0,0 +1,172 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+import time
+from atom.api import (
+    Bool, Float, ForwardTyped, Int, List, Typed, Value, set_default
+)
+from enaml.core.compiler_nodes import new_scope
+from enaml.core.declarative import d_
+from web.components.html import Tag, ProxyTag
+from web.impl.cache import LRUCache, content_key
+from .block import has_identifiers
+
+
+#: Storage used by Cache nodes that do not define one
+STORAGE = LRUCache(max_bytes=32 * 1024 * 1024)
+
+
+class ProxyCache(ProxyTag):
+    #: Reference to the declaration
+    declaration = ForwardTyped(lambda: Cache)
+
+
+class Cache(Tag):
+    """ A node which caches the rendered html of it's children.
+
+    If an entry exists for the key the cached html is inserted and the
+    children are never built. Otherwise the children are built as usual and
+    their html is stored the next time the tree is rendered.
+
+    The cached content is static, bindings of the children are not updated
+    and events of nodes within it will not be dispatched. Ids generated for
+    the children are not stored so nodes that must be found by id (eg using
+    `xpath`) should not be cached. If the children contain `Async` sections
+    the content is stored once they are all loaded, and not at all if one of
+    them fails.
+
+    """
+    #: Reference to the proxy
+    proxy = Typed(ProxyCache)
+
+    #: Default tag is a div
+    tag = set_default('div')
+
+    #: Key of the entry. It must be unique for the content, if it depends on
+    #: any data (eg the user or language) it must be included in the key.
+    #: It is only read when the node is initialized. If None the content is
+    #: not cached.
+    key = d_(Value()).tag(attr=False)
+
+    #: Time in seconds before the entry expires. If zero it never expires.
+    ttl = d_(Float()).tag(attr=False)
+
+    #: Content larger than this (in characters) is not stored
+    max_bytes = d_(Int(1024 * 1024)).tag(attr=False)
+
+    #: Storage of the entries. Any object with `get(key)`, `pop(key)` and
+    #: `set(key, value, size)` methods such as an `LRUCache` or a
+    #: `FileCache` which can be shared by multiple processes. Defaults to
+    #: the `STORAGE` of this module.
+    storage = d_(Value()).tag(attr=False)
+
+    #: Html of the children if it was found in the cache
+    content = Value()
+
+    #: Child nodes which are not built until the node is initialized
+    cache_nodes = List()
+
+    #: Whether the children define identifiers and cannot be cached
+    uncacheable = Bool()
+
+    #: Signal to the compiler that this class handles child creation.
+    __intercepts_child_nodes__ = True
+
+    def _default_storage(self):
+        return STORAGE
+
+    def cache_key(self):
+        """ Get the key used to store the content """
+        return content_key(self.key)
+
+    def lookup(self):
+        """ Get the cached html or None if there is no entry for the key or
+        it expired. Expired entries are removed from the storage.
+
+        """
+        if self.key is None or self.uncacheable:
+            return None
+        key = self.cache_key()
+        storage = self.storage
+        entry = storage.get(key)
+        if entry is None:
+            return None
+        expires, content = entry
+        if expires and expires < time.time():
+            storage.pop(key)
+            return None
+        return content
+
+    def store(self, content):
+        """ Save the html of the children in the storage.
+
+        Parameters
+        ----------
+        content: Str
+            The html of the children.
+
+        """
+        size = len(content)
+        if self.key is None or self.uncacheable or size > self.max_bytes:
+            return
+        expires = time.time() + self.ttl if self.ttl else 0
+        self.storage.set(self.cache_key(), (expires, content), size)
+
+    def initialize(self):
+        """ A reimplemented initializer.
+
+        The children are only built if the content is not in the cache.
+
+        """
+        self.build_nodes()
+        super(Cache, self).initialize()
+
+    def build_nodes(self):
+        """ Build the stored child nodes without initializing them if the
+        content is not in the cache.
+
+        """
+        cache_nodes = self.cache_nodes
+        if cache_nodes:
+            del self.cache_nodes
+            content = self.lookup()
+            if content is None:
+                for nodes, key, f_locals in cache_nodes:
+                    with new_scope(key, f_locals):
+                        for node in nodes:
+                            node(self)
+            else:
+                self.content = content
+
+    def deferred_nodes(self):
+        """ Get the child nodes that are not built yet """
+        return self.cache_nodes
+
+    def child_node_intercept(self, nodes, key, f_locals):
+        """ Store the child nodes until the node is initialized.
+
+        Nodes that define an identifier are built immediately since they may
+        be referenced before the node is initialized, such content is never
+        cached.
+
+        Parameters
+        ----------
+        nodes : list
+            A list of compiler nodes containing the information required
+            to instantiate the children.
+
+        key : object
+            The scope key for the current local scope.
+
+        f_locals : mapping or None
+            A mapping object for the current local scope.
+
+        """
+        if has_identifiers(nodes):
+            self.uncacheable = True
+            for node in nodes:
+                node(self)
+        else:
+            self.cache_nodes.append((nodes, key, f_locals))
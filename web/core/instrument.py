@@ -0,0 +1,227 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+from contextlib import contextmanager
+from time import perf_counter
+from atom.api import Atom, Dict, Float, Int
+
+
+class Stat(Atom):
+    """ Aggregated stats of a hook for one declaration class """
+
+    #: Number of calls
+    count = Int()
+
+    #: Cumulative time spent in the hook in seconds
+    time = Float()
+
+    #: Number of nodes processed
+    nodes = Int()
+
+
+class Collector(Atom):
+    """ Collects the stats of the instrumented hooks while active.
+
+    """
+    #: Stats by hook name then declaration class name
+    stats = Dict()
+
+    def record(self, hook, name, elapsed, nodes):
+        """ Add a call of the hook to the stats """
+        hook_stats = self.stats.get(hook)
+        if hook_stats is None:
+            hook_stats = self.stats[hook] = {}
+        stat = hook_stats.get(name)
+        if stat is None:
+            stat = hook_stats[name] = Stat()
+        stat.count += 1
+        stat.time += elapsed
+        stat.nodes += nodes
+
+    def clear(self):
+        """ Clear all collected stats """
+        self.stats = {}
+
+    def to_dict(self):
+        """ Export the stats as a dict.
+
+        Returns
+        -------
+        stats: Dict
+            A dict of {hook: {declaration: {'count', 'time', 'nodes'}}}
+
+        """
+        return {
+            hook: {
+                name: {'count': s.count, 'time': s.time, 'nodes': s.nodes}
+                for name, s in hook_stats.items()
+            } for hook, hook_stats in self.stats.items()
+        }
+
+    def to_prometheus(self, prefix='enaml_web'):
+        """ Export the stats in the prometheus text exposition format.
+
+        Parameters
+        ----------
+        prefix: String
+            Prefix of the metric names
+
+        Returns
+        -------
+        text: String
+            The metrics text.
+
+        """
+        metrics = (
+            ('calls_total', 'count', 'Number of calls of the hook'),
+            ('seconds_total', 'time', 'Cumulative time spent in the hook'),
+            ('nodes_total', 'nodes', 'Number of nodes processed by the hook'),
+        )
+        lines = []
+        for suffix, attr, help in metrics:
+            metric = '%s_%s' % (prefix, suffix)
+            lines.append('# HELP %s %s' % (metric, help))
+            lines.append('# TYPE %s counter' % metric)
+            for hook, hook_stats in sorted(self.stats.items()):
+                for name, s in sorted(hook_stats.items()):
+                    lines.append('%s{hook="%s",declaration="%s"} %s' % (
+                        metric, hook, name, getattr(s, attr)))
+        return "\n".join(lines) + "\n"
+
+
+# -----------------------------------------------------------------------------
+# Hooks
+# -----------------------------------------------------------------------------
+def _proxy_name(proxy, result):
+    return type(proxy.declaration).__name__, 1
+
+
+def _render_name(proxy, result):
+    nodes = sum(1 for n in proxy.widget.iter())
+    return type(proxy.declaration).__name__, nodes
+
+
+def _declaration_name(declaration, result):
+    return type(declaration).__name__, 1
+
+
+def _block_name(block, result):
+    return type(block).__name__, len(block.children)
+
+
+def _hooks():
+    """ Get the list of (class, method name, counter) to instrument. The
+    counter is called with the object and result and must return the name
+    of the declaration class and the number of nodes processed.
+
+    """
+    from web.components.html import Tag
+    from web.core.block import Block
+    from web.impl.lxml_toolkit_object import WebComponent
+    return (
+        (WebComponent, 'activate_top_down', _proxy_name),
+        (WebComponent, 'init_widget', _proxy_name),
+        (WebComponent, 'render', _render_name),
+        (Tag, '_update_proxy', _declaration_name),
+        (Tag, '_notify_modified', _declaration_name),
+        (Block, 'refresh_items', _block_name),
+    )
+
+
+def _subclasses(cls):
+    """ Get the class and all currently defined subclasses """
+    yield cls
+    for subclass in cls.__subclasses__():
+        for c in _subclasses(subclass):
+            yield c
+
+
+#: Collectors that are currently active
+_collectors = []
+
+#: Methods that were replaced as (cls, name, original)
+_patched = []
+
+#: Calls in progress used to skip recording super calls of a hook
+_running = set()
+
+
+def _wrap(func, hook, counter):
+    """ Wrap the method so calls are recorded in the active collectors """
+    def wrapper(self, *args, **kwargs):
+        key = (hook, id(self))
+        if key in _running:
+            return func(self, *args, **kwargs)
+        _running.add(key)
+        start = perf_counter()
+        try:
+            result = func(self, *args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            _running.discard(key)
+        name, nodes = counter(self, result)
+        for collector in _collectors:
+            collector.record(hook, name, elapsed, nodes)
+        return result
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def _install():
+    for base, hook, counter in _hooks():
+        for cls in set(_subclasses(base)):
+            func = cls.__dict__.get(hook)
+            if func is None:
+                continue
+            setattr(cls, hook, _wrap(func, hook, counter))
+            _patched.append((cls, hook, func))
+
+
+def _uninstall():
+    while _patched:
+        cls, hook, func = _patched.pop()
+        setattr(cls, hook, func)
+
+
+@contextmanager
+def instrument(collector=None):
+    """ Collect stats of the toolkit hot paths within the context.
+
+    The hooks are only installed while a collector is active so there is
+    no overhead when instrumentation is not in use. Stats are aggregated
+    per declaration class (ie the enamldef name).
+
+    Parameters
+    ----------
+    collector: Collector
+        Optional collector to add the stats to. A new one is created if not
+        given.
+
+    Yields
+    ------
+    collector: Collector
+        The collector the stats are recorded in.
+
+    Examples
+    --------
+
+    with instrument() as stats:
+        Page().render()
+    print(stats.to_prometheus())
+
+    """
+    if collector is None:
+        collector = Collector()
+    if not _collectors:
+        _install()
+    _collectors.append(collector)
+    try:
+        yield collector
+    finally:
+        _collectors.remove(collector)
+        if not _collectors:
+            _uninstall()
@@ -0,0 +1,323 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+import zlib
+import gzip
+from atom.api import Atom, Bytes, Dict, Enum, Int, Str, Tuple, Typed
+from web.impl.cache import LRUCache, content_key
+
+
+def compress(body, encoding, level=6):
+    """ Compress the body with the given content encoding. The output is
+    deterministic so it can be cached and shared by workers.
+
+    """
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    elif encoding == 'deflate':
+        return zlib.compress(body, level)
+    raise ValueError("Unsupported encoding: %s" % encoding)
+
+
+def parse_accept_encoding(value):
+    """ Parse an Accept-Encoding header.
+
+    Returns
+    -------
+    encodings: Dict
+        The quality of each encoding by name.
+
+    """
+    encodings = {}
+    for item in (value or '').split(','):
+        name, sep, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            k, sep, v = param.partition('=')
+            if k.strip() == 'q':
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        encodings[name] = q
+    return encodings
+
+
+def etag_matches(etag, value):
+    """ Check if the etag matches any in an If-None-Match header """
+    if not value:
+        return False
+    value = value.strip()
+    if value == '*':
+        return True
+    for tag in value.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class CachedResponse(Atom):
+    """ A rendered view and it's compressed variants """
+
+    #: Version of the view that was rendered
+    version = Int()
+
+    #: Strong ETag of the content
+    etag = Str()
+
+    #: Rendered content
+    body = Bytes()
+
+    #: Compressed content by encoding. These are created on first use.
+    variants = Dict()
+
+
+class ResponseCache(Atom):
+    """ Cache the responses of rendered views.
+
+    A version counter of each view is incremented whenever the view is
+    `modified`, so the view is only rendered again if it changed. Requests
+    with an `If-None-Match` header matching the ETag get a 304 without a
+    body, and compressed variants are created once and reused.
+
+    It is framework neutral. `respond` takes the request headers and returns
+    the status, headers and body. See `tornado_respond` and
+    `aiohttp_respond` for adapters.
+
+    """
+    #: How the ETag is computed. With `content` it is a hash of the rendered
+    #: bytes so it is the same in every process rendering the same content.
+    #: With `version` it is based on the view id and version, which avoids
+    #: hashing but is only valid for the process that rendered the view.
+    etag = Enum('content', 'version')
+
+    #: Encodings that may be used in order of preference
+    encodings = Tuple(default=('gzip', 'deflate'))
+
+    #: Responses smaller than this are not compressed
+    min_size = Int(256)
+
+    #: Compression level
+    level = Int(6)
+
+    #: Content type of the responses
+    content_type = Str('text/html; charset=utf-8')
+
+    #: Cache-Control header sent. The default makes clients revalidate.
+    cache_control = Str('no-cache')
+
+    #: Storage of the responses by view id
+    cache = Typed(LRUCache, ())
+
+    #: Version of each view by view id
+    versions = Dict()
+
+    #: Observers added to each view by view id
+    observers = Dict()
+
+    def version(self, view):
+        """ Get the current version of the view. The first time a view is
+        seen an observer is added to increment it when the view is modified.
+        Changes that are waiting to be applied (ie a Markdown source change)
+        are applied first so they are included.
+
+        """
+        versions = self.versions
+        view_id = view.id
+        if view_id not in versions:
+            versions[view_id] = 0
+
+            def on_modified(change):
+                versions[view_id] = versions.get(view_id, 0) + 1
+
+            def on_destroyed(change):
+                self.discard(view)
+
+            self.observers[view_id] = (on_modified, on_destroyed)
+            view.observe('modified', on_modified)
+            view.observe('destroyed', on_destroyed)
+        if view.proxy_is_active:
+            root = view.proxy.root
+            if root.pending or root.futures or root.caches:
+                root.flush()
+        return versions[view_id]
+
+    def discard(self, view):
+        """ Remove the cached responses of the view and stop observing it.
+        This is done automatically when the view is destroyed.
+
+        """
+        view_id = view.id
+        self.versions.pop(view_id, None)
+        self.cache.pop(view_id)
+        observers = self.observers.pop(view_id, None)
+        if observers is not None:
+            on_modified, on_destroyed = observers
+            view.unobserve('modified', on_modified)
+            view.unobserve('destroyed', on_destroyed)
+
+    def get(self, view, **kwargs):
+        """ Get the cached response for the view, rendering it if it changed
+        since it was cached.
+
+        Parameters
+        ----------
+        view: Html
+            The view to render.
+        kwargs: Dict
+            Attributes to set before rendering.
+
+        Returns
+        -------
+        response: CachedResponse
+            The cached response.
+
+        """
+        for k, v in kwargs.items():
+            setattr(view, k, v)
+        version = self.version(view)
+        response = self.cache.get(view.id)
+        if response is None or response.version != version:
+            body = view.render()
+            if not isinstance(body, bytes):
+                body = body.encode('utf-8')
+            if self.etag == 'content':
+                etag = '"%s"' % content_key(body)
+            else:
+                etag = '"%s-%s"' % (view.id, version)
+            response = CachedResponse(version=version, etag=etag, body=body)
+            self.cache.set(view.id, response, len(body))
+        return response
+
+    def respond(self, view, headers=None, **kwargs):
+        """ Create the response for a request of the view.
+
+        Parameters
+        ----------
+        view: Html
+            The view to render.
+        headers: Mapping
+            The request headers. Used to check the `If-None-Match` and
+            `Accept-Encoding`. Lookups are done with the canonical header
+            names and the lowercase names.
+        kwargs: Dict
+            Attributes to set before rendering.
+
+        Returns
+        -------
+        result: Tuple
+            A tuple of (status, headers, body).
+
+        """
+        headers = headers or {}
+        response = self.get(view, **kwargs)
+        result = {
+            'ETag': response.etag,
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': self.cache_control,
+        }
+        if etag_matches(response.etag, header(headers, 'If-None-Match')):
+            return 304, result, b''
+
+        result['Content-Type'] = self.content_type
+        body = response.body
+        encoding = self.choose_encoding(
+            header(headers, 'Accept-Encoding'), len(body))
+        if encoding:
+            variant = response.variants.get(encoding)
+            if variant is None:
+                variant = compress(body, encoding, self.level)
+                response.variants[encoding] = variant
+            result['Content-Encoding'] = encoding
+            body = variant
+        return 200, result, body
+
+    def choose_encoding(self, accept, size):
+        """ Choose the encoding to use or None if the response should not
+        be compressed.
+
+        """
+        if size < self.min_size or not accept:
+            return None
+        accepted = parse_accept_encoding(accept)
+        best, best_q = None, 0
+        for name in self.encodings:
+            q = accepted.get(name, accepted.get('*', 0))
+            if q > best_q:
+                best, best_q = name, q
+        return best
+
+
+def header(headers, name):
+    """ Get a header using the canonical or lowercase name """
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(name.lower())
+    return value
+
+
+# -----------------------------------------------------------------------------
+# Adapters
+# -----------------------------------------------------------------------------
+def tornado_respond(handler, view, cache, **kwargs):
+    """ Write the response for the view with a tornado RequestHandler.
+
+    Parameters
+    ----------
+    handler: tornado.web.RequestHandler
+        The handler of the request.
+    view: Html
+        The view to render.
+    cache: ResponseCache
+        The cache to use.
+    kwargs: Dict
+        Attributes to set before rendering.
+
+    """
+    status, headers, body = cache.respond(
+        view, handler.request.headers, **kwargs)
+    handler.set_status(status)
+    for name, value in headers.items():
+        handler.set_header(name, value)
+    if body:
+        handler.write(body)
+
+
+def aiohttp_respond(request, view, cache, **kwargs):
+    """ Create the aiohttp Response for the view.
+
+    Parameters
+    ----------
+    request: aiohttp.web.Request
+        The request.
+    view: Html
+        The view to render.
+    cache: ResponseCache
+        The cache to use.
+    kwargs: Dict
+        Attributes to set before rendering.
+
+    Returns
+    -------
+    response: aiohttp.web.Response
+        The response to return from the handler.
+
+    """
+    from aiohttp import web
+    status, headers, body = cache.respond(view, request.headers, **kwargs)
+    return web.Response(status=status, headers=headers, body=body or None)
+
+
+def runner_respond(request, view, cache, **kwargs):
+    """ Create the response for a handler of `web.core.runner.Runner` """
+    from web.core.runner import Response
+    status, headers, body = cache.respond(view, request.headers, **kwargs)
+    return Response(status=status, headers=headers, body=body)
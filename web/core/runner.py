@@ -0,0 +1,767 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+import os
+import gc
+import sys
+import json
+import socket
+import signal
+import asyncio
+import logging
+import stat
+import shutil
+import argparse
+import tempfile
+import selectors
+from http import HTTPStatus
+from importlib import import_module
+from inspect import isawaitable
+from contextlib import ExitStack
+from time import perf_counter, time
+from urllib.parse import urlsplit, parse_qs
+from atom.api import (
+    Atom, Bool, Bytes, Callable, Dict, Float, Int, List, Str, Value
+)
+from web.core.app import WebApplication, shard_of
+from web.core.instrument import instrument
+
+log = logging.getLogger('web')
+
+
+class Request(Atom):
+    """ A request received by the server """
+
+    #: Request method (ex GET)
+    method = Str()
+
+    #: Request path without the query
+    path = Str()
+
+    #: Query string of the request
+    query = Str()
+
+    #: Query arguments as a dict of lists
+    arguments = Dict()
+
+    #: Http version of the request
+    version = Str('HTTP/1.1')
+
+    #: Request headers, all names are lowercase
+    headers = Dict()
+
+    #: Request body
+    body = Bytes()
+
+    def encode(self):
+        """ Encode the request so it can be forwarded """
+        target = self.path
+        if self.query:
+            target += '?' + self.query
+        lines = ['%s %s %s' % (self.method, target, self.version)]
+        lines.extend('%s: %s' % item for item in self.headers.items())
+        head = '\r\n'.join(lines) + '\r\n\r\n'
+        return head.encode('latin-1') + self.body
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+
+class Response(Atom):
+    """ A response to send to the client """
+
+    #: Status code
+    status = Int(200)
+
+    #: Response headers
+    headers = Dict()
+
+    #: Response body
+    body = Bytes()
+
+    def encode(self):
+        """ Encode the status line, headers and body of the response """
+        headers = {'Content-Type': 'text/html; charset=utf-8'}
+        headers.update(self.headers)
+        headers['Content-Length'] = str(len(self.body))
+        try:
+            reason = HTTPStatus(self.status).phrase
+        except ValueError:
+            reason = ''
+        lines = ['HTTP/1.1 %s %s' % (self.status, reason)]
+        lines.extend('%s: %s' % item for item in headers.items())
+        head = '\r\n'.join(lines) + '\r\n\r\n'
+        return head.encode('latin-1') + self.body
+
+
+def to_response(result):
+    """ Convert the result of a handler into a Response. A handler may return
+    a Response, the body as str or bytes, or a tuple of
+    (status, headers, body).
+
+    """
+    if isinstance(result, Response):
+        return result
+    status, headers = 200, {}
+    if isinstance(result, tuple):
+        status, headers, result = result
+    if isinstance(result, str):
+        result = result.encode('utf-8')
+    return Response(status=status, headers=headers or {}, body=result or b'')
+
+
+class RequestTooLarge(ValueError):
+    """ Raised when the body of a request is larger than allowed """
+
+
+async def read_request(reader, max_body=None):
+    """ Read a request from the stream.
+
+    Parameters
+    ----------
+    reader: StreamReader
+        The stream to read from.
+    max_body: Int
+        Maximum size of the body in bytes. If None there is no limit.
+
+    Returns
+    -------
+    request: Request or None
+        The request or None if the connection was closed before a request
+        was started.
+
+    Raises
+    ------
+    ValueError
+        If the request is invalid.
+    RequestTooLarge
+        If the body is larger than the max_body.
+
+    """
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    except asyncio.LimitOverrunError:
+        raise ValueError("Request header is too large")
+    lines = head.decode('latin-1').split('\r\n')
+    parts = lines[0].split(' ')
+    if len(parts) != 3:
+        raise ValueError("Invalid request line: %r" % lines[0])
+    method, target, version = parts
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, sep, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length < 0:
+        raise ValueError("Invalid content length: %s" % length)
+    if max_body is not None and length > max_body:
+        raise RequestTooLarge("Request body is too large")
+    body = await reader.readexactly(length) if length else b''
+    url = urlsplit(target)
+    return Request(method=method, path=url.path, query=url.query,
+                   arguments=parse_qs(url.query), version=version,
+                   headers=headers, body=body)
+
+
+def merge_stats(total, stats):
+    """ Add the numbers of the stats dict to the total dict in place,
+    merging nested dicts.
+
+    """
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            merge_stats(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+class Worker(Atom):
+    """ A forked worker process as seen by the parent """
+
+    #: Process id
+    pid = Int()
+
+    #: Generation of workers this belongs to. This is incremented on restart.
+    generation = Int()
+
+    #: Read end of the pipe the worker sends stats over
+    fd = Int()
+
+    #: Data read from the pipe that is not a complete line yet
+    buffer = Bytes()
+
+    #: Time the worker was started
+    started = Float()
+
+
+class Runner(Atom):
+    """ Runs a server on multiple cores by forking worker processes.
+
+    Views are imported and warmed up once in the parent by the `setup`
+    callable. The objects are then frozen with `gc.freeze` before forking so
+    the pages stay shared in copy-on-write memory instead of being copied
+    into each worker when the garbage collector touches them.
+
+    The workers share the listening socket (which is opened with
+    SO_REUSEPORT so another runner can be started on the same port for zero
+    downtime deploys) and serve requests with a minimal asyncio http server.
+
+    Views rendered by a worker only exist in that process. Each worker sets
+    the `shard` of the application to it's pid so it is included in the ids
+    of views it creates and also listens on a unix socket named after it.
+    When a request refers to a view of another worker (ie the websocket of a
+    live view with `?ref=<view.id>`), the connection is forwarded to the
+    owner over it's socket.
+
+    Send SIGHUP to gracefully restart the workers and SIGTERM or SIGINT to
+    stop. Workers finish in flight requests before exiting.
+
+    """
+    #: Called with each Request, returns a Response, str, bytes, or a tuple
+    #: of (status, headers, body). May be a coroutine function.
+    handler = Callable()
+
+    #: Called once in the parent before the workers are forked. Use this to
+    #: import views, load bundles and warm up caches.
+    setup = Callable()
+
+    #: Address to listen on
+    host = Str('127.0.0.1')
+
+    #: Port to listen on. If 0 a free port is used.
+    port = Int(8888)
+
+    #: Listen backlog
+    backlog = Int(1024)
+
+    #: Number of worker processes
+    workers = Int()
+
+    #: Seconds workers wait for requests in progress when stopping
+    timeout = Float(10)
+
+    #: Maximum size of a request body in bytes. Larger requests are
+    #: rejected with a 413 response.
+    max_body = Int(1024 * 1024)
+
+    #: Seconds between stats updates sent from the workers
+    stats_interval = Float(1)
+
+    #: Also collect the render stats of the toolkit using `instrument`
+    instrument = Bool()
+
+    #: Forward requests for views owned by another worker to it
+    route = Bool(True)
+
+    #: Directory of the unix sockets the workers listen on for forwarded
+    #: connections. A temporary directory is used if not set.
+    socket_dir = Str()
+
+    #: Listening socket
+    socket = Value()
+
+    #: Workers by pid
+    processes = Dict()
+
+    #: Last stats received by worker pid. Workers that exited are kept so
+    #: the totals include all requests served.
+    stats = Dict()
+
+    #: Current generation of workers
+    generation = Int()
+
+    #: Set when stopping
+    stopping = Bool()
+
+    #: Time the remaining workers are killed once stopping
+    deadline = Float()
+
+    #: Signals received by the parent that still need handled
+    pending = List()
+
+    #: Selector used by the parent to read stats from the workers
+    selector = Value()
+
+    # -------------------------------------------------------------------------
+    # Worker state
+    # -------------------------------------------------------------------------
+    #: Request counters of this worker
+    counters = Dict()
+
+    #: Open connections of this worker by task
+    connections = Dict()
+
+    #: Keep alive connections waiting for another request
+    idle = Value(factory=set)
+
+    #: Event set when the worker should stop
+    closing = Value()
+
+    def _default_workers(self):
+        return os.cpu_count() or 1
+
+    def _default_counters(self):
+        return {'requests': 0, 'errors': 0, 'forwarded': 0, 'time': 0.0}
+
+    # -------------------------------------------------------------------------
+    # Parent
+    # -------------------------------------------------------------------------
+    def bind(self):
+        """ Create the listening socket shared by the workers """
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.setblocking(False)
+        return sock
+
+    @property
+    def address(self):
+        """ The (host, port) the server is listening on """
+        return self.socket.getsockname()[:2]
+
+    def run(self):
+        """ Warm up, fork the workers and supervise them until stopped.
+
+        Returns
+        -------
+        stats: Dict
+            The aggregated stats of all the workers. See `aggregate`.
+
+        """
+        if WebApplication.instance() is None:
+            WebApplication()
+        if self.setup is not None:
+            self.setup()
+        self.socket = self.bind()
+        log.info("Listening on http://%s:%s", *self.address)
+
+        # Move everything created so far out of the collected generations
+        # so it is never written to (and copied) by the workers
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+
+        socket_dir = self.socket_dir
+        if self.route and not socket_dir:
+            self.socket_dir = tempfile.mkdtemp(prefix='enaml-web-')
+
+        self.selector = selectors.DefaultSelector()
+        handlers = {
+            sig: signal.signal(sig, self._on_signal)
+            for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            self.spawn(self.workers)
+            self.supervise()
+        finally:
+            for sig, handler in handlers.items():
+                signal.signal(sig, handler)
+            self.selector.close()
+            self.socket.close()
+            if self.route and not socket_dir:
+                shutil.rmtree(self.socket_dir, ignore_errors=True)
+                self.socket_dir = ''
+        return self.aggregate()
+
+    def _on_signal(self, sig, frame):
+        self.pending.append(sig)
+
+    def spawn(self, count):
+        """ Fork the given number of workers """
+        for i in range(count):
+            r, w = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(r)
+                self._run_worker(w)
+            os.close(w)
+            self.processes[pid] = Worker(pid=pid, generation=self.generation,
+                                         fd=r, started=time())
+            self.selector.register(r, selectors.EVENT_READ, pid)
+
+    def supervise(self):
+        """ Process signals, read stats and replace workers that exit until
+        all workers have stopped.
+
+        """
+        while self.processes:
+            for key, mask in self.selector.select(0.1):
+                self.read_stats(self.processes[key.data])
+            while self.pending:
+                sig = self.pending.pop(0)
+                if sig == signal.SIGHUP:
+                    self.restart()
+                else:
+                    self.stop()
+            self.reap()
+            if self.stopping and time() > self.deadline:
+                for pid in self.processes:
+                    log.warning("Killing worker %s", pid)
+                    self._kill(pid, signal.SIGKILL)
+                self.deadline += self.timeout
+
+    def restart(self):
+        """ Start a new generation of workers and gracefully stop the old """
+        if self.stopping:
+            return
+        log.info("Restarting workers")
+        old = list(self.processes)
+        self.generation += 1
+        self.spawn(self.workers)
+        for pid in old:
+            self._kill(pid, signal.SIGTERM)
+
+    def stop(self):
+        """ Gracefully stop all workers """
+        if self.stopping:
+            return
+        log.info("Stopping workers")
+        self.stopping = True
+        self.deadline = time() + self.timeout + 1
+        for pid in self.processes:
+            self._kill(pid, signal.SIGTERM)
+
+    def _kill(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        """ Cleanup workers that exited and replace them if needed """
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.processes.pop(pid, None)
+            if worker is None:
+                continue
+            self.read_stats(worker)
+            self.selector.unregister(worker.fd)
+            os.close(worker.fd)
+            if self.stopping or worker.generation != self.generation:
+                continue
+            log.warning("Worker %s exited with status %s", pid, status)
+            self.spawn(1)
+
+    def read_stats(self, worker):
+        """ Read the stats sent by the worker. Each update is a json line. """
+        try:
+            data = os.read(worker.fd, 65536)
+        except BlockingIOError:
+            return
+        lines = (worker.buffer + data).split(b'\n')
+        worker.buffer = lines.pop()
+        for line in reversed(lines):
+            if line:
+                self.stats[worker.pid] = json.loads(line.decode())
+                break
+
+    def aggregate(self):
+        """ Aggregate the stats of all the workers.
+
+        Returns
+        -------
+        stats: Dict
+            A dict with the stats of each worker by pid under `workers` and
+            the sum of all of them under `total`. Each contains the number of
+            `requests`, `errors`, the `time` spent handling them and the
+            render stats as `hooks` if `instrument` is enabled.
+
+        """
+        total = {}
+        for stats in self.stats.values():
+            merge_stats(total, stats)
+        return {'workers': dict(self.stats), 'total': total}
+
+    # -------------------------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------------------------
+    def _run_worker(self, fd):
+        """ Entry point of a forked worker. This never returns. """
+        code = 1
+        try:
+            # Resources of the parent that are not needed
+            self.selector.close()
+            for worker in self.processes.values():
+                os.close(worker.fd)
+            self.processes = {}
+            self.stats = {}
+            self.pending = []
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+            # The threads of an executor created in the parent do not exist
+            app = WebApplication.instance()
+            from concurrent.futures import ThreadPoolExecutor
+            if isinstance(app.executor, ThreadPoolExecutor):
+                del app.executor
+            app.shard = str(os.getpid())
+
+            self.serve(fd)
+            code = 0
+        except BaseException:
+            log.exception("Worker %s failed", os.getpid())
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def serve(self, fd):
+        """ Serve requests in this process until SIGTERM is received.
+
+        Parameters
+        ----------
+        fd: Int
+            The file descriptor to write stats to.
+
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            with ExitStack() as stack:
+                collector = None
+                if self.instrument:
+                    collector = stack.enter_context(instrument())
+                loop.run_until_complete(self._serve(fd, collector))
+        finally:
+            loop.close()
+
+    async def _serve(self, fd, collector):
+        loop = asyncio.get_event_loop()
+        self.closing = asyncio.Event()
+        loop.add_signal_handler(signal.SIGTERM, self.closing.set)
+        servers = [await asyncio.start_server(self.handle, sock=self.socket)]
+        if self.route:
+            path = self.socket_path(WebApplication.instance().shard)
+            servers.append(await asyncio.start_unix_server(self.handle, path))
+        reporter = loop.create_task(self._report(fd, collector))
+        await self.closing.wait()
+
+        # Stop accepting and close idle keep alive connections. New
+        # connections are still served since the client is waiting on them.
+        for server in servers:
+            server.close()
+        if self.route:
+            os.unlink(path)
+        await asyncio.sleep(0.1)  # Let connections just accepted start
+        for task in self.idle:
+            self.connections[task].close()
+        if self.connections:
+            await asyncio.wait(list(self.connections), timeout=self.timeout)
+        reporter.cancel()
+        self._send_stats(fd, collector)
+
+    async def _report(self, fd, collector):
+        """ Send the stats to the parent periodically """
+        last = None
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            if self.counters != last:
+                last = dict(self.counters)
+                self._send_stats(fd, collector)
+
+    def _send_stats(self, fd, collector):
+        stats = dict(self.counters)
+        if collector is not None:
+            stats['hooks'] = collector.to_dict()
+        os.write(fd, json.dumps(stats).encode() + b'\n')
+
+    async def handle(self, reader, writer):
+        """ Handle requests of a connection """
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.max_body)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except RequestTooLarge:
+                    writer.write(Response(status=413).encode())
+                    break
+                except ValueError:
+                    writer.write(Response(status=400).encode())
+                    break
+                if request is None:
+                    break
+                self.idle.discard(task)
+                if self.route and await self.forward(request, reader, writer):
+                    break
+                response = await self.respond(request)
+                keep_alive = request.keep_alive and not self.closing.is_set()
+                response.headers['Connection'] = (
+                    'keep-alive' if keep_alive else 'close')
+                writer.write(response.encode())
+                await writer.drain()
+                if not keep_alive:
+                    break
+                self.idle.add(task)
+        except ConnectionError:
+            pass
+        finally:
+            self.idle.discard(task)
+            del self.connections[task]
+            writer.close()
+
+    def socket_path(self, shard):
+        """ Get the path of the unix socket of the worker """
+        return os.path.join(self.socket_dir, '%s.sock' % shard)
+
+    def is_worker(self, shard):
+        """ Check if the shard is a live worker of this runner. Workers use
+        their pid as the shard and listen on a socket in the `socket_dir`
+        until they stop.
+
+        """
+        if not shard.isdigit():
+            return False
+        try:
+            mode = os.stat(self.socket_path(shard)).st_mode
+        except OSError:
+            return False
+        return stat.S_ISSOCK(mode)
+
+    def owner(self, request):
+        """ Get the shard of the worker that owns the view the request is
+        for. By default this is the shard in the `ref` argument. The shard
+        comes from the client so anything that is not a pid is ignored.
+
+        Returns
+        -------
+        shard: String
+            The shard that owns the view or an empty string if the request
+            can be handled by any worker.
+
+        """
+        ref = request.arguments.get('ref')
+        shard = shard_of(ref[0]) if ref else ''
+        return shard if shard.isdigit() else ''
+
+    async def forward(self, request, reader, writer):
+        """ Forward the connection to the worker that owns the view the
+        request is for. Everything sent on the connection afterwards
+        (ie websocket messages) is passed through as is.
+
+        Returns
+        -------
+        result: Bool
+            Whether the connection was forwarded. If the request is for this
+            worker or the owner is not a live worker this returns False.
+
+        """
+        shard = self.owner(request)
+        if not shard or shard == WebApplication.instance().shard:
+            return False
+        if not self.is_worker(shard):
+            return False
+        try:
+            r, w = await asyncio.open_unix_connection(self.socket_path(shard))
+        except OSError:
+            return False
+        self.counters['forwarded'] += 1
+        try:
+            w.write(request.encode())
+            await asyncio.gather(pipe(reader, w), pipe(r, writer))
+        finally:
+            w.close()
+        return True
+
+    async def respond(self, request):
+        """ Call the handler and update the counters """
+        counters = self.counters
+        start = perf_counter()
+        try:
+            result = self.handler(request)
+            if isawaitable(result):
+                result = await result
+            response = to_response(result)
+        except Exception:
+            log.exception("Error handling %s %s", request.method, request.path)
+            counters['errors'] += 1
+            response = Response(status=500, body=b'Internal Server Error')
+        counters['requests'] += 1
+        counters['time'] += perf_counter() - start
+        return response
+
+
+async def pipe(reader, writer):
+    """ Copy data from the reader to the writer until the end of the stream
+    """
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, OSError):
+        writer.close()
+
+
+def load_object(path):
+    """ Load an object from a `module:name` path """
+    module, sep, name = path.partition(':')
+    if not sep:
+        raise ValueError("%s must be in the form `module:name`" % path)
+    return getattr(import_module(module), name)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Run a request handler on multiple cores")
+    parser.add_argument('handler', help="Handler as module:name")
+    parser.add_argument('--setup', default=None,
+                        help="Function called before forking as module:name")
+    parser.add_argument('--bundle', action='append', default=[],
+                        help="Package with a view bundle to load")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--instrument', action='store_true',
+                        help="Collect render stats")
+    options = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO)
+    user_setup = load_object(options.setup) if options.setup else None
+
+    def setup():
+        if options.bundle:
+            from web.core import bundle
+            for package in options.bundle:
+                bundle.load(package)
+        if user_setup is not None:
+            user_setup()
+
+    runner = Runner(handler=load_object(options.handler), setup=setup,
+                    host=options.host, port=options.port,
+                    instrument=options.instrument)
+    if options.workers:
+        runner.workers = options.workers
+    stats = runner.run()
+    print(json.dumps(stats['total']))
+
+
+if __name__ == '__main__':
+    main()
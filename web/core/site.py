@@ -0,0 +1,374 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+import os
+import sys
+import json
+import hashlib
+import logging
+import multiprocessing
+from importlib import import_module
+from concurrent.futures import ProcessPoolExecutor
+from atom.api import Atom, Bool, Dict, Int, List, Str, Value, Instance
+from web.core.app import WebApplication
+from web.components.html import Tag
+
+log = logging.getLogger('web')
+
+
+class Page(Atom):
+    """ A page of a static site """
+
+    #: Path of the output file relative to the output directory
+    path = Str()
+
+    #: The view class to render or a `module:Name` string to import it from
+    view = Value()
+
+    #: Attributes to pass to render
+    kwargs = Dict()
+
+    #: Data files the page depends on. The enaml files of the views used to
+    #: render the page are found automatically.
+    inputs = List(str)
+
+    #: Version of the data of the page (ie a last modified time). If it
+    #: changes the page is rebuilt. By default the repr of the kwargs is used
+    #: so it should be stable.
+    key = Str()
+
+    def _default_key(self):
+        if not self.kwargs:
+            return ''
+        data = repr(sorted(self.kwargs.items())).encode()
+        return hashlib.sha1(data).hexdigest()
+
+
+def view_name(view):
+    """ Get the `module:Name` of a view class """
+    if isinstance(view, str):
+        return view
+    return '%s:%s' % (view.__module__, view.__qualname__)
+
+
+def load_view(view):
+    """ Import the view if given as a `module:Name` string """
+    if not isinstance(view, str):
+        return view
+    import enaml
+    module, sep, name = view.partition(':')
+    with enaml.imports():
+        return getattr(import_module(module), name)
+
+
+#: Enaml files by declaration class
+_class_files = {}
+
+
+def source_files(cls):
+    """ Get the enaml files the class and it's bases were defined in """
+    files = _class_files.get(cls)
+    if files is None:
+        files = set()
+        for base in cls.__mro__:
+            module = sys.modules.get(base.__module__)
+            path = getattr(module, '__file__', None) or ''
+            if path.endswith('.enaml'):
+                files.add(os.path.abspath(path))
+        _class_files[cls] = files
+    return files
+
+
+def fingerprint(path):
+    """ Get the [mtime, size] of the file or an empty list if it does not
+    exist.
+
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return []
+    return [st.st_mtime_ns, st.st_size]
+
+
+def stable_ids(view):
+    """ Set the id of each node without one to it's position in the tree.
+    The default ids are based on the memory address so the output of the
+    same page would be different every time it is built.
+
+    """
+    for i, node in enumerate(view.traverse()):
+        if not isinstance(node, Tag):
+            continue
+        if node.get_member('id').get_slot(node) is None:
+            node.id = 'n%s' % i
+
+
+def render_page(output, path, view, kwargs):
+    """ Render a page and write it if the content changed.
+
+    Returns
+    -------
+    result: Tuple
+        A tuple of (digest, written, dependencies) where dependencies are the
+        fingerprints of the enaml files of all the declarations used in the
+        page by path. They are taken before the page is rendered so a file
+        changed while rendering is seen as changed by the next build.
+
+    """
+    if WebApplication.instance() is None:
+        WebApplication()
+    View = load_view(view)
+    page = View(**kwargs)
+    page.initialize()
+    files = set()
+    for node in page.traverse():
+        files.update(source_files(type(node)))
+    dependencies = {path: fingerprint(path) for path in files}
+    stable_ids(page)
+    html = page.render().encode('utf-8')
+    page.destroy()
+
+    digest = hashlib.sha1(html).hexdigest()
+    filename = os.path.join(output, path)
+    written = file_hash(filename) != digest
+    if written:
+        dirname = os.path.dirname(filename)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        tmp = '%s.%s.tmp' % (filename, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(html)
+        os.replace(tmp, filename)
+    return digest, written, dependencies
+
+
+def render_pages(output, pages):
+    """ Render a chunk of pages in a worker. Errors are returned instead of
+    raised so one bad page does not fail the other pages of the chunk.
+
+    """
+    results = []
+    for path, view, kwargs in pages:
+        try:
+            results.append((path, render_page(output, path, view, kwargs)))
+        except Exception as e:
+            log.exception("Failed to build %s", path)
+            results.append((path, '%s: %s' % (type(e).__name__, e)))
+    return results
+
+
+def file_hash(path):
+    """ Get the sha1 of the file or None if it does not exist """
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class BuildResult(Atom):
+    """ What was done by a build """
+
+    #: Pages that were rendered
+    rendered = List(str)
+
+    #: Pages whose content changed and were written
+    written = List(str)
+
+    #: Outputs of pages no longer in the site that were removed
+    removed = List(str)
+
+    #: Errors of pages that failed to build by path
+    errors = Dict()
+
+
+class Site(Atom):
+    """ Builds a static site incrementally.
+
+    The enaml files and data inputs each page depends on are saved in a
+    manifest in the output directory. On the next build only pages with a
+    dependency that changed (or new pages) are rendered, and a page is only
+    written if the content hash differs from the file on disk. The pages are
+    rendered across multiple processes.
+
+    Changes to python code used by the views are not tracked, use
+    `build(force=True)` after changing it.
+
+    """
+    #: Directory the pages are written to
+    output = Str()
+
+    #: Pages of the site
+    pages = List(Page)
+
+    #: Number of processes used to render the pages
+    workers = Int()
+
+    #: Number of pages rendered per task sent to a worker
+    chunksize = Int(32)
+
+    #: Remove the output of pages that are no longer part of the site
+    clean = Bool(True)
+
+    #: Path of the manifest. Defaults to `.manifest.json` in the output.
+    manifest = Str()
+
+    #: Fingerprints of files looked up during the current build
+    stats = Dict()
+
+    #: Executor used to render the pages
+    executor = Instance(ProcessPoolExecutor)
+
+    def _default_workers(self):
+        return os.cpu_count() or 1
+
+    def _default_manifest(self):
+        return os.path.join(self.output, '.manifest.json')
+
+    def fingerprint(self, path):
+        """ Get the [mtime, size] of the file, cached for the build """
+        stats = self.stats
+        fp = stats.get(path)
+        if fp is None:
+            fp = stats[path] = fingerprint(path)
+        return fp
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'files': {}, 'pages': {}}
+
+    def save_manifest(self, manifest):
+        tmp = '%s.tmp' % self.manifest
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.manifest)
+
+    def outdated(self, page, entry, files):
+        """ Check if the page must be rebuilt.
+
+        Parameters
+        ----------
+        page: Page
+            The page to check.
+        entry: Dict
+            The manifest entry of the page from the last build.
+        files: Dict
+            The fingerprints of files from the last build.
+
+        """
+        if entry is None or entry['key'] != page.key or \
+                entry['view'] != view_name(page.view):
+            return True
+        if not os.path.exists(os.path.join(self.output, page.path)):
+            return True
+        fingerprint = self.fingerprint
+        for path in entry['deps']:
+            if fingerprint(path) != files.get(path):
+                return True
+        return False
+
+    def build(self, force=False):
+        """ Build the pages that changed since the last build.
+
+        Parameters
+        ----------
+        force: Bool
+            Rebuild all the pages.
+
+        Returns
+        -------
+        result: BuildResult
+            The pages rendered, written and removed.
+
+        """
+        self.stats = {}
+        manifest = self.load_manifest()
+        files, entries = manifest['files'], manifest['pages']
+        result = BuildResult()
+        if not os.path.exists(self.output):
+            os.makedirs(self.output)
+
+        pages = {}
+        todo = []
+        for page in self.pages:
+            pages[page.path] = page
+            if force or self.outdated(page, entries.get(page.path), files):
+                for path in page.inputs:
+                    self.fingerprint(os.path.abspath(path))
+                todo.append((page.path, page.view, page.kwargs))
+
+        if self.clean:
+            for path in list(entries):
+                if path not in pages:
+                    del entries[path]
+                    filename = os.path.join(self.output, path)
+                    if os.path.exists(filename):
+                        os.remove(filename)
+                    result.removed.append(path)
+
+        for path, r in self.render(todo):
+            page = pages[path]
+            if isinstance(r, str):
+                entries.pop(path, None)
+                result.errors[path] = r
+                continue
+            digest, written, dependencies = r
+
+            # Keep the fingerprint taken first, if a file changed since then
+            # the pages using it are rebuilt next time
+            stats = self.stats
+            for p, fp in dependencies.items():
+                stats.setdefault(p, fp)
+            deps = sorted(dependencies)
+            deps.extend(os.path.abspath(p) for p in page.inputs)
+            entries[path] = {
+                'view': view_name(page.view),
+                'key': page.key,
+                'deps': deps,
+                'hash': digest,
+            }
+            result.rendered.append(path)
+            if written:
+                result.written.append(path)
+
+        # Record the fingerprint of every file a page depends on as it was
+        # before the pages using it were rendered
+        used = set()
+        for entry in entries.values():
+            used.update(entry['deps'])
+        manifest['files'] = {p: self.fingerprint(p) for p in used}
+        self.save_manifest(manifest)
+        self.stats = {}
+        return result
+
+    def render(self, todo):
+        """ Render the pages in chunks using the executor """
+        chunksize = self.chunksize
+        chunks = [todo[i:i+chunksize] for i in range(0, len(todo), chunksize)]
+        if self.workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                for r in render_pages(self.output, chunk):
+                    yield r
+            return
+        executor = self.executor
+        if executor is None:
+            context = None
+            if 'fork' in multiprocessing.get_all_start_methods():
+                # Views already imported are inherited by the workers
+                context = multiprocessing.get_context('fork')
+            executor = ProcessPoolExecutor(self.workers, mp_context=context)
+        try:
+            futures = [executor.submit(render_pages, self.output, chunk)
+                       for chunk in chunks]
+            for f in futures:
+                for r in f.result():
+                    yield r
+        finally:
+            if executor is not self.executor:
+                executor.shutdown()
@@ -0,0 +1,437 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+import json
+import time
+import inspect
+import logging
+from html import escape
+from atom.api import (
+    Bool, Callable, Float, ForwardTyped, List, Str, Typed, Value, set_default
+)
+from enaml.core.compiler_nodes import new_scope
+from enaml.core.declarative import d_
+from web.components.html import Tag, ProxyTag
+from .app import WebApplication
+from .block import has_identifiers
+
+log = logging.getLogger('web')
+
+
+#: Script sent before the first section which moves the content of a section
+#: from the template it was streamed in into the placeholder.
+SWAP_SCRIPT = (
+    '<script>function webSwap(id){'
+    'var t=document.getElementById(id+"-content"),'
+    'n=document.getElementById(id);'
+    'if(t&&n){n.replaceChildren(t.content);t.remove();}'
+    '}</script>'
+)
+
+
+class ProxyAsync(ProxyTag):
+    #: Reference to the declaration
+    declaration = ForwardTyped(lambda: Async)
+
+    def set_loaded(self, loaded):
+        raise NotImplementedError
+
+    def content(self):
+        raise NotImplementedError
+
+
+class Async(Tag):
+    """ A section of a page that is displayed once the data it depends on
+    is loaded.
+
+    The placeholder is displayed and the children are not built until the
+    loader completes. The result is then saved to `result` so the children
+    can use it. Use `stream` to send a page with the placeholders and then
+    send each section as it is loaded, or call `load` directly.
+
+    """
+    #: Reference to the proxy
+    proxy = Typed(ProxyAsync)
+
+    #: Default tag is a div
+    tag = set_default('div')
+
+    #: Function called to load the data. It may return an awaitable (ie it
+    #: may be a coroutine function) or the value.
+    loader = d_(Callable()).tag(attr=False)
+
+    #: Run the loader in the application's executor instead of blocking
+    #: the event loop. Use this for loaders that are not async.
+    offload = d_(Bool()).tag(attr=False)
+
+    #: Maximum time in seconds to wait for the loader. If zero there is no
+    #: time limit.
+    timeout = d_(Float()).tag(attr=False)
+
+    #: Html source to display while loading
+    placeholder = d_(Str()).tag(attr=False)
+
+    #: Html source to display if the loader fails or times out
+    fallback = d_(Str()).tag(attr=False)
+
+    #: Result of the loader
+    result = Value()
+
+    #: Exception raised by the loader if it failed
+    error = Value()
+
+    #: Whether the loader completed (or failed)
+    loaded = Bool()
+
+    #: Child nodes which are not built until the section is loaded
+    async_nodes = List()
+
+    #: Signal to the compiler that this class handles child creation.
+    __intercepts_child_nodes__ = True
+
+    async def load(self):
+        """ Run the loader and display the children with the result.
+        Errors are logged and the fallback is displayed.
+
+        Returns
+        -------
+        result: Object
+            The result of the loader.
+
+        """
+        if self.loaded:
+            return self.result
+        import asyncio
+        try:
+            loader = self.loader
+            if loader is None:
+                value = None
+            elif self.offload:
+                value = WebApplication.instance().run_in_executor(loader)
+            else:
+                value = loader()
+            if inspect.isawaitable(value):
+                if self.timeout:
+                    value = await asyncio.wait_for(value, self.timeout)
+                else:
+                    value = await value
+        except Exception as e:
+            log.exception("Failed to load %s", self.id)
+            self.resolve(error=e)
+        else:
+            self.resolve(value)
+        return self.result
+
+    def resolve(self, result=None, error=None):
+        """ Set the result and build the children. If an error is given the
+        fallback is displayed instead.
+
+        """
+        if self.loaded:
+            return
+        active = self.proxy_is_active
+        self.result = result
+        self.error = error
+        self.loaded = True
+        if error is None:
+            # Add the children in bulk instead of a change for each child
+            self.proxy_is_active = False
+            try:
+                self.build_nodes()
+            finally:
+                self.proxy_is_active = active
+        if active:
+            self.proxy.set_loaded(True)
+            self._notify_modified({
+                'id': self.id,
+                'type': 'refresh',
+                'name': 'children',
+                'value': self.proxy.content(),
+            })
+
+    def build_nodes(self):
+        """ Build the stored child nodes without initializing them once
+        the section is loaded.
+
+        """
+        async_nodes = self.async_nodes
+        if async_nodes and self.loaded:
+            del self.async_nodes
+            # The children are added once the scope is closed since they are
+            # initialized when added if the section is already initialized.
+            children = []
+            for nodes, key, f_locals in async_nodes:
+                with new_scope(key, f_locals):
+                    for node in nodes:
+                        children.append(node(None))
+            self.insert_children(None, children)
+
+    def initialize(self):
+        """ A reimplemented initializer. The children are only built if the
+        section is already loaded.
+
+        """
+        self.build_nodes()
+        super(Async, self).initialize()
+
+    def deferred_nodes(self):
+        """ Get the child nodes that are not built yet """
+        return self.async_nodes
+
+    def child_node_intercept(self, nodes, key, f_locals):
+        """ Store the child nodes until the section is loaded.
+
+        Nodes that define an identifier are built immediately since they may
+        be referenced before the section is loaded, but are not displayed
+        until it is.
+
+        Parameters
+        ----------
+        nodes : list
+            A list of compiler nodes containing the information required
+            to instantiate the children.
+
+        key : object
+            The scope key for the current local scope.
+
+        f_locals : mapping or None
+            A mapping object for the current local scope.
+
+        """
+        if has_identifiers(nodes):
+            for node in nodes:
+                node(self)
+        else:
+            self.async_nodes.append((nodes, key, f_locals))
+
+
+def pending_sections(node):
+    """ Find the Async sections within the node that are not loaded. The
+    sections within a section that is not loaded are excluded since they are
+    not displayed until it is.
+
+    """
+    sections = []
+    stack = list(node.children)
+    while stack:
+        child = stack.pop()
+        if isinstance(child, Async) and not child.loaded:
+            sections.append(child)
+        else:
+            stack.extend(child.children)
+    return sections
+
+
+def start_sections(node, pending):
+    """ Start loading the pending sections within the node.
+
+    Parameters
+    ----------
+    node: Tag
+        The node to search.
+    pending: Dict
+        The tasks loading each section. New tasks are added to it.
+
+    """
+    import asyncio
+    for section in pending_sections(node):
+        pending[asyncio.ensure_future(section.load())] = section
+
+
+def remaining(deadline):
+    """ Get the time left until the deadline or None if there is none """
+    if deadline is None:
+        return None
+    return max(0, deadline - time.monotonic())
+
+
+async def loaded_sections(pending, deadline=None):
+    """ Wait for the sections being loaded and yield each as it completes.
+    Sections found within a loaded section are started before it is yielded.
+    Sections still loading at the deadline are cancelled and display their
+    fallback.
+
+    Parameters
+    ----------
+    pending: Dict
+        The tasks loading each section from `start_sections`.
+    deadline: Float
+        The `time.monotonic()` to stop waiting at.
+
+    Yields
+    ------
+    section: Async
+        The next section that completed.
+
+    """
+    import asyncio
+    try:
+        while pending:
+            done, running = await asyncio.wait(
+                pending, timeout=remaining(deadline),
+                return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                for task in running:
+                    task.cancel()
+                    section = pending.pop(task)
+                    section.resolve(error=asyncio.TimeoutError())
+                    yield section
+                return
+            for task in done:
+                section = pending.pop(task)
+                start_sections(section, pending)
+                yield section
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def gather_attrs(kwargs, deadline=None):
+    """ Await the awaitable values of the kwargs concurrently.
+
+    Parameters
+    ----------
+    kwargs: Dict
+        Attributes where the values may be awaitables (ie coroutines).
+    deadline: Float
+        The `time.monotonic()` to stop waiting at.
+
+    Returns
+    -------
+    kwargs: Dict
+        The attributes with the results of the awaitables.
+
+    Raises
+    ------
+    TimeoutError
+        If not all of the values are ready by the deadline.
+
+    """
+    import asyncio
+    tasks = {asyncio.ensure_future(v): k for k, v in kwargs.items()
+             if inspect.isawaitable(v)}
+    if not tasks:
+        return kwargs
+    kwargs = dict(kwargs)
+    try:
+        done, running = await asyncio.wait(tasks, timeout=remaining(deadline))
+        if running:
+            names = sorted(tasks[t] for t in running)
+            raise asyncio.TimeoutError(
+                "Timed out loading %s" % ", ".join(names))
+        for task in done:
+            kwargs[tasks[task]] = task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+    return kwargs
+
+
+async def load(node, timeout=None, **kwargs):
+    """ Load everything the node depends on concurrently and prepare it for
+    rendering. This is used by `Tag.render_async`.
+
+    The awaitable kwargs are awaited together and set. Then the Async
+    sections and conversions running in the background (see `Raw.offload`)
+    are waited on together, since the sections may use the attributes.
+
+    Parameters
+    ----------
+    node: Tag
+        The node to prepare.
+    timeout: Float
+        Maximum time in seconds to wait. Sections that are not loaded by
+        then display their fallback and conversions their placeholder.
+    kwargs: Dict
+        Attributes to set. Awaitable values are awaited first.
+
+    Raises
+    ------
+    TimeoutError
+        If the attributes are not loaded within the timeout.
+
+    """
+    import asyncio
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    node.prepare(**(await gather_attrs(kwargs, deadline)))
+
+    pending = {}
+    start_sections(node, pending)
+    async for section in loaded_sections(pending, deadline):
+        pass
+
+    # The conversions are already running in the executor
+    root = node.proxy.root
+    futures = [asyncio.wrap_future(proxy.future)
+               for proxy in root.futures.values()]
+    if futures:
+        await asyncio.wait(futures, timeout=remaining(deadline))
+    root.flush()
+
+
+async def stream(view, timeout=None, **kwargs):
+    """ Render the view in chunks. The head and page with the placeholders
+    of the Async sections are sent first so the client can start loading
+    the assets. The sections are loaded concurrently and the content of
+    each is sent as soon as it is loaded, in the order they complete.
+
+    Parameters
+    ----------
+    view: Html
+        The view to render.
+    timeout: Float
+        Maximum time in seconds to wait for all the sections. Sections that
+        are not loaded by then display their fallback.
+    kwargs: Dict
+        Attributes to set before rendering.
+
+    Yields
+    ------
+    chunk: String
+        The next part of the response.
+
+    """
+    view.prepare(**kwargs)
+    pending = {}
+    start_sections(view, pending)
+    try:
+        html = view.render()
+        head, sep, body = html.partition('</head>')
+        if sep:
+            yield head + sep
+            html = body
+
+        # Keep the closing tags until all sections are sent
+        end = ''
+        for tag in ('</html>', '</body>'):
+            if html.endswith(tag):
+                html = html[:-len(tag)]
+                end = tag + end
+        yield html
+
+        if pending:
+            yield SWAP_SCRIPT
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        async for section in loaded_sections(pending, deadline):
+            yield section_chunk(section)
+
+        # Store the content of Cache nodes now that the sections are loaded
+        view.proxy.root.flush()
+        yield end
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def section_chunk(section):
+    """ Create the chunk that moves the content of the section into the
+    placeholder. The id is escaped for the attribute and the script.
+
+    """
+    script_id = json.dumps(section.id).replace('<', '\\u003c').replace(
+        '>', '\\u003e').replace('&', '\\u0026')
+    return '<template id="%s-content">%s</template><script>webSwap(%s)' \
+           '</script>' % (escape(section.id), section.proxy.content(),
+                          script_id)
@@ -0,0 +1,257 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+import os
+import json
+import stat
+import hashlib
+import tempfile
+from collections import OrderedDict
+from threading import Lock, get_ident
+from atom.api import Atom, Bool, Int, Str, Typed, Value
+
+
+class LRUCache(Atom):
+    """ A thread safe least recently used cache bounded by the total size
+    of the entries.
+
+    """
+    #: Maximum total size of the entries in bytes
+    max_bytes = Int(32 * 1024 * 1024)
+
+    #: Current total size of the entries in bytes
+    size = Int()
+
+    #: Entries as {key: (value, size)} from least to most recently used
+    entries = Typed(OrderedDict, ())
+
+    #: Lock for access from multiple threads
+    lock = Value(factory=Lock)
+
+    def get(self, key, default=None):
+        """ Get the value for the key and mark it as most recently used.
+
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, size):
+        """ Add the value and evict the least recently used entries until
+        the cache is within it's size limit. Values larger than the limit are
+        not stored.
+
+        Parameters
+        ----------
+        key: Hashable
+            The key to store the value under.
+        value: Object
+            The value to store.
+        size: Int
+            The (approximate) size of the value in bytes.
+
+        """
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            entries = self.entries
+            old = entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                k, (v, s) = entries.popitem(last=False)
+                self.size -= s
+
+    def pop(self, key, default=None):
+        """ Remove the entry for the key and return it's value """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return default
+            self.size -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        """ Remove all entries """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+
+class FileCache(Atom):
+    """ A cache which stores each entry in a file so it is shared by all
+    the processes of the user on the machine (ie the workers of a `Runner`).
+
+    The default directory is private to the user and on `/dev/shm` if it
+    exists, which is a tmpfs so the entries are kept in shared memory. A
+    directory that is not owned by the user or that others can write to is
+    refused. Values are stored as json so they must be json serializable,
+    lists are returned as tuples. Entries are written atomically. When the
+    total size of the files exceeds `max_bytes` the least recently used
+    entries are removed.
+
+    """
+    #: Directory the entries are stored in
+    directory = Str()
+
+    #: Maximum total size of the entries in bytes
+    max_bytes = Int(32 * 1024 * 1024)
+
+    #: Whether the directory was created and checked
+    checked = Bool()
+
+    def _default_directory(self):
+        base = '/dev/shm'
+        if not os.path.isdir(base):
+            base = tempfile.gettempdir()
+        name = 'enaml-web-cache'
+        if hasattr(os, 'getuid'):
+            name = '%s-%s' % (name, os.getuid())
+        return os.path.join(base, name)
+
+    def check_directory(self):
+        """ Create the directory if needed and make sure it is private.
+
+        Raises
+        ------
+        PermissionError
+            If the directory is not owned by the user or others can write
+            to it.
+
+        """
+        if self.checked:
+            return
+        directory = self.directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+        if not stat.S_ISDIR(info.st_mode):
+            raise PermissionError("%s is not a directory" % directory)
+        if hasattr(os, 'getuid') and (info.st_uid != os.getuid() or
+                                      info.st_mode & 0o022):
+            raise PermissionError(
+                "%s must be owned by the user and not writable by others" %
+                directory)
+        self.checked = True
+
+    def path(self, key):
+        """ Get the filename of the entry for the key """
+        return os.path.join(self.directory, content_key(key))
+
+    def get(self, key, default=None):
+        """ Get the value for the key """
+        self.check_directory()
+        path = self.path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            # Mark it as recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return default
+        return tuple(value) if isinstance(value, list) else value
+
+    def set(self, key, value, size):
+        """ Store the value for the key and evict the least recently used
+        entries until the directory is within it's size limit. The value
+        must be json serializable.
+
+        Parameters
+        ----------
+        key: Hashable
+            The key to store the value under.
+        value: Object
+            The value to store.
+        size: Int
+            The (approximate) size of the value in bytes.
+
+        """
+        if size > self.max_bytes:
+            return
+        self.check_directory()
+        path = self.path(key)
+        tmp = '%s.%s.%s.tmp' % (path, os.getpid(), get_ident())
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        """ Remove the least recently used entries until the total size of
+        the files is within the limit. Entries being written by other
+        processes are included in the total but not removed.
+
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            try:
+                info = entry.stat()
+            except FileNotFoundError:
+                continue
+            total += info.st_size
+            if not entry.name.endswith('.tmp'):
+                entries.append((info.st_mtime, info.st_size, entry.path))
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def pop(self, key, default=None):
+        """ Remove the entry for the key and return it's value """
+        value = self.get(key, default)
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def clear(self):
+        """ Remove all entries """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+
+def content_key(*parts):
+    """ Create a key by hashing the given parts. Strings are hashed directly
+    anything else is hashed using it's repr.
+
+    """
+    h = hashlib.sha1()
+    for part in parts:
+        if not isinstance(part, (str, bytes)):
+            part = repr(part)
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        h.update(part)
+        h.update(b'\0')
+    return h.hexdigest()
@@ -0,0 +1,59 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+from copy import deepcopy
+from html import escape
+from lxml.html import tostring
+from web.components.html import Tag
+from web.core.streaming import ProxyAsync
+from .lxml_raw import fragment
+from .lxml_toolkit_object import WebComponent
+
+
+class AsyncComponent(WebComponent, ProxyAsync):
+    """ A component which displays a placeholder until the section is
+    loaded.
+
+    """
+
+    def init_layout(self):
+        """ Replace the children with the placeholder if not yet loaded """
+        super(AsyncComponent, self).init_layout()
+        d = self.declaration
+        if not d.loaded:
+            self.set_loaded(False)
+        elif d.error is not None:
+            self.set_loaded(True)
+
+    def set_loaded(self, loaded):
+        """ Display the children, the fallback if loading failed, or the
+        placeholder if not yet loaded.
+
+        """
+        d = self.declaration
+        widget = self.widget
+        del widget[:]
+        widget.text = None
+        if not loaded or d.error is not None:
+            source = d.fallback if loaded else d.placeholder
+            body = deepcopy(fragment(source))
+            widget.text = body.text
+            widget.extend(body)
+            return
+        widget.text = d.text or None
+        for child in d.children:
+            if not isinstance(child, Tag):
+                continue
+            if child.proxy_is_active:
+                widget.append(child.proxy.widget)
+            else:
+                child.activate_proxy()
+
+    def content(self):
+        """ Get the html of the content """
+        widget = self.widget
+        parts = [escape(widget.text or '', quote=False)]
+        parts.extend(tostring(node, encoding='unicode') for node in widget)
+        return ''.join(parts)
@@ -0,0 +1,84 @@
+"""
+Distributed under the terms of the MIT License.
+
+The full license is in the file LICENSE.txt, distributed with this software.
+"""
+from copy import deepcopy
+from html import escape
+from lxml.html import tostring
+from web.components.html import Tag
+from web.core.cache import ProxyCache
+from web.core.streaming import Async, pending_sections
+from .lxml_raw import fragment
+from .lxml_toolkit_object import WebComponent
+
+
+def generated_ids(declaration):
+    """ Get the ids of the nodes within the declaration that were generated
+    from the memory address of the node.
+
+    """
+    ids = set()
+    for node in declaration.traverse():
+        if node is declaration or not isinstance(node, Tag):
+            continue
+        if node.id == '%0x' % id(node):
+            ids.add(node.id)
+    return ids
+
+
+class CacheComponent(WebComponent, ProxyCache):
+    """ A component which inserts cached content or stores the content
+    of it's children once they are rendered.
+
+    """
+
+    def init_widget(self):
+        """ Insert the cached content or queue the content to be stored. """
+        super(CacheComponent, self).init_widget()
+        d = self.declaration
+        if d.content is not None:
+            body = deepcopy(fragment(d.content))
+            self.widget.text = body.text
+            self.widget.extend(body)
+        elif d.key is not None and not d.uncacheable:
+            self.root.caches[id(self)] = self
+
+    def destroy(self):
+        """ Remove the component from the root's queue """
+        if self.widget is not None:
+            self.root.caches.pop(id(self), None)
+        super(CacheComponent, self).destroy()
+
+    def is_ready(self):
+        """ Whether all the Async sections within the cache are loaded so
+        the content can be stored.
+
+        """
+        return not pending_sections(self.declaration)
+
+    def store(self):
+        """ Save the content of the children. Generated ids are removed so
+        they are not duplicated when the content is reused. The content is
+        not stored if an Async section within it failed since it displays
+        the fallback.
+
+        """
+        d = self.declaration
+        for node in d.traverse():
+            if isinstance(node, Async) and node.error is not None:
+                return
+        widget = self.widget
+        ids = generated_ids(d)
+        text = escape(widget.text or '', quote=False)
+        parts = [text]
+        for child in widget:
+            if ids:
+                child = deepcopy(child)
+                for node in child.iter():
+                    node_id = node.get('id')
+                    if node_id is not None and \
+                            node_id.split('-')[0] in ids:
+                        del node.attrib['id']
+            parts.append(tostring(child, encoding='unicode'))
+        d.store(''.join(parts))
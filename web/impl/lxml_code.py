@@ -9,38 +9,84 @@ Created on Aug 2, 2017
 
 @author: jrm
 """
-from atom.api import Instance
-from pygments import lexers, highlight
-from pygments.lexer import Lexer
-from pygments.formatters import HtmlFormatter
+from .cache import LRUCache, content_key
 from .lxml_raw import RawComponent
 from web.components.code import ProxyCode
 
 
-class CodeComponent(RawComponent, ProxyCode):
-    #: Lexer used
-    lexer = Instance(Lexer)
+#: Lexers by language
+LEXERS = {}
+
+#: Formatters by style
+FORMATTERS = {}
+
+#: Cache of highlighted html shared by all components
+CACHE = LRUCache(max_bytes=16 * 1024 * 1024)
+
+
+def get_lexer(language):
+    """ Get a shared lexer for the given language. """
+    lexer = LEXERS.get(language)
+    if lexer is None:
+        from pygments import lexers
+        lexer = LEXERS[language] = lexers.find_lexer_class_by_name(language)()
+    return lexer
+
+
+def get_formatter(style):
+    """ Get a shared html formatter for the given style. If no style is
+    given the pygments default is used.
 
-    #: HTML Formatter
-    formatter = Instance(HtmlFormatter)
+    """
+    formatter = FORMATTERS.get(style)
+    if formatter is None:
+        from pygments.formatters import HtmlFormatter
+        formatter = FORMATTERS[style] = HtmlFormatter(style=style or 'default')
+    return formatter
 
-    def _default_formatter(self):
-        return HtmlFormatter(style=self.declaration.highlight_style)
 
-    def _default_lexer(self):
+def to_html(source, language, style):
+    """ Highlight the source. If no language is given it is guessed from
+    the source. This may be run in an executor.
+
+    """
+    from pygments import highlight
+    if language:
+        lexer = get_lexer(language)
+    else:
+        from pygments.lexers import guess_lexer
+        lexer = guess_lexer(source)
+    return highlight(source, lexer=lexer, formatter=get_formatter(style))
+
+
+class CodeComponent(RawComponent, ProxyCode):
+
+    def refresh(self):
+        """ Highlight the source and replace the content with the result.
+        The highlighted html is cached by the source, language, and style.
+
+        """
         d = self.declaration
-        if d.language:
-            return lexers.find_lexer_class_by_name(d.language)()
-        return lexers.guess_lexer(d.source)
+        args = (d.source, d.language, d.highlight_style)
+        key = content_key(*args)
+        html = CACHE.get(key)
+        if html is not None:
+            self.set_html(key, html)
+        elif d.offload:
+            self.submit(lambda html: self.set_html(key, html), to_html, *args)
+        else:
+            self.set_html(key, to_html(*args))
+
+    def set_html(self, key, html):
+        """ Cache the highlighted html then display it """
+        CACHE.set(key, html, len(html))
+        super(CodeComponent, self).set_source(html)
 
     def set_source(self, source):
-        super(CodeComponent, self).set_source(highlight(
-            source,  lexer=self.lexer, formatter=self.formatter))
+        self.request_refresh()
 
     def set_language(self, language):
-        self.lexer = self._default_lexer()
-        self.set_source(self.declaration.source)
+        self.request_refresh()
 
     def set_highlight_style(self, style):
-        self.formatter = self._default_formatter()
-        self.set_source(self.declaration.source)
+        self.request_refresh()
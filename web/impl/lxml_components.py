@@ -9,7 +9,6 @@ Created on Apr 12, 2017
 
 @author: jrm
 """
-import inspect
 from web.components import html
 
 
@@ -23,6 +22,16 @@ def html_factory():
     return RootWebComponent
 
 
+def async_factory():
+    from .lxml_async import AsyncComponent
+    return AsyncComponent
+
+
+def cache_factory():
+    from .lxml_cache import CacheComponent
+    return CacheComponent
+
+
 def code_factory():
     from .lxml_code import CodeComponent
     return CodeComponent
@@ -45,12 +54,14 @@ def raw_factory():
 
 #: Create generic html factories
 FACTORIES = {
-    name: generic_factory for name, obj in inspect.getmembers(html)
-    if inspect.isclass(obj)
+    name: generic_factory for name, obj in vars(html).items()
+    if isinstance(obj, type)
 }
 
 #: Create special widgets
 FACTORIES.update({
+    'Async': async_factory,
+    'Cache': cache_factory,
     'Code': code_factory,
     'Html': html_factory,
     'Markdown': markdown_factory,
@@ -9,26 +9,193 @@ Created on Jul 8, 2018
 
 @author: jrm
 """
-import nbformat
-from atom.api import Instance
-from .lxml_raw import RawComponent
-from nbconvert import HTMLExporter
+import json
+import threading
+from copy import deepcopy
+from difflib import SequenceMatcher
+from atom.api import Int, List, Value
+from lxml.html import tostring
+from .cache import LRUCache, content_key
+from .lxml_raw import RawComponent, parse
 from web.components.ipynb import ProxyNotebook
 
 
+#: Cache of converted notebooks and cells shared by all components. The
+#: parsed nodes are stored and copied into each component.
+CACHE = LRUCache(max_bytes=64 * 1024 * 1024)
+
+#: Exporters are shared per thread since conversions may be run in an
+#: executor
+EXPORTERS = threading.local()
+
+
+def get_exporter(template_name=None):
+    """ Get a shared html exporter using the given template. The 'basic'
+    template only renders the cells and is used for converting cells
+    individually.
+
+    """
+    exporters = getattr(EXPORTERS, 'exporters', None)
+    if exporters is None:
+        exporters = EXPORTERS.exporters = {}
+    exporter = exporters.get(template_name)
+    if exporter is None:
+        from nbconvert import HTMLExporter
+        if template_name is None:
+            exporter = HTMLExporter()
+        else:
+            exporter = HTMLExporter(template_name=template_name)
+        exporters[template_name] = exporter
+    return exporter
+
+
+def to_html(source, version):
+    """ Convert the notebook source to html. This may be run in an executor.
+
+    """
+    import nbformat
+    source, resources = get_exporter().from_notebook_node(
+        nbformat.reads(source, as_version=version))
+    return source
+
+
 class NotebookComponent(RawComponent, ProxyNotebook):
     """ A component for rendering Jupyter Notebooks. """
 
-    #: Exporter
-    exporter = Instance(HTMLExporter, ())
+    #: Exporter used to convert individual cells in incremental mode
+    cell_exporter = Value()
 
-    def set_source(self, source):
-        # Parse md and put in a root node
-        source, resources = self.exporter.from_notebook_node(
-            nbformat.reads(source, as_version=self.declaration.version))
+    #: Cells displayed in incremental mode as a list of (key, id) tuples
+    cells = List()
+
+    #: Counter used to generate cell ids
+    cell_count = Int()
+
+    def _default_cell_exporter(self):
+        return get_exporter('basic')
+
+    def refresh(self):
+        """ Convert the notebook and update the content. The parsed result
+        is cached by the source and version.
+
+        """
+        d = self.declaration
+        if not d.source:
+            del self.cells
+            self.set_content([])
+        elif d.incremental and d.version == 4:
+            self.refresh_cells()
+        else:
+            del self.cells
+            key = content_key(d.source, d.version)
+            body = CACHE.get(key)
+            if body is not None:
+                self.set_content(deepcopy(body))
+            elif d.offload:
+                self.submit(lambda html: self.set_html(key, html), to_html,
+                            d.source, d.version)
+            else:
+                self.set_html(key, to_html(d.source, d.version))
+
+    def set_html(self, key, html):
+        """ Parse and cache the converted html then display it """
         # Parse source to html
-        super(NotebookComponent, self).set_source(u"<div>%s</div>" % source)
+        body = parse(u"<div>%s</div>" % html)
+        CACHE.set(key, body, len(html))
+        self.set_content(deepcopy(body))
+
+    def convert_cell(self, key, cell, metadata):
+        """ Convert a single cell. The result is cached by the cell key.
+
+        Returns
+        -------
+        node: _Element
+            A div containing the converted cell. This is shared and must not
+            be modified.
+
+        """
+        node = CACHE.get(key)
+        if node is None:
+            import nbformat
+            nb = nbformat.v4.new_notebook(cells=[cell], metadata=metadata)
+            source, resources = self.cell_exporter.from_notebook_node(nb)
+            node = parse(u"<div>%s</div>" % source)[0]
+            CACHE.set(key, node, len(source))
+        return node
+
+    def refresh_cells(self):
+        """ Convert and update only the cells that changed since the last
+        refresh. If the notebook was already displayed a patch is emitted
+        for each cell that was added or removed. This requires version 4,
+        older versions always use a full conversion.
+
+        """
+        import nbformat
+        d = self.declaration
+        nb = nbformat.reads(d.source, as_version=d.version)
+        metadata = nb.metadata
+        context = json.dumps(metadata, sort_keys=True)
+        keys = [content_key(json.dumps(cell, sort_keys=True), context)
+                for cell in nb.cells]
+
+        old = self.cells
+        widget = self.widget
+        existing = {node.get('id'): node for node in widget} if old else {}
+        cells = []
+        nodes = []
+        added = []
+        removed = []
+        matcher = SequenceMatcher(None, [k for k, i in old], keys,
+                                  autojunk=False)
+        for op, i1, i2, j1, j2 in matcher.get_opcodes():
+            if op == 'equal':
+                for cell in old[i1:i2]:
+                    cells.append(cell)
+                    nodes.append(existing[cell[1]])
+                continue
+            removed.extend(node_id for k, node_id in old[i1:i2])
+            for j in range(j1, j2):
+                key = keys[j]
+                self.cell_count += 1
+                node_id = '%s-cell-%s' % (d.id, self.cell_count)
+                node = deepcopy(self.convert_cell(key, nb.cells[j], metadata))
+                node.set('id', node_id)
+                added.append(len(nodes))
+                cells.append((key, node_id))
+                nodes.append(node)
+
+        self.cells = cells
+        if not old:
+            self.set_content(nodes)
+            return
+        widget[:] = nodes
+
+        for node_id in removed:
+            d._notify_modified({
+                'id': d.id,
+                'type': 'removed',
+                'name': 'children',
+                'value': node_id,
+            })
+        # Add in reverse so the "before" node always exists on the client
+        for i in reversed(added):
+            change = {
+                'id': d.id,
+                'type': 'added',
+                'name': 'children',
+                'value': tostring(nodes[i], encoding='unicode'),
+            }
+            if i + 1 < len(cells):
+                change['before'] = cells[i + 1][1]
+            d._notify_modified(change)
+
+    def set_source(self, source):
+        self.refresh()
 
     def set_version(self, version):
-        self.set_source(self.declaration.source)
+        self.refresh()
 
+    def set_incremental(self, incremental):
+        # Rebuild everything when the mode changes
+        del self.cells
+        self.refresh()
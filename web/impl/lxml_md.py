@@ -9,43 +9,72 @@ Created on Aug 2, 2017
 
 @author: jrm
 """
-import markdown
-from .lxml_raw import RawComponent
+from copy import deepcopy
+from .cache import LRUCache, content_key
+from .lxml_raw import RawComponent, parse
 from web.components.md import ProxyMarkdown
 
 
+#: Cache of converted markdown shared by all components. The parsed nodes
+#: are stored and copied into each component.
+CACHE = LRUCache(max_bytes=32 * 1024 * 1024)
+
+
+def to_html(source, tab_length, safe_mode, output_format, extensions,
+            extension_configs):
+    """ Convert markdown source to html. This may be run in an executor. """
+    import markdown
+    return markdown.markdown(
+        source,
+        tab_length=tab_length,
+        safe_mode=safe_mode,
+        output_format=output_format,
+        extensions=extensions,
+        extension_configs=extension_configs
+    )
+
+
 class MarkdownComponent(RawComponent, ProxyMarkdown):
     """ A block for rendering Markdown source. """
 
-    def _refresh_source(self):
+    def refresh(self):
+        """ Convert the source and replace the content with a copy of the
+        result. The parsed result is cached by the source and conversion
+        options.
+
+        """
         d = self.declaration
+        args = (d.source, d.tab_length, d.safe_mode, d.output_format,
+                d.extensions, d.extension_configs)
+        key = content_key(*args)
+        body = CACHE.get(key)
+        if body is not None:
+            self.set_content(deepcopy(body))
+        elif d.offload:
+            self.submit(lambda html: self.set_html(key, html), to_html, *args)
+        else:
+            self.set_html(key, to_html(*args))
 
-        #: Parse md and put in a root node
-        source = markdown.markdown(
-            d.source,
-            tab_length=d.tab_length,
-            safe_mode=d.safe_mode,
-            output_format=d.output_format,
-            extensions=d.extensions,
-            extension_configs=d.extension_configs
-        )
-        #: Parse source to html
-        super(MarkdownComponent, self).set_source(source)
+    def set_html(self, key, html):
+        """ Parse and cache the converted html then display it """
+        body = parse(html)
+        CACHE.set(key, body, len(html))
+        self.set_content(deepcopy(body))
 
     def set_source(self, source):
-        self._refresh_source()
+        self.request_refresh()
 
     def set_safe_mode(self, mode):
-        self._refresh_source()
+        self.request_refresh()
 
     def set_output_format(self, format):
-        self._refresh_source()
+        self.request_refresh()
 
     def set_tab_length(self, length):
-        self._refresh_source()
+        self.request_refresh()
 
     def set_extensions(self, extensions):
-        self._refresh_source()
+        self.request_refresh()
 
     def set_extension_configs(self, config):
-        self._refresh_source()
+        self.request_refresh()
@@ -9,30 +9,344 @@ Created on Aug 2, 2017
 
 @author: jrm
 """
-from atom.api import set_default
+import logging
+import threading
+from copy import deepcopy
+from difflib import SequenceMatcher
+from atom.api import Int, Value, set_default
 from lxml import etree
+from lxml.html import tostring
+from .cache import LRUCache, content_key
 from .lxml_toolkit_object import WebComponent
+from web.components.html import running_loop
 from web.components.raw import ProxyRawNode
+from web.core.app import WebApplication
+
+log = logging.getLogger('web')
+
+#: Cache of parsed html shared by all components
+CACHE = LRUCache(max_bytes=16 * 1024 * 1024)
+
+#: Parsers are shared per thread since conversions may be run in an executor
+PARSERS = threading.local()
+
+
+def get_parser():
+    """ Get the html parser for the current thread. """
+    parser = getattr(PARSERS, 'parser', None)
+    if parser is None:
+        parser = PARSERS.parser = etree.HTMLParser(
+            default_doctype=False, no_network=True)
+    return parser
+
+
+def parse(source):
+    """ Parse the html source.
+
+    Returns
+    -------
+    body: _Element
+        The body element containing the parsed nodes.
+
+    """
+    html = etree.fromstring(source, get_parser()) if source else None
+    return html[0] if html is not None else etree.Element('body')
+
+
+def is_generated(node_id, prefix):
+    """ Check if the id was generated for a block using the given prefix
+    (ie the id of the component followed by a dash).
+
+    """
+    return (node_id is not None and node_id.startswith(prefix) and
+            node_id[len(prefix):].isdigit())
+
+
+def block_key(node, prefix):
+    """ Get a key to compare a top level block by it's content. Ids that
+    were generated for the block are excluded, ids from the source are not.
+
+    """
+    node_id = node.get('id')
+    if not is_generated(node_id, prefix):
+        return tostring(node, encoding='unicode')
+    attrib = node.attrib
+    del attrib['id']
+    try:
+        return tostring(node, encoding='unicode')
+    finally:
+        attrib['id'] = node_id
+
+
+def can_update(a, b, prefix):
+    """ Check if the block can be updated to match the other by replacing
+    only it's content. The ids must match unless both were generated.
+
+    """
+    if not isinstance(a.tag, str) or a.tag != b.tag or a.tail != b.tail:
+        return False
+    attrs = dict(b.attrib)
+    if is_generated(a.get('id'), prefix) and \
+            is_generated(b.get('id'), prefix):
+        attrs['id'] = a.get('id')
+    return dict(a.attrib) == attrs
+
+
+def fragment(source):
+    """ Parse the html source. The result is cached by the source.
+
+    Returns
+    -------
+    body: _Element
+        The body element containing the parsed nodes. This is shared and must
+        not be modified, use `deepcopy` to get a copy of it.
+
+    """
+    key = content_key(source)
+    body = CACHE.get(key)
+    if body is None:
+        body = parse(source)
+        CACHE.set(key, body, len(source))
+    return body
 
 
 class RawComponent(WebComponent, ProxyRawNode):
     """ A block for rendering raw html source. """
-    
+
+    #: Future of a conversion running in the application's executor
+    future = Value()
+
+    #: Callback invoked with the result of the conversion
+    callback = Value()
+
+    #: Number of block ids generated
+    block_count = Int()
+
     def init_widget(self):
         """ Initialize the widget with the source. """
         d = self.declaration
         if d.source:
-            self.set_source(d.source)
+            self.refresh()
         else:
             super(RawComponent, self).init_widget()
 
+    def destroy(self):
+        """ Cancel any conversion in progress """
+        future = self.future
+        if future is not None:
+            future.cancel()
+            self.future = self.callback = None
+            self.root.futures.pop(id(self), None)
+        super(RawComponent, self).destroy()
+
+    def refresh(self):
+        """ Update the widget using the current state of the declaration.
+
+        """
+        self.set_source(self.declaration.source)
+
+    def request_refresh(self):
+        """ Refresh the widget before the tree is next rendered or queried
+        instead of immediately. This allows several changes to be applied
+        with a single refresh. If an event loop is running the refresh is
+        also scheduled on the next iteration of the loop.
+
+        """
+        root = self.root
+        if not root.pending:
+            loop = running_loop()
+            if loop is not None:
+                loop.call_soon(root.flush)
+        root.pending[id(self)] = self
+
+    def submit(self, callback, func, *args):
+        """ Run a conversion in the application's executor and display the
+        placeholder until it completes.
+
+        When done the callback is invoked with the result on the event loop
+        thread (if one is running) or when the tree is next rendered or
+        queried. Pass `wait` to `render` to wait for conversions to finish.
+
+        Parameters
+        ----------
+        callback: Callable
+            Invoked with the result of the conversion.
+        func: Callable
+            The conversion function. When using a process pool this and the
+            args must be picklable.
+        args: Tuple
+            Arguments to pass to the function.
+
+        """
+        if self.future is not None:
+            self.future.cancel()
+        future = WebApplication.instance().executor.submit(func, *args)
+        self.future = future
+        self.callback = callback
+        self.root.futures[id(self)] = self
+        self.set_content(deepcopy(fragment(self.declaration.placeholder)))
+
+        loop = running_loop()
+        if loop is not None:
+            def on_done(f):
+                loop.call_soon_threadsafe(self.complete, f)
+            future.add_done_callback(on_done)
+
+    def complete(self, future):
+        """ Apply the result of a completed conversion. The content changes
+        are emitted by `set_content`. If the conversion failed the error is
+        logged and the fallback is displayed.
+
+        """
+        if future is not self.future:
+            return  # Destroyed or a newer conversion was submitted
+        callback = self.callback
+        self.future = self.callback = None
+        self.root.futures.pop(id(self), None)
+        try:
+            result = future.result()
+        except Exception:
+            d = self.declaration
+            log.exception("Failed to convert the source of %s", d.id)
+            self.set_content(deepcopy(fragment(d.fallback)))
+        else:
+            callback(result)
+
     def set_source(self, source):
         """ Set the source by parsing the source and inserting it into the 
         component. 
         """
+        # Copying the cached nodes is significantly faster than parsing
+        self.set_content(deepcopy(fragment(source)))
+
+    def set_content(self, nodes):
+        """ Replace the content of the component with the given nodes.
+
+        Each top level block is given an id (if it does not have one) so
+        once the component is active only the blocks that changed are
+        updated and a patch is emitted for each of them.
+
+        Parameters
+        ----------
+        nodes: Iterable[_Element]
+            The nodes to insert. These are moved into the component.
+
+        """
+        d = self.declaration
+        nodes = list(nodes)
+        for node in nodes:
+            if isinstance(node.tag, str) and node.get('id') is None:
+                self.block_count += 1
+                node.set('id', '%s-%s' % (d.id, self.block_count))
+
+        if d.proxy_is_active and self.patch_content(nodes):
+            return
+
         self.widget.clear()
-        html = etree.HTML(source)
-        self.widget.extend(html[0])
+        self.widget.extend(nodes)
 
         # Clear removes everything so it must be reinitialized
         super(RawComponent, self).init_widget()
+
+        if d.proxy_is_active:
+            d._notify_modified({
+                'id': d.id,
+                'type': 'refresh',
+                'name': 'source',
+                'value': "".join(
+                    tostring(n, encoding='unicode') for n in nodes),
+            })
+
+    def patch_content(self, nodes):
+        """ Update only the blocks that differ from the given nodes and emit
+        a patch for each change. Blocks with the same tag, attributes, and
+        tail are updated in place, others are removed and added.
+
+        Parameters
+        ----------
+        nodes: List[_Element]
+            The new top level blocks.
+
+        Returns
+        -------
+        result: Bool
+            Whether the content was patched. If nothing is shared with the
+            current content the caller should replace it entirely instead.
+
+        """
+        d = self.declaration
+        widget = self.widget
+        old = list(widget)
+        prefix = '%s-' % d.id
+        matcher = SequenceMatcher(None, [block_key(n, prefix) for n in old],
+                                  [block_key(n, prefix) for n in nodes],
+                                  autojunk=False)
+        opcodes = matcher.get_opcodes()
+        if opcodes and all(op[0] != 'equal' for op in opcodes):
+            return False
+
+        # Determine which blocks to update before modifying anything
+        changes = []
+        for op, i1, i2, j1, j2 in opcodes:
+            if op == 'equal':
+                changes.append((op, old[i1:i2], None))
+                continue
+            pairs = list(zip(old[i1:i2], nodes[j1:j2]))
+            if i2 - i1 == j2 - j1 and all(can_update(a, b, prefix)
+                                          for a, b in pairs):
+                changes.append(('update', old[i1:i2], nodes[j1:j2]))
+                continue
+            for node in old[i1:i2] + nodes[j1:j2]:
+                if node.get('id') is None:
+                    return False  # Comments cannot be referenced by id
+            changes.append(('replace', old[i1:i2], nodes[j1:j2]))
+
+        blocks = []
+        updated = []
+        removed = []
+        added = []
+        for op, a, b in changes:
+            if op == 'equal':
+                blocks.extend(a)
+            elif op == 'update':
+                for node, new in zip(a, b):
+                    node.text = new.text
+                    node[:] = list(new)
+                    updated.append(node)
+                blocks.extend(a)
+            else:
+                removed.extend(node.get('id') for node in a)
+                for node in b:
+                    added.append(len(blocks))
+                    blocks.append(node)
+
+        widget[:] = blocks
+
+        for node_id in removed:
+            d._notify_modified({
+                'id': d.id,
+                'type': 'removed',
+                'name': 'children',
+                'value': node_id,
+            })
+        for node in updated:
+            content = [node.text or ""]
+            content.extend(tostring(n, encoding='unicode') for n in node)
+            d._notify_modified({
+                'id': node.get('id'),
+                'type': 'refresh',
+                'name': 'source',
+                'value': "".join(content),
+            })
+        # Add in reverse so the "before" node always exists on the client
+        for i in reversed(added):
+            change = {
+                'id': d.id,
+                'type': 'added',
+                'name': 'children',
+                'value': tostring(blocks[i], encoding='unicode'),
+            }
+            if i + 1 < len(blocks):
+                change['before'] = blocks[i + 1].get('id')
+            d._notify_modified(change)
+        return True
@@ -9,10 +9,11 @@ Created on Apr 12, 2017
 
 @author: jrm
 """
+from concurrent.futures import wait
 from atom.api import Typed,  Constant, Event, Property, Dict, atomref
 from lxml.html import tostring
 from lxml.etree import _Element, Element, SubElement
-from web.components.html import ProxyTag
+from web.components.html import ProxyTag, class_string, style_string
 from web.core.app import WebApplication
 
 
@@ -142,7 +143,9 @@ class WebComponent(ProxyTag):
             del self.widget
 
             # Remove from cache
-            self.root.cache.pop(self.declaration.id, None)
+            root = self.root
+            root.cache.pop(self.declaration.id, None)
+            root.pending.pop(id(self), None)
 
         super(WebComponent, self).destroy()
 
@@ -207,15 +210,21 @@ class WebComponent(ProxyTag):
     # -------------------------------------------------------------------------
     def render(self, method='html', encoding='unicode', **kwargs):
         """ Render the widget tree into a string """
+        root = self.root
+        if root.pending or root.futures or root.caches:
+            root.flush()
         return tostring(self.widget, method=method, encoding=encoding, **kwargs)
 
     def xpath(self, query, **kwargs):
         """ Get the node(s) matching the query"""
+        root = self.root
+        if root.pending or root.futures or root.caches:
+            root.flush()
         nodes = self.widget.xpath(query, **kwargs)
         if not nodes:
             return []
         matches = []
-        cache = self.root.cache
+        cache = root.cache
         for node in nodes:
             aref = cache.get(node.attrib.get('id'))
             obj = aref() if aref else None
@@ -268,19 +277,47 @@ class WebComponent(ProxyTag):
         """ Set any attributes not explicitly defined """
         self.widget.attrib.update(attrs)
 
+    def attr_set(self, key, value):
+        """ Set a single attribute of the attrs """
+        self.widget.set(key, value)
+
+    def attr_delete(self, key):
+        """ Remove an attribute that was dropped from the attrs """
+        self.widget.attrib.pop(key, None)
+
     def set_cls(self, cls):
-        if isinstance(cls, (tuple, list)):
-            cls = " ".join(cls)
+        cls = class_string(cls)
+        if cls:
+            self.widget.set('class', cls)
         else:
-            cls = str(cls)
-        self.widget.set('class', cls)
+            self.widget.attrib.pop('class', None)
 
     def set_style(self, style):
-        if isinstance(style, dict):
-            style = ";".join("%s:%s" % s for s in style.items())
+        style = style_string(style)
+        if style:
+            self.widget.set('style', style)
         else:
-            style = str(style)
-        self.widget.set('style', style)
+            self.widget.attrib.pop('style', None)
+
+    def class_add(self, name):
+        """ Add a class without rebuilding the attribute """
+        cls = self.widget.get('class')
+        self.widget.set('class', '%s %s' % (cls, name) if cls else name)
+
+    def class_remove(self, name):
+        """ Remove a class from the attribute """
+        names = self.widget.get('class', '').split()
+        if name in names:
+            names.remove(name)
+        self.set_cls(names)
+
+    def style_set(self, key, value):
+        """ Set or remove (if the value is None) a single style property. The
+        attribute is updated from the StyleMap of the declaration which
+        already contains the change.
+
+        """
+        self.set_style(self.declaration.style)
 
     def set_attribute(self, name, value):
         """ Default handler for those not explicitly defined """
@@ -303,8 +340,62 @@ class RootWebComponent(WebComponent):
     #: can retrieve their declaration component
     cache = Dict()
 
+    #: Components that must be refreshed before the tree is rendered or
+    #: queried. See `RawComponent.request_refresh`.
+    pending = Dict()
+
+    #: Components with conversions running in the application's executor.
+    #: See `RawComponent.submit`.
+    futures = Dict()
+
+    #: Cache components whose content is stored once the pending changes and
+    #: conversions are applied. See `CacheComponent.store`.
+    caches = Dict()
+
     #: Return a reference to self since this is the root
     root = Property(lambda self: self, cached=True)
 
     def create_widget(self):
         self.widget = Element(self.declaration.tag)
+
+    def flush(self):
+        """ Refresh any components with pending changes and apply the
+        result of any conversions that have completed. Then store the content
+        of new cache components if no conversions are still running. Cache
+        components with Async sections that are not loaded yet are kept until
+        they are.
+
+        """
+        pending = self.pending
+        while pending:
+            key, proxy = pending.popitem()
+            if proxy.widget is not None:
+                proxy.refresh()
+        for proxy in list(self.futures.values()):
+            future = proxy.future
+            if future.done():
+                proxy.complete(future)
+        caches = self.caches
+        if caches and not self.futures:
+            for key, proxy in list(caches.items()):
+                if proxy.widget is None:
+                    del caches[key]
+                elif proxy.is_ready():
+                    del caches[key]
+                    proxy.store()
+
+    def wait(self, timeout=None):
+        """ Wait for any conversions in progress to complete and apply them.
+
+        Parameters
+        ----------
+        timeout: Float
+            Maximum time in seconds to wait. Conversions that are not done
+            by then keep displaying their placeholder.
+
+        """
+        self.flush()
+        futures = [proxy.future for proxy in self.futures.values()]
+        if futures:
+            wait(futures, timeout)
+            self.flush()